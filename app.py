@@ -16,6 +16,7 @@ nest_asyncio.apply()
 # LogicMapper Imports
 from src.agents.orchestrator import OrchestratorAgent
 from src.utils.logger import setup_logger
+from src.utils.streaming import ReportStream
 from src.state.project_state import ProjectState
 
 # Setup Logger
@@ -50,6 +51,15 @@ def main():
             ["gemini-2.0-flash", "gemini-2.0-flash-lite-preview-02-05", "gemini-1.5-flash"], 
             index=0
         )
+        strong_model_name = st.selectbox(
+            "Model for complex files",
+            ["(same model)", "gemini-1.5-pro-latest", "gemini-2.0-flash"],
+            index=0,
+            help="Complex files (large, branch-heavy, many numeric literals) are routed to this model"
+        )
+        if strong_model_name == "(same model)":
+            strong_model_name = None
+        stream_report = st.checkbox("Stream report while generating", value=True)
         
         st.divider()
         st.info("✅ System Status: Ready")
@@ -114,7 +124,7 @@ def main():
             return
 
         # Run the Agent
-        run_analysis(target_path, model_name)
+        run_analysis(target_path, model_name, stream_report, strong_model_name)
 
     # Display Results (Persistent View)
     # If a report was generated in a previous run, show it.
@@ -166,11 +176,11 @@ def display_state_results():
                 st.json(state.get("scanned_files", []))
                 
             with tab3:
-                # Display rules from analyses
-                analyses = state.get("analyses", {})
-                for file, data in analyses.items():
-                    with st.expander(f"Rules for {file}"):
-                        rules = data.get("business_rules", [])
+                # Display rules from analyses; large runs keep them in the rule store
+                project_state = ProjectState.model_validate(state)
+                for file, analysis in project_state.analyses.items():
+                    with st.expander(f"Rules for {file} ({analysis.rule_count or len(analysis.business_rules)})"):
+                        rules = project_state.rules_for(file)
                         if rules:
                             for rule in rules:
                                 st.markdown(f"- {rule}")
@@ -189,13 +199,14 @@ def display_state_results():
         except Exception as e:
             st.error(f"Error loading state: {e}")
 
-def run_analysis(repo_path, model_name):
+def run_analysis(repo_path, model_name, stream_report=True, strong_model_name=None):
     """Runs the agentic workflow using asyncio."""
     status_container = st.status("🕵️ Agent Working...", expanded=True)
+    report_stream = None
     
     try:
         status_container.write("Initializing Agents...")
-        orchestrator = OrchestratorAgent(model_name=model_name)
+        orchestrator = OrchestratorAgent(model_name=model_name, strong_model_name=strong_model_name)
         
         # Check if it's a git URL and show appropriate message
         if repo_path.startswith(('http://', 'https://', 'git@', 'git://')):\
@@ -212,8 +223,19 @@ def run_analysis(repo_path, model_name):
             loop = asyncio.new_event_loop()
             asyncio.set_event_loop(loop)
             
+        on_chunk = None
+        if stream_report:
+            # Render the report as it is generated and keep a partial copy on disk
+            st.subheader("📝 Modernization Report (live)")
+            report_placeholder = st.empty()
+            report_stream = ReportStream(report_path="final_report.md", echo=False)
+            report_stream.callbacks.append(lambda _: report_placeholder.markdown(report_stream.getvalue()))
+            on_chunk = report_stream.write
+        
         # Use run_until_complete which works with nest_asyncio
-        final_report = loop.run_until_complete(orchestrator.process_repository(repo_path))
+        final_report = loop.run_until_complete(orchestrator.process_repository(repo_path, on_chunk=on_chunk))
+        if report_stream:
+            report_stream.close()
         
         status_container.update(label="✅ Analysis Complete!", state="complete", expanded=False)
         
@@ -225,6 +247,8 @@ def run_analysis(repo_path, model_name):
         st.rerun()
         
     except Exception as e:
+        if report_stream:
+            report_stream.close()
         status_container.update(label="❌ Error Occurred", state="error")
         st.error(f"An error occurred: {str(e)}")
         logger.error(f"Streamlit Error: {e}")
@@ -0,0 +1,65 @@
+import os
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.memory.deduplicator import RuleDeduplicator
+
+SUBJECTS = ["VIP customers", "Gold members", "Employees", "Wholesale accounts", "Students", "Seniors",
+            "New customers", "Partners", "Resellers", "Premium users"]
+ACTIONS = ["get a {n}% discount", "receive {n}% off", "are charged a {n}% fee", "earn {n} loyalty points"]
+CONDITIONS = ["on orders over {m}", "when spending more than {m}", "after {m} days of membership", ""]
+PREFIXES = ["", "- ", "The rule is: ", "Business rule: "]
+SUFFIXES = ["", ".", " (hardcoded)", "!"]
+
+
+def generate_rules(num_rules: int, num_distinct: int, num_files: int, seed: int = 7):
+    """Generates rules_by_file with `num_distinct` underlying rules reworded many times."""
+    rng = random.Random(seed)
+    templates = []
+    for _ in range(num_distinct):
+        subject = rng.choice(SUBJECTS)
+        action = rng.choice(ACTIONS).format(n=rng.choice([5, 10, 15, 20, 25, 30]))
+        condition = rng.choice(CONDITIONS).format(m=rng.choice([50, 100, 250, 500, 1000]))
+        templates.append(f"{subject} {action} {condition}".strip())
+    templates = sorted(set(templates))
+
+    rules_by_file = {}
+    for i in range(num_rules):
+        rule = rng.choice(PREFIXES) + rng.choice(templates) + rng.choice(SUFFIXES)
+        if rng.random() < 0.3:
+            rule = rule.upper() if rng.random() < 0.5 else rule.replace(" a ", " an extra ")
+        rules_by_file.setdefault(f"src/module_{i % num_files}.py", []).append(rule)
+    return rules_by_file, len(templates)
+
+
+def run(num_rules: int, num_distinct: int, num_files: int, lsh_min_rules: int):
+    rules_by_file, expected = generate_rules(num_rules, num_distinct, num_files)
+    deduplicator = RuleDeduplicator(lsh_min_rules=lsh_min_rules)
+
+    start = time.perf_counter()
+    canonical = deduplicator.deduplicate(rules_by_file)
+    elapsed = time.perf_counter() - start
+
+    original_chars = sum(len(r) for rules in rules_by_file.values() for r in rules)
+    canonical_chars = sum(len(c['rule']) for c in canonical)
+    print(f"rules={num_rules} distinct_templates={num_distinct} files={num_files} "
+          f"lsh_min_rules={lsh_min_rules}")
+    print(f"  canonical rules : {len(canonical)} (distinct underlying rules: {expected})")
+    print(f"  prompt chars    : {original_chars} -> {canonical_chars} "
+          f"({(1 - canonical_chars / original_chars) * 100:.1f}% smaller)")
+    print(f"  elapsed         : {elapsed:.2f}s ({num_rules / elapsed:,.0f} rules/s)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rule deduplication benchmark")
+    parser.add_argument("--rules", type=int, default=100_000)
+    parser.add_argument("--distinct", type=int, default=2_000)
+    parser.add_argument("--files", type=int, default=5_000)
+    parser.add_argument("--lsh-min-rules", type=int, default=20_000)
+    args = parser.parse_args()
+
+    run(args.rules, args.distinct, args.files, args.lsh_min_rules)
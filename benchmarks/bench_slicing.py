@@ -0,0 +1,113 @@
+"""
+Prompt size and rule recall of logic slicing (the slice_logic compression level)
+against full-file extraction. Every file is sent to the Analyst prompt twice, once
+minified and once sliced; a rule extracted from the full file counts as recalled
+when the sliced extraction yields the same rule (matched by RuleDeduplicator).
+
+Runs on the fake model by default; --live uses Gemini (GOOGLE_API_KEY), which is
+the run that measures what a real model loses.
+"""
+import os
+import sys
+import shutil
+import asyncio
+import argparse
+import tempfile
+import warnings
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+warnings.filterwarnings("ignore")
+
+from benchmarks.fakes import use_fake_backends
+from benchmarks.synthetic_repo import generate_repo
+from src.agents.analyst import EXTRACTION_INSTRUCTIONS
+from src.memory.compressor import ContextCompressor, COMPRESSION_LEVELS
+from src.memory.deduplicator import RuleDeduplicator
+from src.tools.file_system import FileSystemTools
+from src.tools.llm_client import LLMClient
+from src.utils.budget import token_counter
+
+
+def extraction_prompt(path: str, content: str) -> str:
+    return f"\nCode file: '{path}'\n\nCode Content:\n```\n{content}\n```\n"
+
+
+def parse_rules(text: str):
+    return [line.strip().lstrip('- ').strip() for line in text.split('\n') if line.strip()]
+
+
+async def measure(files, model: str, concurrency: int):
+    compressor = ContextCompressor()
+    deduplicator = RuleDeduplicator()
+    client = LLMClient(model)
+    semaphore = asyncio.Semaphore(concurrency)
+    by_language = {}
+
+    async def one(path):
+        ext = os.path.splitext(path)[1]
+        raw = FileSystemTools.read_file(path)
+        if not raw or raw.startswith("Error"):
+            return
+        full = compressor.compress(raw, ext)
+        sliced = compressor.compress(raw, ext, len(COMPRESSION_LEVELS) - 1)
+        async with semaphore:
+            full_rules = parse_rules(await client.generate(extraction_prompt(path, full), prefix=EXTRACTION_INSTRUCTIONS))
+            sliced_rules = parse_rules(await client.generate(extraction_prompt(path, sliced), prefix=EXTRACTION_INSTRUCTIONS))
+        clusters = deduplicator.deduplicate({'full': full_rules, 'sliced': sliced_rules})
+        expected = [c for c in clusters if 'full' in c['sources']]
+        stats = by_language.setdefault(FileSystemTools.language_of(path), [0, 0, 0, 0, 0])
+        stats[0] += 1
+        stats[1] += token_counter.count(full)
+        stats[2] += token_counter.count(sliced)
+        stats[3] += len(expected)
+        stats[4] += sum(1 for c in expected if 'sliced' in c['sources'])
+
+    await asyncio.gather(*(one(path) for path in files))
+    return by_language
+
+
+def report(by_language):
+    print(f"{'language':<12}{'files':>7}{'full tok':>11}{'sliced tok':>12}{'smaller':>9}{'rules':>8}{'recall':>8}")
+    totals = [0, 0, 0, 0, 0]
+    for language, stats in sorted(by_language.items()) + [("total", None)]:
+        if stats is None:
+            stats = totals
+        else:
+            totals = [a + b for a, b in zip(totals, stats)]
+        files, full, sliced, expected, recalled = stats
+        print(f"{language:<12}{files:>7}{full:>11,}{sliced:>12,}{(1 - sliced / full if full else 0):>9.1%}"
+              f"{expected:>8}{(recalled / expected if expected else 1.0):>8.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Logic slicing size/recall benchmark")
+    parser.add_argument("--repo", type=str, default=None, help="Code base to measure (a synthetic repo by default)")
+    parser.add_argument("--files", type=int, default=100, help="Files in the synthetic repo")
+    parser.add_argument("--max-files", type=int, default=200, help="Files measured from --repo")
+    parser.add_argument("--model", type=str, default="gemini-2.0-flash")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--live", action="store_true", help="Call Gemini instead of the fake model")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="logicmapper_slicing_")
+    try:
+        root = args.repo or workdir
+        if not args.repo:
+            generate_repo(workdir, args.files)
+        extensions = set(FileSystemTools.LANGUAGES)
+        files = [path for path in FileSystemTools.list_files(root)
+                 if os.path.splitext(path)[1] in extensions][:args.max_files]
+
+        if args.live:
+            import google.generativeai as genai
+            genai.configure(api_key=os.environ["GOOGLE_API_KEY"])
+            report(asyncio.run(measure(files, args.model, args.concurrency)))
+        else:
+            with use_fake_backends(llm_latency=0.0):
+                report(asyncio.run(measure(files, args.model, args.concurrency)))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+Recall/latency benchmark of the memory bank backends: ChromaDB (HNSW) against the
+NumPy memory-mapped index, exact and IVF. Recall@k is measured against exact
+brute-force search over the same vectors. With --projects N the rules are spread
+over N projects and queries are scoped to one of them.
+"""
+import os
+import sys
+import time
+import random
+import shutil
+import argparse
+import tempfile
+import warnings
+import zlib
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+warnings.filterwarnings("ignore")
+
+import numpy as np
+from chromadb import Documents, EmbeddingFunction, Embeddings
+
+from benchmarks.bench_dedup import SUBJECTS, ACTIONS, CONDITIONS
+from src.memory.vector_store import VectorStore
+from src.memory.numpy_store import NumpyVectorStore
+
+
+class RandomProjectionEmbedding(EmbeddingFunction):
+    """Sum of per-word seeded Gaussian vectors: cheap, deterministic and similarity-preserving."""
+
+    def __init__(self, dims: int = 256):
+        self.dims = dims
+        self._words = {}
+
+    def _word(self, word: str) -> np.ndarray:
+        if word not in self._words:
+            self._words[word] = np.random.default_rng(zlib.crc32(word.encode('utf-8'))).standard_normal(self.dims)
+        return self._words[word]
+
+    def __call__(self, input: Documents) -> Embeddings:
+        vectors = []
+        for text in input:
+            vector = np.zeros(self.dims)
+            for word in text.lower().split():
+                vector += self._word(word)
+            vectors.append((vector / max(np.linalg.norm(vector), 1e-12)).astype(np.float32).tolist())
+        return vectors
+
+
+def generate_rules(count: int, seed: int = 3):
+    rng = random.Random(seed)
+    rules = set()
+    while len(rules) < count:
+        rules.add(f"{rng.choice(SUBJECTS)} {rng.choice(ACTIONS).format(n=rng.randint(1, 90))} "
+                  f"{rng.choice(CONDITIONS).format(m=rng.randint(10, 5000))} in region {rng.randint(1, 400)}".strip())
+    rules = sorted(rules)
+    queries = [' '.join(w for w in rng.choice(rules).split() if rng.random() > 0.2) for _ in range(200)]
+    return rules, queries
+
+
+def measure(name, store, rules, queries, k, projects=1, truth=None):
+    start = time.perf_counter()
+    for i in range(0, len(rules), 1000):
+        store.store_rules(rules[i:i + 1000], metadatas=[
+            {'project': f"project-{(i + j) % projects}", 'file': 'bench.py'} for j in range(len(rules[i:i + 1000]))
+        ])
+    store_seconds = time.perf_counter() - start
+
+    # Reopen from disk to measure startup
+    reopened = type(store)(**store.bench_kwargs)
+    start = time.perf_counter()
+    reopened.count
+    open_seconds = time.perf_counter() - start
+    reopened.search_similar_rules(queries[0], n_results=k, project="project-0")  # warm-up (trains the IVF lists)
+
+    samples, found = [], []
+    for query in queries:
+        start = time.perf_counter()
+        hits = reopened.search_similar_rules(query, n_results=k, project="project-0")
+        samples.append(time.perf_counter() - start)
+        found.append([hit['rule'] for hit in hits])
+
+    start = time.perf_counter()
+    reopened.search_many(queries, n_results=k, project="project-0")
+    batch_seconds = time.perf_counter() - start
+
+    recall = None
+    if truth is not None:
+        recall = float(np.mean([len(set(f) & set(t)) / k for f, t in zip(found, truth)]))
+    samples.sort()
+    print(f"{name:<14} store {store_seconds:6.2f}s  open {open_seconds * 1000:7.1f}ms  "
+          f"p50 {samples[len(samples) // 2] * 1000:6.2f}ms  p95 {samples[int(len(samples) * 0.95)] * 1000:6.2f}ms  "
+          f"batch/query {batch_seconds / len(queries) * 1000:6.2f}ms  "
+          + (f"recall@{k} {recall:.3f}" if recall is not None else "(ground truth)"))
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Memory bank backend recall/latency benchmark")
+    parser.add_argument("--rules", type=int, default=20000)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--dims", type=int, default=256)
+    parser.add_argument("--nprobe", type=int, default=8)
+    parser.add_argument("--projects", type=int, default=1, help="Projects the rules are spread over")
+    args = parser.parse_args()
+
+    rules, queries = generate_rules(args.rules)
+    embedding = RandomProjectionEmbedding(args.dims)
+    embedding(rules)  # warm the word vectors so all backends pay the same embedding cost
+    workdir = tempfile.mkdtemp(prefix="logicmapper_vectors_")
+    print(f"rules={len(rules)} queries={len(queries)} dims={args.dims} k={args.k} projects={args.projects}")
+
+    try:
+        def make(cls, name, **kwargs):
+            kwargs = dict(persist_directory=os.path.join(workdir, name), embedding_function=embedding, **kwargs)
+            store = cls(**kwargs)
+            store.bench_kwargs = kwargs
+            return store
+
+        truth = measure("numpy exact", make(NumpyVectorStore, "exact", ivf_min_rules=None),
+                        rules, queries, args.k, args.projects)
+        measure("numpy ivf", make(NumpyVectorStore, "ivf", ivf_min_rules=1, nprobe=args.nprobe),
+                rules, queries, args.k, args.projects, truth)
+        measure("chroma hnsw", make(VectorStore, "chroma"), rules, queries, args.k, args.projects, truth)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+import re
+import time
+import zlib
+import random
+import asyncio
+from contextlib import contextmanager
+from typing import List, Dict, Any
+
+from chromadb import Documents, EmbeddingFunction, Embeddings
+
+from src.tools.llm_client import LLMClient
+from src.tools.context_cache import ContextCache
+from src.tools.search_tool import SearchTool, SearchBackend
+from src.memory.vector_store import VectorStore
+
+
+class ResourceExhausted(Exception):
+    """Mimics google.api_core's 429 error, which the call policy retries."""
+
+
+class FakeUsage:
+    def __init__(self, prompt: str, text: str, cached_prefix: str = ""):
+        self.prompt_token_count = len(cached_prefix + prompt) // 4
+        self.candidates_token_count = len(text) // 4
+        self.cached_content_token_count = len(cached_prefix) // 4
+
+
+class FakeResponse:
+    def __init__(self, text: str, usage: FakeUsage = None):
+        self.text = text
+        self.usage_metadata = usage
+
+
+class FakeStream:
+    """Async iterator over response chunks, mimicking a streamed genai response."""
+
+    def __init__(self, text: str, usage: FakeUsage, chunk_delay: float):
+        self._chunks = [text[i:i + 40] for i in range(0, len(text), 40)] or [""]
+        self._chunk_delay = chunk_delay
+        self.usage_metadata = usage
+
+    def __aiter__(self):
+        async def iterate():
+            for chunk in self._chunks:
+                await asyncio.sleep(self._chunk_delay)
+                yield FakeResponse(chunk)
+        return iterate()
+
+
+class FakeGenerativeModel:
+    """
+    Deterministic local stand-in for genai.GenerativeModel.
+
+    Answers the Analyst, Architect and QA prompts with plausible output derived
+    from the prompt itself, after a configurable (seeded, jittered) latency plus
+    a prefill time per uncached prompt token. A model built by `fake_context_cache`
+    holds a cached prefix, which it neither bills nor prefills again.
+    """
+
+    latency = 0.05
+    jitter = 0.0
+    prefill_per_token = 0.0
+    strong_latency_factor = 3.0  # "pro" models answer this much slower
+    failure_rate = 0.0
+    _failures = random.Random(0)
+
+    def __init__(self, model_name: str, cached_prefix: str = "", **kwargs):
+        self.model_name = model_name
+        self.cached_prefix = cached_prefix
+
+    def _delay(self, prompt: str) -> float:
+        rng = random.Random(zlib.crc32(prompt.encode('utf-8')))
+        latency = self.latency * (self.strong_latency_factor if "pro" in self.model_name else 1.0)
+        return max(0.0, latency + rng.uniform(-self.jitter, self.jitter))
+
+    def _prefill(self, prompt: str) -> float:
+        return self.prefill_per_token * (len(prompt) // 4)
+
+    def _answer(self, prompt: str) -> str:
+        # Only the instructions tell the prompts apart; the code may contain anything
+        prompt, _, code = prompt.partition("Code Content:")
+        if code:
+            return self._extract(code)
+        if "Quality Assurance" in prompt:
+            return "The section is consistent with the listed rules.\nVERDICT: PASS"
+        if "Lead Architect" in prompt:
+            rules = re.findall(r"'([^']{10,120})'", prompt)[:5]
+            lines = ["# Modernization Plan", "Generated by the fake backend.", ""]
+            for i, rule in enumerate(rules or ["No rules"], 1):
+                lines += [f"## Service {i}", f"Owns the rule: {rule}", ""]
+            return "\n".join(lines)
+
+        return self._extract(prompt)
+
+    @staticmethod
+    def _extract(code: str) -> str:
+        rules = []
+        for line in code.split('\n'):
+            match = re.search(r'if\s*\(?\s*([\w.]+)\s*(>|<|==|>=|<=)\s*([\d.]+)', line)
+            if match:
+                rules.append(f"- When {match.group(1)} {match.group(2)} {match.group(3)} a special rate applies")
+        return "\n".join(rules)
+
+    async def generate_content_async(self, prompt: str, stream: bool = False, **kwargs):
+        if self.failure_rate and self._failures.random() < self.failure_rate:
+            await asyncio.sleep(self.latency / 2)
+            raise ResourceExhausted("429 fake quota exceeded")
+        text = self._answer(self.cached_prefix + prompt)
+        usage = FakeUsage(prompt, text, self.cached_prefix)
+        delay = self._delay(prompt)
+        if stream:
+            chunks = max(1, len(text) // 40)
+            await asyncio.sleep(self._prefill(prompt) + delay / 2)
+            return FakeStream(text, usage, delay / 2 / chunks)
+        await asyncio.sleep(self._prefill(prompt) + delay)
+        return FakeResponse(text, usage)
+
+    def generate_content(self, prompt: str, **kwargs):
+        time.sleep(self._prefill(prompt) + self._delay(prompt))
+        text = self._answer(self.cached_prefix + prompt)
+        return FakeResponse(text, FakeUsage(prompt, text, self.cached_prefix))
+
+
+def fake_context_cache(model_name: str, prefix: str, ttl_seconds: float):
+    """Local stand-in for provider-side context caching (a ContextCache.cache_factory)."""
+    return FakeGenerativeModel(model_name, cached_prefix=prefix), lambda: None
+
+
+class FakeEmbeddingFunction(EmbeddingFunction):
+    """Hashed bag-of-words embeddings with a configurable per-batch latency."""
+
+    latency = 0.0
+    dims = 128
+
+    def __init__(self):
+        pass
+
+    def __call__(self, input: Documents) -> Embeddings:
+        if self.latency:
+            time.sleep(self.latency)
+        vectors = []
+        for text in input:
+            vector = [0.0] * self.dims
+            for word in re.findall(r'\w+', text.lower()):
+                vector[zlib.crc32(word.encode('utf-8')) % self.dims] += 1.0
+            norm = sum(v * v for v in vector) ** 0.5 or 1.0
+            vectors.append([v / norm for v in vector])
+        return vectors
+
+
+class FakeSearchBackend(SearchBackend):
+    """Search stand-in returning canned results after a configurable latency."""
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+
+    async def search(self, query: str, num_results: int) -> List[Dict[str, Any]]:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return [{
+            'title': f"{query} (result {i + 1})",
+            'link': f"https://example.invalid/{zlib.crc32(query.encode('utf-8'))}/{i}",
+            'snippet': f"Offline documentation snippet {i + 1} for {query}."
+        } for i in range(num_results)]
+
+
+@contextmanager
+def use_fake_backends(llm_latency: float = 0.05, llm_jitter: float = 0.0,
+                      embedding_latency: float = 0.0, search_latency: float = 0.0,
+                      llm_failure_rate: float = 0.0, llm_prefill_per_token: float = 0.0,
+                      context_cache: bool = False):
+    """
+    Routes all generation, embedding and search calls to the local stand-ins
+    for the duration of the block. With `context_cache`, cached prompt prefixes
+    are served by `fake_context_cache` whatever their size.
+    """
+    FakeGenerativeModel.latency = llm_latency
+    FakeGenerativeModel.prefill_per_token = llm_prefill_per_token
+    FakeGenerativeModel.jitter = llm_jitter
+    FakeGenerativeModel.failure_rate = llm_failure_rate
+    FakeEmbeddingFunction.latency = embedding_latency
+
+    saved = (LLMClient.model_factory, LLMClient.retry_base_delay,
+             VectorStore.embedding_function_factory, SearchTool.search_backend,
+             ContextCache.cache_factory, ContextCache.min_tokens, ContextCache.enabled)
+    LLMClient.model_factory = FakeGenerativeModel
+    LLMClient.retry_base_delay = llm_latency  # keep injected failures from dominating the run
+    VectorStore.embedding_function_factory = FakeEmbeddingFunction
+    VectorStore.reset_shared()
+    SearchTool.search_backend = FakeSearchBackend(search_latency)
+    ContextCache.cache_factory = fake_context_cache
+    ContextCache.min_tokens = 0
+    ContextCache.enabled = context_cache
+    try:
+        yield
+    finally:
+        VectorStore.reset_shared()
+        ContextCache.invalidate()
+        (LLMClient.model_factory, LLMClient.retry_base_delay,
+         VectorStore.embedding_function_factory, SearchTool.search_backend,
+         ContextCache.cache_factory, ContextCache.min_tokens, ContextCache.enabled) = saved
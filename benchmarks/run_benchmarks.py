@@ -0,0 +1,239 @@
+"""
+LogicMapper benchmark suite.
+
+Runs fully offline: the synthetic repository is generated locally and all model,
+embedding and search calls go to the deterministic stand-ins in benchmarks/fakes.py.
+Results are written to benchmarks/results/<commit>.json and can be compared with
+the results of another commit via --compare.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import asyncio
+import argparse
+import tempfile
+import statistics
+import subprocess
+import warnings
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+warnings.filterwarnings("ignore")
+
+from benchmarks.fakes import use_fake_backends, FakeEmbeddingFunction
+from benchmarks.synthetic_repo import generate_repo, parse_mix
+from src.agents.scanner import ScannerAgent
+from src.memory.compressor import ContextCompressor
+from src.memory.vector_store import VectorStore
+from src.tools.file_system import FileSystemTools
+from src.utils.metrics import metrics
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+
+def _percentiles(samples):
+    ordered = sorted(samples)
+    pick = lambda q: ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+    return {
+        'mean_ms': statistics.fmean(ordered) * 1000,
+        'p50_ms': pick(0.50) * 1000,
+        'p95_ms': pick(0.95) * 1000,
+        'p99_ms': pick(0.99) * 1000,
+    }
+
+
+def bench_scanner(repo: str) -> dict:
+    scanner = ScannerAgent()
+    start = time.perf_counter()
+    results = asyncio.run(scanner.scan_repository(repo))
+    elapsed = time.perf_counter() - start
+    return {'files': len(results['files']), 'seconds': elapsed, 'files_per_second': len(results['files']) / elapsed}
+
+
+def bench_compressor(repo: str) -> dict:
+    compressor = ContextCompressor()
+    files = FileSystemTools.list_files(repo)
+    contents = [(os.path.splitext(f)[1], FileSystemTools.read_file(f)) for f in files]
+
+    samples = []
+    raw_chars = compressed_chars = 0
+    for ext, content in contents:
+        start = time.perf_counter()
+        compressed = compressor.compress(content, ext)
+        samples.append(time.perf_counter() - start)
+        raw_chars += len(content)
+        compressed_chars += len(compressed)
+
+    total = sum(samples)
+    return dict(_percentiles(samples), files=len(contents), seconds=total,
+                mb_per_second=raw_chars / total / 1e6, reduction_percent=(1 - compressed_chars / raw_chars) * 100)
+
+
+def bench_vector_store(workdir: str, num_rules: int, num_queries: int) -> dict:
+    store_class = VectorStore
+    if VectorStore.backend == "numpy":
+        from src.memory.numpy_store import NumpyVectorStore
+        store_class = NumpyVectorStore
+    store = store_class(persist_directory=os.path.join(workdir, "vector_bench"),
+                        embedding_function=FakeEmbeddingFunction())
+    rules = [f"Rule {i}: customers with score over {i % 100} get {i % 30}% off" for i in range(num_rules)]
+
+    start = time.perf_counter()
+    for i in range(0, num_rules, 100):
+        store.store_rules(rules[i:i + 100], metadata={'project': 'bench', 'file': f'file_{i}.py'})
+    store_seconds = time.perf_counter() - start
+
+    samples = []
+    for i in range(num_queries):
+        start = time.perf_counter()
+        store.search_similar_rules(f"customers with score over {i % 100}", n_results=5, project='bench')
+        samples.append(time.perf_counter() - start)
+
+    return dict(_percentiles(samples), rules=num_rules, store_seconds=store_seconds,
+                rules_per_second=num_rules / store_seconds, queries=num_queries)
+
+
+def bench_end_to_end(repo: str, workdir: str, strong_model: str = None, max_tokens: int = None) -> dict:
+    from src.agents.orchestrator import OrchestratorAgent
+    from src.utils import budget
+
+    cwd = os.getcwd()
+    os.chdir(workdir)  # memory bank, state and report land in the scratch directory
+    try:
+        metrics.reset()
+        if max_tokens:
+            budget.activate(budget.RunBudget(max_tokens=max_tokens))
+        start = time.perf_counter()
+        asyncio.run(OrchestratorAgent(model_name="gemini-2.0-flash",
+                                      strong_model_name=strong_model).process_repository(repo))
+        elapsed = time.perf_counter() - start
+    finally:
+        budget.deactivate()
+        os.chdir(cwd)
+
+    snapshot = metrics.snapshot()
+    files = next((c['value'] for c in snapshot['counters'] if c['name'] == "analyst_files_total"), 0)
+    stages = {h['labels']['span']: h['sum'] for h in snapshot['histograms']
+              if h['name'] == "span_duration_seconds" and h['labels'].get('span', '').startswith('stage.')}
+    routed = {c['labels']['model']: c['value'] for c in snapshot['counters'] if c['name'] == "router_decisions_total"}
+    escalations = sum(c['value'] for c in snapshot['counters'] if c['name'] == "router_escalations_total")
+    prompt_tokens = sum(c['value'] for c in snapshot['counters'] if c['name'] == "llm_prompt_tokens_estimated_total")
+    duplicates = {c['labels']['kind']: c['value'] for c in snapshot['counters'] if c['name'] == "duplicate_files_total"}
+    llm_calls = sum(c['value'] for c in snapshot['counters'] if c['name'] == "llm_calls_total")
+    cached_tokens = sum(c['value'] for c in snapshot['counters'] if c['name'] == "llm_cached_tokens_total")
+    levels = {c['labels']['level']: c['value'] for c in snapshot['counters'] if c['name'] == "compression_level_total"}
+    calls = [h for h in snapshot['histograms']
+             if h['name'] == "span_duration_seconds" and h['labels'].get('span') == "llm.generate"]
+    call_count = sum(h['count'] for h in calls)
+    return {'files': files, 'seconds': elapsed, 'files_per_second': files / elapsed if elapsed else 0,
+            'stage_seconds': stages, 'routed_files': routed, 'escalations': escalations,
+            'llm_calls': llm_calls, 'duplicate_files': duplicates,
+            'prompt_tokens': prompt_tokens, 'cached_prompt_tokens': cached_tokens,
+            'llm_call_seconds_mean': sum(h['sum'] for h in calls) / call_count if call_count else 0,
+            'compression_levels': levels}
+
+
+def current_commit() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except Exception:
+        return "unknown"
+
+
+def compare(current: dict, baseline: dict, tolerance: float) -> list:
+    """Returns the metrics that regressed by more than `tolerance` (relative)."""
+    higher_is_better = ('files_per_second', 'mb_per_second', 'rules_per_second')
+    regressions = []
+    for bench, values in current['benchmarks'].items():
+        for metric, value in values.items():
+            old = baseline.get('benchmarks', {}).get(bench, {}).get(metric)
+            if not isinstance(value, (int, float)) or not isinstance(old, (int, float)) or not old:
+                continue
+            change = (value - old) / old
+            worse = change < -tolerance if metric in higher_is_better else (
+                metric.endswith(('_ms', 'seconds')) and change > tolerance)
+            print(f"  {bench}.{metric}: {old:.3f} -> {value:.3f} ({change * 100:+.1f}%)" + ("  ⚠️ REGRESSION" if worse else ""))
+            if worse:
+                regressions.append(f"{bench}.{metric}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="LogicMapper offline benchmark suite")
+    parser.add_argument("--files", type=int, default=200, help="Files in the synthetic repo")
+    parser.add_argument("--functions", type=int, default=8, help="Rule-bearing functions per file")
+    parser.add_argument("--mix", type=parse_mix, default=None, help="Language mix, e.g. py=0.5,java=0.5")
+    parser.add_argument("--duplicates", type=float, default=0.0, help="Share of files copied from earlier ones (vendored copies, forks)")
+    parser.add_argument("--noise", type=float, default=0.0, help="Share of files without business logic (tests, DTOs, generated)")
+    parser.add_argument("--rules", type=int, default=2000, help="Rules stored in the vector store benchmark")
+    parser.add_argument("--queries", type=int, default=200, help="Queries in the vector store benchmark")
+    parser.add_argument("--llm-latency", type=float, default=0.02, help="Fake model latency in seconds")
+    parser.add_argument("--llm-jitter", type=float, default=0.0, help="Fake model latency jitter in seconds")
+    parser.add_argument("--llm-failure-rate", type=float, default=0.0, help="Share of fake model calls failing with a 429")
+    parser.add_argument("--llm-prefill", type=float, default=0.0, help="Fake model prefill time per uncached prompt token in seconds")
+    parser.add_argument("--context-cache", action="store_true", help="Serve the invariant prompt prefix from the fake context cache")
+    parser.add_argument("--strong-model", type=str, default=None, help="Route complex files to this model (fake 'pro' models are slower)")
+    parser.add_argument("--embedding-latency", type=float, default=0.0, help="Fake embedding latency per batch")
+    parser.add_argument("--search-latency", type=float, default=0.0, help="Fake search latency per query")
+    parser.add_argument("--max-tokens", type=int, default=None, help="Token budget of the end-to-end run")
+    parser.add_argument("--memory-backend", choices=["chroma", "numpy"], default="chroma", help="Memory bank backend")
+    parser.add_argument("--only", nargs="*", default=None,
+                        choices=["scanner", "compressor", "vector_store", "end_to_end"])
+    parser.add_argument("--output", type=str, default=None, help="Results file (default: results/<commit>.json)")
+    parser.add_argument("--compare", type=str, default=None, help="Results file of a previous run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="Relative change reported as a regression")
+    args = parser.parse_args()
+
+    VectorStore.backend = args.memory_backend
+    selected = set(args.only or ["scanner", "compressor", "vector_store", "end_to_end"])
+    workdir = tempfile.mkdtemp(prefix="logicmapper_bench_")
+    repo = os.path.join(workdir, "repo")
+    results = {
+        'commit': current_commit(),
+        'timestamp': time.time(),
+        'config': {k: v for k, v in vars(args).items() if k not in ('output', 'compare')},
+        'benchmarks': {}
+    }
+
+    try:
+        results['repo'] = generate_repo(repo, args.files, args.functions, args.mix, noise=args.noise,
+                                        duplicates=args.duplicates)
+        with use_fake_backends(args.llm_latency, args.llm_jitter, args.embedding_latency, args.search_latency,
+                               args.llm_failure_rate, args.llm_prefill, args.context_cache):
+            if "scanner" in selected:
+                results['benchmarks']['scanner'] = bench_scanner(repo)
+            if "compressor" in selected:
+                results['benchmarks']['compressor'] = bench_compressor(repo)
+            if "vector_store" in selected:
+                results['benchmarks']['vector_store'] = bench_vector_store(workdir, args.rules, args.queries)
+            if "end_to_end" in selected:
+                results['benchmarks']['end_to_end'] = bench_end_to_end(repo, workdir, args.strong_model, args.max_tokens)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    output = args.output or os.path.join(RESULTS_DIR, f"{results['commit']}.json")
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+
+    print("\n" + "=" * 50)
+    print(json.dumps(results['benchmarks'], indent=2))
+    print(f"Results written to {output}")
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        print(f"\nComparison against {baseline.get('commit', args.compare)}:")
+        if baseline.get('config') != results['config']:
+            print("⚠️ Benchmark configuration differs from the baseline; deltas may not be comparable")
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"❌ {len(regressions)} regression(s): {', '.join(regressions)}")
+            sys.exit(1)
+        print("✅ No regressions")
+
+
+if __name__ == "__main__":
+    main()
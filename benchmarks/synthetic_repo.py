@@ -0,0 +1,178 @@
+import os
+import random
+import argparse
+from typing import Dict
+
+# Extension -> share of files when no mix is given
+DEFAULT_MIX = {'.py': 0.4, '.java': 0.3, '.js': 0.1, '.ts': 0.1, '.cpp': 0.05, '.h': 0.05}
+
+ENTITIES = ["customer", "order", "invoice", "account", "policy", "shipment", "employee", "loan"]
+FIELDS = ["amount", "balance", "tenure", "age", "quantity", "weight", "score", "days_overdue"]
+
+
+def _rule(rng: random.Random) -> Dict[str, str]:
+    entity = rng.choice(ENTITIES)
+    field = rng.choice(FIELDS)
+    return {
+        'entity': entity,
+        'field': field,
+        'limit': str(rng.choice([5, 10, 50, 100, 250, 1000])),
+        'rate': f"0.{rng.randint(1, 95):02d}",
+        'name': f"{entity}_{field}_rule_{rng.randint(0, 9999)}"
+    }
+
+
+def _python_file(rng: random.Random, functions: int, index: int, modules: int) -> str:
+    lines = [f'"""Legacy module {index} (generated)."""', "import os", "import logging"]
+    for _ in range(rng.randint(0, 2)):
+        lines.append(f"from pkg.module_{rng.randrange(modules)} import helper")
+    lines.append("")
+    for _ in range(functions):
+        r = _rule(rng)
+        lines += [
+            f"def {r['name']}({r['entity']}):",
+            f"    # Business rule: {r['entity']} {r['field']} over {r['limit']} gets {r['rate']}",
+            f"    logging.info('evaluating {r['name']}')",
+            f"    if {r['entity']}.{r['field']} > {r['limit']}:",
+            f"        return {r['entity']}.{r['field']} * {r['rate']}",
+            f"    return 0",
+            "",
+        ]
+    return "\n".join(lines)
+
+
+def _c_style_file(rng: random.Random, functions: int, index: int, modules: int, ext: str) -> str:
+    if ext == '.java':
+        header = [f"package legacy;", "import java.util.List;", f"public class Module{index} {{"]
+        footer = ["}"]
+        signature = "    public double {name}(double {field}) {{"
+    elif ext in ('.js', '.ts'):
+        header = [f"import {{ helper }} from './module_{rng.randrange(modules)}';"]
+        footer = []
+        signature = "function {name}({field}) {{"
+    else:
+        header = [f'#include "module_{rng.randrange(modules)}.h"', "#include <stdio.h>"]
+        footer = []
+        signature = "double {name}(double {field}) {{"
+
+    lines = list(header)
+    for _ in range(functions):
+        r = _rule(rng)
+        lines += [
+            "    /* Business rule (generated) */",
+            signature.format(name=r['name'], field=r['field']),
+            f"        // {r['entity']} {r['field']} limit",
+            f"        if ({r['field']} > {r['limit']}) {{",
+            f"            return {r['field']} * {r['rate']};",
+            "        }",
+            "        return 0;",
+            "    }",
+            "",
+        ]
+    return "\n".join(lines + footer)
+
+
+def _noise_file(rng: random.Random, index: int, ext: str):
+    """A file without business logic: a test, a data class, a declaration or generated code."""
+    entity = rng.choice(ENTITIES)
+    kind = rng.choice(["test", "dto", "generated"])
+    if kind == "test":
+        name = f"test_module_{index}.py" if ext == '.py' else f"module_{index}.test{ext}"
+        return os.path.join("tests", name), f"def test_{entity}():\n    assert {entity}_rule({entity}) == 0\n"
+    if kind == "generated":
+        return os.path.join("pkg", f"module_{index}_pb2{ext}"), f"# Generated by the protocol buffer compiler.  DO NOT EDIT!\n{entity} = None\n"
+    if ext == '.py':
+        fields = "\n".join(f"    {f}: float" for f in FIELDS[:4])
+        return os.path.join("pkg", f"{entity}_dto_{index}.py"), f"from dataclasses import dataclass\n\n@dataclass\nclass {entity.title()}:\n{fields}\n"
+    fields = "\n".join(f"    double get{f.title()}();" for f in FIELDS[:4])
+    return os.path.join("pkg", f"{entity.title()}Dto{index}{ext}"), f"public interface {entity.title()}Dto{index} {{\n{fields}\n}}\n"
+
+
+def _copy_file(rng: random.Random, content: str, ext: str, index: int) -> str:
+    """A vendored or per-client copy: new header comment, sometimes one changed line."""
+    comment = "#" if ext == '.py' else "//"
+    lines = [f"{comment} Copied for client {index} on 20{rng.randint(10, 24)}-0{rng.randint(1, 9)}-1{rng.randint(0, 9)}"]
+    lines += content.split('\n')
+    if rng.random() < 0.5:
+        # A renamed local helper call, as forks tend to accumulate
+        lines = [line.replace("evaluating", "checking", 1) for line in lines]
+    return "\n".join(lines)
+
+
+def generate_repo(root: str, num_files: int = 200, functions_per_file: int = 8,
+                  language_mix: Dict[str, float] = None, seed: int = 42, noise: float = 0.0,
+                  duplicates: float = 0.0) -> Dict[str, int]:
+    """
+    Writes a synthetic legacy repository to `root`.
+
+    Args:
+        root: Target directory (created if missing)
+        num_files: Number of source files to generate
+        functions_per_file: Rule-bearing functions per file
+        language_mix: Mapping of extension to share of files
+        noise: Share of files without business logic (tests, data classes, generated code)
+        duplicates: Share of files that are copies of an earlier file (vendored, per-client forks)
+        seed: Random seed, so the same arguments always produce the same repo
+
+    Returns:
+        Number of generated files per extension
+    """
+    rng = random.Random(seed)
+    mix = language_mix or DEFAULT_MIX
+    extensions = list(mix.keys())
+    weights = list(mix.values())
+    counts: Dict[str, int] = {}
+    originals = []
+
+    for index in range(num_files):
+        ext = rng.choices(extensions, weights)[0]
+        if noise and rng.random() < noise:
+            rel_path, content = _noise_file(rng, index, ext)
+            os.makedirs(os.path.dirname(os.path.join(root, rel_path)), exist_ok=True)
+            with open(os.path.join(root, rel_path), 'w', encoding='utf-8') as f:
+                f.write(content)
+            counts['noise'] = counts.get('noise', 0) + 1
+            continue
+        package = os.path.join(root, "pkg", f"area_{index % 10}")
+        if duplicates and originals and rng.random() < duplicates:
+            original, ext = rng.choice(originals)
+            with open(original, 'r', encoding='utf-8') as f:
+                content = _copy_file(rng, f.read(), ext, index)
+            package = os.path.join(root, "clients", f"client_{index % 7}")
+            counts['duplicate'] = counts.get('duplicate', 0) + 1
+        elif ext == '.py':
+            content = _python_file(rng, functions_per_file, index, num_files)
+        else:
+            content = _c_style_file(rng, functions_per_file, index, num_files, ext)
+        os.makedirs(package, exist_ok=True)
+        path = os.path.join(package, f"module_{index}{ext}")
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(content)
+        if not package.startswith(os.path.join(root, "clients")):
+            originals.append((path, ext))
+        counts[ext] = counts.get(ext, 0) + 1
+
+    return counts
+
+
+def parse_mix(value: str) -> Dict[str, float]:
+    """Parses a mix such as 'py=0.5,java=0.5'."""
+    mix = {}
+    for part in value.split(','):
+        ext, share = part.split('=')
+        mix['.' + ext.strip().lstrip('.')] = float(share)
+    return mix
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a synthetic legacy repository")
+    parser.add_argument("root", help="Output directory")
+    parser.add_argument("--files", type=int, default=200)
+    parser.add_argument("--functions", type=int, default=8)
+    parser.add_argument("--mix", type=parse_mix, default=None, help="e.g. py=0.5,java=0.3,cpp=0.2")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--noise", type=float, default=0.0, help="Share of files without business logic")
+    parser.add_argument("--duplicates", type=float, default=0.0, help="Share of files copied from earlier ones")
+    args = parser.parse_args()
+
+    print(generate_repo(args.root, args.files, args.functions, args.mix, args.seed, args.noise, args.duplicates))
@@ -9,6 +9,9 @@ def clean_state():
     targets = [
         "chroma_db_data",
         "project_state.json",
+        "rule_store.db",
+        "rule_store.db-wal",
+        "rule_store.db-shm",
         "final_report.md",
         "crash.log"
     ]
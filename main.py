@@ -1,55 +1,90 @@
 import os
+import sys
 import asyncio
 import argparse
+import subprocess
 from dotenv import load_dotenv
 
-# --- CHANGED: Using the AI Studio SDK (Simpler, Free Tier friendly) ---
-import google.generativeai as genai
-
 # LogicMapper Internal Imports
-from src.agents.orchestrator import OrchestratorAgent
+# The agents (and through them the Gemini SDK and chromadb) are imported when a
+# run starts, so `--help` and argument errors return immediately.
 from src.utils.logger import setup_logger
+from src.utils import logger as logging_backend
+from src.utils.streaming import ReportStream
+from src.utils.metrics import metrics
+from src.tools import cassette
+from src.tools.llm_client import LLMClient
+from src.tools.context_cache import ContextCache
+from src.tools.search_tool import SearchTool
+from src.tools.library_index import LibraryIndex
+from src.state.rule_store import RuleStore
+from src.state.work_queue import WorkQueue
+from src.utils import budget
+from src.memory.vector_store import VectorStore
 
 # Setup Observability
 logger = setup_logger("LogicMapper_Main")
 
-def init_app():
+def init_app(offline: bool = False):
     """Initializes the Google Gemini API Environment"""
     load_dotenv()
     
     # We only need the API Key now, not the Project ID
     api_key = os.getenv("GOOGLE_API_KEY")
     
+    if offline:
+        logger.info("📼 Replaying recorded interactions; no API key needed.")
+        return
+    
     if not api_key:
         raise ValueError("❌ GOOGLE_API_KEY not found in .env file. Get one at https://aistudio.google.com/")
 
+    # --- CHANGED: Using the AI Studio SDK (Simpler, Free Tier friendly) ---
+    import google.generativeai as genai
+    
     # Configure the global SDK with your key
     genai.configure(api_key=api_key)
     logger.info(f"✅ Google AI Studio Configured successfully.")
 
-async def run_modernization_task(repo_url: str):
+async def run_modernization_task(repo_url: str, stream: bool = False,
+                                 model_name: str = "gemini-2.0-flash", strong_model_name: str = None,
+                                 prefilter: bool = True, slice_logic: bool = False, dedupe_files: bool = True,
+                                 work_queue: str = None):
     """
     The Main Workflow:
     1. Orchestrator receives the Repo
     2. Spawns Scanners (Parallel)
     3. Spawns Analyst (Sequential)
     4. Returns Report
+    
+    With `stream`, the report is printed and written to final_report.md while it is
+    being generated, so a partial report is kept if the run is interrupted.
+    With `work_queue`, the files are analyzed by worker processes polling that queue.
     """
     logger.info(f"🚀 Starting Modernization Task for: {repo_url}")
+    from src.agents.orchestrator import OrchestratorAgent
 
     # Initialize the Brain (The Orchestrator)
-    orchestrator = OrchestratorAgent(model_name="gemini-2.0-flash")
+    orchestrator = OrchestratorAgent(model_name=model_name, strong_model_name=strong_model_name,
+                                     prefilter=prefilter, slice_logic=slice_logic, dedupe_files=dedupe_files,
+                                     work_queue=WorkQueue(work_queue) if work_queue else None)
 
     try:
-        # Run the Agentic Workflow
-        final_report = await orchestrator.process_repository(repo_url)
-        
-        # Output the result
-        print("\n" + "="*50)
-        print("🎉 MODERNIZATION STRATEGY GENERATED")
-        print("="*50)
-        print(final_report)
-        print("="*50 + "\n")
+        if stream:
+            with ReportStream(report_path="final_report.md") as report_stream:
+                final_report = await orchestrator.process_repository(repo_url, on_chunk=report_stream.write)
+            print("\n" + "="*50 + "\n")
+        else:
+            # Run the Agentic Workflow
+            final_report = await orchestrator.process_repository(repo_url)
+            
+            # Output the result after the queued log lines
+            logging_backend.flush()
+            print("\n" + "="*50)
+            print("🎉 MODERNIZATION STRATEGY GENERATED")
+            print("="*50)
+            print(final_report)
+            print("="*50 + "\n")
         
         # Save output
         with open("final_report.md", "w", encoding='utf-8') as f:
@@ -59,16 +94,167 @@ async def run_modernization_task(repo_url: str):
     except Exception as e:
         logger.error(f"❌ Workflow Failed: {str(e)}")
 
+async def run_worker(work_queue: str, model_name: str = "gemini-2.0-flash", strong_model_name: str = None,
+                     worker_id: str = None, concurrency: int = 1, lease_seconds: float = 120.0,
+                     idle_exit: float = 60.0):
+    """Analyzes files of distributed runs from the work queue until it stays empty for `idle_exit` seconds."""
+    from src.agents.distributed import AnalysisWorker
+
+    worker = AnalysisWorker(WorkQueue(work_queue), model_name, strong_model_name, worker_id=worker_id,
+                            concurrency=concurrency, lease_seconds=lease_seconds, idle_exit=idle_exit or None)
+    await worker.run()
+
+def start_local_workers(count: int, args: argparse.Namespace) -> list:
+    """Starts `count` worker processes on this machine for the run's work queue."""
+    command = [sys.executable, os.path.abspath(__file__), "--worker", "--work-queue", args.work_queue,
+               "--model", args.model, "--worker-concurrency", str(args.worker_concurrency),
+               "--lease-seconds", str(args.lease_seconds), "--worker-idle-exit", str(args.worker_idle_exit),
+               "--library-index", args.library_index, "--log-level", args.log_level]
+    if args.strong_model:
+        command += ["--strong-model", args.strong_model]
+    if args.no_library_index:
+        command.append("--no-library-index")
+    logger.info(f"👷 Starting {count} local workers")
+    if LibraryIndex.enabled:
+        # Built once here rather than by every worker at the same time
+        LibraryIndex.shared().open()
+    return [subprocess.Popen(command) for _ in range(count)]
+
+def stop_local_workers(workers: list):
+    """Stops local worker processes; a worker killed mid-file only loses its lease."""
+    for process in workers:
+        process.terminate()
+    for process in workers:
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+def search_memory(query: str, project: str = None, mode: str = "lexical", limit: int = 10):
+    """Prints the memory bank rules matching a query (see VectorStore.search_rules)."""
+    hits = VectorStore.shared().search_rules(query, n_results=limit, project=project,
+                                             all_projects=project is None, mode=mode)
+    logging_backend.flush()
+    if not hits:
+        print(f"No rules in the memory bank match '{query}'.")
+    for rank, hit in enumerate(hits, 1):
+        metadata = hit['metadata'] or {}
+        source = metadata.get('sources') or metadata.get('file') or ''
+        print(f"{rank}. {hit['rule']}")
+        print(f"   {metadata.get('project', '')} {source} ({hit['match']})".rstrip())
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="LogicMapper CLI")
-    parser.add_argument("--repo", type=str, required=True, help="URL or Path to legacy code")
+    parser.add_argument("--repo", type=str, help="URL or Path to legacy code")
+    parser.add_argument("--stream", action="store_true", help="Stream the report to the console and final_report.md as it is generated")
+    parser.add_argument("--profile", type=str, metavar="PATH", help="Write timing spans, token counts and cache metrics to PATH (JSON) and a .prom file next to it")
+    parser.add_argument("--model", type=str, default="gemini-2.0-flash", help="Model used by every agent (and for simple files)")
+    parser.add_argument("--strong-model", type=str, default=None, help="Stronger model for complex files and escalations, e.g. gemini-1.5-pro-latest")
+    parser.add_argument("--no-prefilter", action="store_true", help="Analyze every code file, including tests, generated code and declarations")
+    parser.add_argument("--no-file-dedup", action="store_true", help="Analyze every copy of duplicated files instead of one representative per group")
+    parser.add_argument("--slice-logic", action="store_true", help="Send only the business-logic slice of each file (conditionals, arithmetic, constants and their signatures) to the model")
+    parser.add_argument("--memory-backend", choices=["chroma", "numpy"], default="chroma", help="Memory bank backend: ChromaDB or the in-process NumPy memory-mapped index")
+    parser.add_argument("--memory-max-rules", type=int, default=None, metavar="N", help="Evict the least recently used rules when the memory bank grows past N rules")
+    parser.add_argument("--memory-max-age-days", type=float, default=None, metavar="DAYS", help="Evict rules neither stored nor recalled within DAYS")
+    parser.add_argument("--memory-prune", action="store_true", help="Apply the memory bank caps and compact it")
+    parser.add_argument("--memory-import", type=str, metavar="SNAPSHOT", help="Load a memory bank snapshot (.npz), e.g. a pre-warmed bank, before the run")
+    parser.add_argument("--memory-export", type=str, metavar="SNAPSHOT", help="Write the memory bank to a compact snapshot (.npz) after the run")
+    parser.add_argument("--memory-search", type=str, metavar="QUERY", help="Print the memory bank rules matching QUERY (words, identifiers or file paths) and exit")
+    parser.add_argument("--memory-project", type=str, default=None, metavar="NAME", help="Only search this project's rules with --memory-search (all projects by default)")
+    parser.add_argument("--memory-search-mode", choices=["lexical", "auto", "vector"], default="lexical", help="lexical: local full-text search only; auto: add vector search when full-text finds too few rules; vector: embeddings only (auto and vector need GOOGLE_API_KEY)")
+    parser.add_argument("--memory-search-limit", type=int, default=10, metavar="N", help="Rules printed by --memory-search")
+    parser.add_argument("--max-tokens", type=int, default=None, metavar="N", help="Token budget (prompt + response) for the run; files are compressed harder to stay within it")
+    parser.add_argument("--max-cost", type=float, default=None, metavar="USD", help="Estimated model cost budget for the run in USD")
+    parser.add_argument("--max-seconds", type=float, default=None, metavar="SECONDS", help="Wall-clock budget for the run")
+    parser.add_argument("--context-cache-ttl", type=float, default=ContextCache.ttl_seconds, metavar="SECONDS", help="Lifetime of the provider-side cache of the invariant Analyst instructions")
+    parser.add_argument("--no-context-cache", action="store_true", help="Send the Analyst instructions inline with every prompt instead of caching them")
+    parser.add_argument("--llm-timeout", type=float, default=LLMClient.timeout, help="Per-attempt timeout for model calls in seconds")
+    parser.add_argument("--hedge-after", type=float, default=None, metavar="SECONDS", help="Send a hedged duplicate model request when a call takes longer than SECONDS")
+    parser.add_argument("--search-concurrency", type=int, default=SearchTool.max_concurrency, metavar="N", help="Web searches in flight at once")
+    parser.add_argument("--search-timeout", type=float, default=SearchTool.timeout, metavar="SECONDS", help="Longest a library lookup may take (including the wait for a free slot) before it is skipped")
+    parser.add_argument("--library-index", type=str, default=LibraryIndex.default_path, metavar="PATH", help="Local knowledge index of installed libraries, consulted before web searches (built on first use)")
+    parser.add_argument("--library-dump", type=str, default=None, metavar="JSONL", help="Curated library descriptions (one JSON object per line with name, summary, api, aliases) merged into the library index")
+    parser.add_argument("--no-library-index", action="store_true", help="Look up unknown libraries on the web only")
+    parser.add_argument("--rule-store", type=str, default=RuleStore.default_path, metavar="PATH", help="SQLite file the rules of each analyzed file are written to as they are extracted")
+    parser.add_argument("--work-queue", type=str, default=None, metavar="PATH", help="Distribute the file analysis over worker processes through a SQLite work queue at PATH (on a file system every worker can reach)")
+    parser.add_argument("--local-workers", type=int, default=0, metavar="N", help="With --work-queue, start N worker processes on this machine")
+    parser.add_argument("--worker", action="store_true", help="Run as a worker analyzing files from --work-queue, using this machine's GOOGLE_API_KEY and --model settings")
+    parser.add_argument("--worker-id", type=str, default=None, help="Name of this worker in leases and logs (host and pid by default)")
+    parser.add_argument("--worker-concurrency", type=int, default=1, metavar="N", help="Files a worker analyzes at once")
+    parser.add_argument("--lease-seconds", type=float, default=120.0, metavar="SECONDS", help="How long a worker may go without a heartbeat before its file is handed to another worker")
+    parser.add_argument("--worker-idle-exit", type=float, default=60.0, metavar="SECONDS", help="Stop a worker after SECONDS without work (0 = keep waiting)")
+    parser.add_argument("--log-level", choices=["DEBUG", "INFO", "WARNING", "ERROR"], default="INFO", help="Minimum level of log messages")
+    parser.add_argument("--log-json", action="store_true", help="Log one JSON object per line with run, file and stage fields")
+    parser.add_argument("--log-rate-limit", type=float, default=20.0, metavar="N", help="Messages per second each per-file INFO/DEBUG log line may print; the rest are counted (0 = unlimited)")
+    tape_group = parser.add_mutually_exclusive_group()
+    tape_group.add_argument("--record", type=str, metavar="CASSETTE", help="Record all model, embedding and search interactions to CASSETTE (.jsonl.gz)")
+    tape_group.add_argument("--replay", type=str, metavar="CASSETTE", help="Replay interactions from CASSETTE fully offline")
     
     args = parser.parse_args()
+    maintenance = args.memory_prune or args.memory_import or args.memory_export or args.memory_search
+    if not args.repo and not maintenance and not args.worker:
+        parser.error("--repo is required unless running a --worker or only maintaining the memory bank (--memory-prune/--memory-import/--memory-export/--memory-search)")
+    if (args.worker or args.local_workers) and not args.work_queue:
+        parser.error("--worker and --local-workers need --work-queue")
     
     # Run the setup
+    logging_backend.configure(level=args.log_level, json_lines=args.log_json, rate_limit=args.log_rate_limit)
+    VectorStore.backend = args.memory_backend
+    VectorStore.max_rules = args.memory_max_rules
+    VectorStore.max_age_days = args.memory_max_age_days
+    LLMClient.timeout = args.llm_timeout
+    LLMClient.hedge_after = args.hedge_after
+    ContextCache.ttl_seconds = args.context_cache_ttl
+    ContextCache.enabled = not args.no_context_cache
+    SearchTool.max_concurrency = args.search_concurrency
+    SearchTool.timeout = args.search_timeout
+    LibraryIndex.default_path = args.library_index
+    LibraryIndex.curated_path = args.library_dump
+    LibraryIndex.enabled = not args.no_library_index
+    RuleStore.default_path = args.rule_store
+    
     try:
-        init_app()
-        # Run the async workflow
-        asyncio.run(run_modernization_task(args.repo))
+        if args.record:
+            cassette.activate(args.record, "record")
+        elif args.replay:
+            cassette.activate(args.replay, "replay")
+        if args.memory_import:
+            VectorStore.shared().import_snapshot(args.memory_import)
+        if args.memory_prune:
+            VectorStore.shared().prune()
+        if args.worker:
+            init_app(offline=bool(args.replay))
+            if args.max_tokens or args.max_cost or args.max_seconds:
+                budget.activate(budget.RunBudget(args.max_tokens, args.max_cost, args.max_seconds))
+            asyncio.run(run_worker(args.work_queue, model_name=args.model, strong_model_name=args.strong_model,
+                                   worker_id=args.worker_id, concurrency=args.worker_concurrency,
+                                   lease_seconds=args.lease_seconds, idle_exit=args.worker_idle_exit))
+        if args.repo:
+            init_app(offline=bool(args.replay))
+            if args.max_tokens or args.max_cost or args.max_seconds:
+                budget.activate(budget.RunBudget(args.max_tokens, args.max_cost, args.max_seconds))
+            workers = start_local_workers(args.local_workers, args) if args.local_workers else []
+            try:
+                # Run the async workflow
+                asyncio.run(run_modernization_task(args.repo, stream=args.stream,
+                                                   model_name=args.model, strong_model_name=args.strong_model,
+                                                   prefilter=not args.no_prefilter, slice_logic=args.slice_logic,
+                                                   dedupe_files=not args.no_file_dedup, work_queue=args.work_queue))
+            finally:
+                stop_local_workers(workers)
+        if args.memory_export:
+            VectorStore.shared().export_snapshot(args.memory_export)
+        if args.memory_search:
+            if args.memory_search_mode != "lexical":
+                init_app(offline=bool(args.replay))
+            search_memory(args.memory_search, args.memory_project, args.memory_search_mode, args.memory_search_limit)
     except Exception as e:
-        print(f"Critical Error: {e}")
\ No newline at end of file
+        print(f"Critical Error: {e}")
+    finally:
+        # Cached prefixes are billed for storage until they expire
+        ContextCache.invalidate()
+        cassette.deactivate()
+        budget.deactivate()
+        if args.profile:
+            json_path, prom_path = metrics.write(args.profile)
+            logger.info(f"📈 Profile written to {json_path} and {prom_path}")
\ No newline at end of file
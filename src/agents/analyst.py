@@ -1,59 +1,199 @@
 import os
-import google.generativeai as genai
-from typing import List, Dict, Any
-from src.utils.logger import setup_logger
+import asyncio
+from typing import List, Dict, Any, Optional, Union
+from src.utils.logger import setup_logger, log_context
+from src.tools.model_router import ModelRouter, BRANCH_PATTERN, NUMBER_PATTERN
+from src.tools.cassette import CassetteMismatchError
 from src.tools.file_system import FileSystemTools
 from src.tools.search_tool import SearchTool
-from src.memory.compressor import ContextCompressor
+from src.tools.library_index import LibraryIndex
+from src.memory.compressor import ContextCompressor, COMPRESSION_LEVELS
 from src.memory.vector_store import VectorStore
+from src.memory.deduplicator import RuleDeduplicator
+from src.state.rule_store import RuleStore
+from src.state.work_queue import RunResults
+from src.utils.metrics import metrics
+from src.utils import budget
+from src.utils.budget import token_counter
 
 logger = setup_logger("AnalystAgent")
 
+# Tokens of the extraction prompt besides the code (instructions, memory and dependency context)
+PROMPT_OVERHEAD_TOKENS = 400
+
+# Invariant start of every extraction prompt. It comes first and never varies per
+# file, so it can be served from the provider's context cache (see ContextCache).
+EXTRACTION_INSTRUCTIONS = """You are analyzing the files of a legacy code base one at a time.
+
+Extract all BUSINESS RULES found in the code file given below.
+A business rule is a specific logic statement that dictates how the business operates (e.g., "VIPs get 20% off", "Tax is 5%").
+Ignore boilerplate, imports, and technical setup.
+Library documentation, similar rules from earlier analyses and rules of the files this file
+depends on may be given with the file; use them to interpret the code, not as rules of their own.
+
+Format your response as a simple list of strings, one per line.
+"""
+
 class AnalystAgent:
-    def __init__(self, model_name: str = "gemini-2.0-flash"):
-        self.model = genai.GenerativeModel(model_name)
+    def __init__(self, model_name: str = "gemini-2.0-flash", strong_model_name: Optional[str] = None,
+                 vector_store: Optional[VectorStore] = None, min_compression_level: int = 0,
+                 rule_store: Optional[RuleStore] = None):
+        """
+        Initializes the Analyst Agent.
+
+        Args:
+            model_name: Fast model used for simple files
+            strong_model_name: Stronger model for complex files and rejected answers (None uses model_name for everything)
+            vector_store: Memory bank to use (the process-wide shared one by default)
+            min_compression_level: Index into COMPRESSION_LEVELS every file is compressed with at least
+                (the last level sends only the logic slice of each file)
+            rule_store: On-disk store the rules of each file are written to (the process-wide shared one by default)
+        """
+        self.router = ModelRouter(model_name, strong_model_name)
+        self.llm = self.router.client(model_name)
         self.search_tool = SearchTool()
+        self.library_index = LibraryIndex.shared()
         self.compressor = ContextCompressor()
-        self.vector_store = VectorStore()
+        self.min_compression_level = min_compression_level
+        self.vector_store = vector_store or VectorStore.shared()
+        self.deduplicator = RuleDeduplicator()
+        self.rule_store = rule_store or RuleStore.shared()
+        self.canonical_rules: List[Dict[str, Any]] = []
+        self.failed_files: Dict[str, str] = {}
+        # Project the memory bank is scoped to, from the scan results (None searches every project)
+        self.project: Optional[str] = None
 
-    async def analyze_logic(self, scan_results: Dict[str, Any]) -> List[str]:
+    async def analyze_logic(self, scan_results: Dict[str, Any]) -> RuleStore:
         """
         Analyzes the scanned files to extract business logic.
+        
+        Copies of other files (scan_results['duplicates'], see DuplicateFileDetector)
+        are not in the file list; they take over the rules of their representative.
+        
+        The rules of each file are written to the rule store as soon as they are
+        extracted rather than collected in memory.
+        
+        Returns:
+            The rule store, holding the rules of every file and the deduplicated canonical rules
         """
         logger.info("🧠 Analyst starting logic extraction...")
         
         files = scan_results.get("files", [])
         base_path = scan_results.get("path", "")
+        # Files come leaves-first when a dependency graph is available
+        dependencies = scan_results.get("dependencies", {})
+        self.project = scan_results.get("project")
         
-        all_rules = []
+        self.rule_store.clear()
+        self.failed_files = {}
         
-        for file_rel_path in files:
-            full_path = os.path.join(base_path, file_rel_path) if base_path else file_rel_path
-            
-            # Skip if not a file or if it's too large (basic check)
-            if not os.path.exists(full_path):
-                continue
-                
-            content = FileSystemTools.read_file(full_path)
-            if not content or content.startswith("Error"):
+        for index, file_rel_path in enumerate(files):
+            try:
+                rules = await self.analyze_file(file_rel_path, base_path, dependencies.get(file_rel_path, []),
+                                                remaining_files=len(files) - index)
+            except CassetteMismatchError:
+                raise
+            except Exception as e:
+                # Retries are exhausted at this point; record the loss instead of treating it as "no rules"
+                self.record_failure(file_rel_path, f"{type(e).__name__}: {e}")
                 continue
+            if rules is not None:
+                with metrics.span("analyst.store_rules"):
+                    self.rule_store.add_file(file_rel_path, rules)
+        
+        return self.finish_analysis(scan_results)
+
+    async def analyze_file(self, file_rel_path: str, base_path: str = "", imported_files: Optional[List[str]] = None,
+                           remaining_files: int = 1,
+                           dependency_rules: Optional[Union[RuleStore, RunResults]] = None) -> Optional[List[str]]:
+        """
+        Extracts the business rules of a single file.
+        
+        Args:
+            file_rel_path: File to analyze, relative to base_path
+            base_path: Root of the scanned repository
+            imported_files: Files it imports, whose rules are given as context when already extracted
+            remaining_files: Files left to analyze including this one, to spread the run budget
+            dependency_rules: Where the rules of imported files are looked up (the rule store
+                by default, the finished tasks of the run on a distributed worker)
+        
+        Returns:
+            The rules, or None when the file cannot be read. Raises when the extraction
+            failed after retries.
+        """
+        full_path = os.path.join(base_path, file_rel_path) if base_path else file_rel_path
+        
+        # Skip if not a file or if it's too large (basic check)
+        if not os.path.exists(full_path):
+            return None
             
-            # Compress the content to reduce token usage
-            file_ext = os.path.splitext(file_rel_path)[1]
-            compressed_content = self.compressor.compress(content, file_ext)
-                
+        with metrics.span("analyst.read_file"):
+            content = FileSystemTools.read_file(full_path)
+        if not content or content.startswith("Error"):
+            return None
+        
+        file_ext = os.path.splitext(file_rel_path)[1]
+        with log_context(file=file_rel_path):
             logger.info(f"Analyzing file: {file_rel_path}")
-            rules = await self._extract_rules_from_file(file_rel_path, compressed_content)
-            all_rules.extend(rules)
-            
-            # Store rules in long-term memory
-            if rules:
-                self.vector_store.store_rules(rules, metadata={'file': file_rel_path})
-            
-        logger.info(f"✅ Analysis complete. Extracted {len(all_rules)} rules.")
-        return all_rules
+            # Compress the content to reduce token usage, harder when the run budget is tight
+            with metrics.span("analyst.compress"):
+                compressed_content = self._compress_for_budget(content, file_ext, remaining_files)
+            metrics.incr("analyst_chars_total", len(content), {'stage': 'raw'})
+            metrics.incr("analyst_chars_total", len(compressed_content), {'stage': 'compressed'})
+        
+            with metrics.span("analyst.file", file=file_rel_path):
+                rules = await self._extract_rules_from_file(
+                    file_rel_path, compressed_content,
+                    self._dependency_context(imported_files or [], dependency_rules or self.rule_store)
+                )
+        metrics.incr("analyst_files_total")
+        metrics.incr("analyst_rules_total", len(rules))
+        return rules
+
+    def record_failure(self, file_rel_path: str, error: str):
+        """Records a file whose rules could not be extracted, so they are reported as missing."""
+        with log_context(file=file_rel_path):
+            logger.error(f"Failed to analyze {file_rel_path}: {error}")
+        self.failed_files[file_rel_path] = error
+        metrics.incr("analyst_failed_files_total")
 
-    async def _extract_rules_from_file(self, filename: str, content: str) -> List[str]:
+    def finish_analysis(self, scan_results: Dict[str, Any]) -> RuleStore:
+        """
+        Completes an analysis once the rules of every file are in the rule store:
+        adds the copies of duplicated files, deduplicates the rules and stores the
+        canonical ones in long-term memory.
+        
+        Returns:
+            The rule store
+        """
+        source = {'project': self.project, 'repo': scan_results.get("repo"), 'commit': scan_results.get("commit")}
+        
+        # Copies of analyzed files share their rules, so the copies are listed as sources too
+        for duplicate, group in scan_results.get("duplicates", {}).items():
+            self.rule_store.add_duplicate(duplicate, group['of'])
+        
+        # Collapse the same rule extracted from many files into one canonical rule
+        with metrics.span("analyst.deduplicate"):
+            self.canonical_rules = self.deduplicator.deduplicate(self.rule_store.iter_rules_by_file())
+            self.rule_store.set_canonical(self.canonical_rules)
+        
+        # Store the canonical rules in long-term memory, keeping every source file
+        if self.canonical_rules:
+            self.vector_store.store_rules(
+                [canonical['rule'] for canonical in self.canonical_rules],
+                metadatas=[
+                    dict(source, file=canonical['sources'][0], sources=', '.join(canonical['sources']),
+                         language=FileSystemTools.language_of(canonical['sources'][0]))
+                    for canonical in self.canonical_rules
+                ]
+            )
+        
+        if self.failed_files:
+            logger.warning(f"⚠️ {len(self.failed_files)} files could not be analyzed")
+        logger.info(f"✅ Analysis complete. Extracted {len(self.canonical_rules)} rules.")
+        return self.rule_store
+
+    async def _extract_rules_from_file(self, filename: str, content: str, dependency_context: str = "") -> List[str]:
         # Check if the code contains any obscure libraries that need research
         search_context = await self._research_unknown_libraries(content)
         
@@ -61,16 +201,11 @@ class AnalystAgent:
         memory_context = self._get_memory_context(filename)
         
         prompt = f"""
-        Analyze the following code file: '{filename}'
-        
-        Extract all BUSINESS RULES found in this code.
-        A business rule is a specific logic statement that dictates how the business operates (e.g., "VIPs get 20% off", "Tax is 5%").
-        Ignore boilerplate, imports, and technical setup.
+        Code file: '{filename}'
         
         {search_context}
         {memory_context}
-        
-        Format your response as a simple list of strings, one per line.
+        {dependency_context}
         
         Code Content:
         ```
@@ -78,15 +213,72 @@ class AnalystAgent:
         ```
         """
         
-        try:
-            response = self.model.generate_content(prompt)
-            # Basic parsing: split by newlines and clean up
-            rules = [line.strip().lstrip('- ').strip() for line in response.text.split('\n') if line.strip()]
-            return rules
-        except Exception as e:
-            logger.error(f"Failed to analyze {filename}: {e}")
-            return []
+        # Failures propagate (after the client's retries) so the caller can record them
+        response_text = await self.router.generate(
+            prompt, content, is_valid=lambda text: self._is_valid_extraction(text, content),
+            prefix=EXTRACTION_INSTRUCTIONS
+        )
+        # Basic parsing: split by newlines and clean up
+        rules = [line.strip().lstrip('- ').strip() for line in response_text.split('\n') if line.strip()]
+        return rules
     
+    def _compress_for_budget(self, content: str, file_ext: str, remaining_files: int) -> str:
+        """
+        Compresses a file, starting at `min_compression_level` and escalating through
+        COMPRESSION_LEVELS while its prompt is larger than the share of the run budget
+        left for each remaining file.
+        
+        Raises:
+            BudgetExceededError: When the analysis has used up its share of the budget
+        """
+        run_budget = budget.get_active()
+        level = self.min_compression_level
+        compressed = self.compressor.compress(content, file_ext, level)
+        if run_budget:
+            model = self.router.route(compressed)
+            allowance = run_budget.prompt_allowance(remaining_files, model)
+            while allowance is not None and level < len(COMPRESSION_LEVELS) - 1 \
+                    and token_counter.count(compressed) + PROMPT_OVERHEAD_TOKENS > allowance:
+                level += 1
+                compressed = self.compressor.compress(content, file_ext, level)
+            # The reserve stays available for the architecture and QA stages
+            run_budget.check(model, token_counter.count(compressed) + PROMPT_OVERHEAD_TOKENS, include_reserve=False)
+            run_budget.note_compression(COMPRESSION_LEVELS[level])
+        metrics.incr("compression_level_total", labels={'level': COMPRESSION_LEVELS[level]})
+        return compressed
+
+    @staticmethod
+    def _dependency_context(imported_files: List[str], rule_store: Union[RuleStore, RunResults],
+                            max_files: int = 5, rules_per_file: int = 3) -> str:
+        """
+        Summarizes the rules already extracted from the modules a file imports, so
+        rules that build on them can be stated in context rather than re-derived.
+        """
+        summaries = []
+        for imported in imported_files:
+            rules = rule_store.rules_for(imported, limit=rules_per_file)
+            if rules:
+                summaries.append(f"- {imported}: " + "; ".join(rules))
+            if len(summaries) >= max_files:
+                break
+        if not summaries:
+            return ""
+        return "\nBusiness Rules of Imported Modules (already extracted, do not repeat them):\n" + "\n".join(summaries) + "\n"
+
+    @staticmethod
+    def _is_valid_extraction(response_text: str, content: str) -> bool:
+        """
+        Rejects answers that are empty although the code has conditions and literals,
+        or that echo code instead of listing rules.
+        """
+        lines = [line.strip() for line in response_text.split('\n') if line.strip()]
+        if not lines:
+            return not (BRANCH_PATTERN.search(content) and NUMBER_PATTERN.search(content))
+        if '```' in response_text:
+            return False
+        code_like = sum(1 for line in lines if line.endswith((';', '{', '}', ':')) and not line.startswith('-'))
+        return code_like <= len(lines) / 2
+
     async def _research_unknown_libraries(self, content: str) -> str:
         """
         Searches for information about unknown libraries found in the code.
@@ -114,6 +306,17 @@ class AnalystAgent:
         if not uncommon:
             return ""
         
+        # Installed packages and the standard library are described by the local index,
+        # so only code importing libraries it does not know goes to the web
+        if LibraryIndex.enabled:
+            if not self.library_index.is_open:
+                # The first use may build the index, which parses package sources
+                await asyncio.to_thread(self.library_index.open)
+            known = [description for description in map(self.library_index.describe, dict.fromkeys(uncommon))
+                     if description][:3]
+            if known:
+                return "\nLibrary Knowledge (local index):\n" + "".join(f"- {description}\n" for description in known)
+        
         # Search for the first uncommon library
         search_results = await self.search_tool.search(f"{uncommon[0]} python library documentation", num_results=2)
         
@@ -129,7 +332,13 @@ class AnalystAgent:
         """
         Retrieves relevant business rules from long-term memory.
         """
-        similar_rules = self.vector_store.search_similar_rules(filename, n_results=3)
+        with metrics.span("analyst.memory_context"):
+            # A file path is made of exact terms: rules found by the full-text index (the
+            # file's own rules from earlier runs, or rules naming it) need no embedding call
+            similar_rules = self.vector_store.search_rules(
+                filename, n_results=3, project=self.project, all_projects=self.project is None,
+                min_lexical_hits=1
+            )
         
         if similar_rules:
             context = "\nRelevant Business Rules from Memory Bank:\n"
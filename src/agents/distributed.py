@@ -0,0 +1,199 @@
+import os
+import time
+import uuid
+import socket
+import asyncio
+from typing import Any, Dict, Optional
+from src.utils.logger import setup_logger, log_context
+from src.utils.metrics import metrics
+from src.tools.cassette import CassetteMismatchError
+from src.tools.search_tool import SearchTool
+from src.state.rule_store import RuleStore
+from src.state.work_queue import WorkQueue
+from src.agents.analyst import AnalystAgent
+
+logger = setup_logger("Distributed")
+
+class AnalysisCoordinator:
+    """
+    Runs the Analyst's per-file extraction on worker processes through a WorkQueue.
+
+    The files of the scan are enqueued in analysis order (leaves first); workers
+    claim and analyze them, and the coordinator streams their results into its
+    Analyst's rule store as they come in. Once every task is done or failed, the
+    Analyst finishes the analysis (deduplication, memory bank) as in a local run.
+    """
+
+    def __init__(self, analyst: AnalystAgent, work_queue: WorkQueue, poll_interval: float = 1.0,
+                 progress_interval: float = 10.0):
+        """
+        Initialize the coordinator.
+
+        Args:
+            analyst: Analyst whose rule store and memory bank receive the results
+            work_queue: Queue shared with the workers
+            poll_interval: Seconds between checks for finished tasks
+            progress_interval: Seconds between progress log lines
+        """
+        self.analyst = analyst
+        self.work_queue = work_queue
+        self.poll_interval = poll_interval
+        self.progress_interval = progress_interval
+
+    async def analyze_logic(self, scan_results: Dict[str, Any]) -> RuleStore:
+        """Distributed counterpart of AnalystAgent.analyze_logic."""
+        analyst = self.analyst
+        files = scan_results.get("files", [])
+        dependencies = scan_results.get("dependencies", {})
+        analyst.project = scan_results.get("project")
+        analyst.rule_store.clear()
+        analyst.failed_files = {}
+
+        # Workers resolve the files against this path, so it must be absolute
+        run = self.work_queue.create_run(analyst.project, os.path.abspath(scan_results.get("path", "")),
+                                         {'min_compression_level': analyst.min_compression_level})
+        self.work_queue.enqueue(run, (
+            {'file': file_rel_path, 'imported': dependencies.get(file_rel_path, []), 'remaining': len(files) - index}
+            for index, file_rel_path in enumerate(files)
+        ))
+        logger.info(f"📬 Queued {len(files)} files as run {run} in {self.work_queue.path}; waiting for workers...")
+
+        try:
+            await self._collect(run, len(files))
+        finally:
+            # Tasks left behind (e.g. on Ctrl+C) are not picked up by workers anymore
+            self.work_queue.close_run(run)
+        return analyst.finish_analysis(scan_results)
+
+    async def _collect(self, run: str, total: int):
+        """Moves finished tasks into the rule store until every task of the run is finished."""
+        last_report = time.monotonic()
+        while True:
+            # Read before collecting: when everything was finished by then, this collect gets the rest
+            progress = await asyncio.to_thread(self.work_queue.progress, run)
+            while True:
+                tasks = await asyncio.to_thread(self.work_queue.collect, run)
+                if not tasks:
+                    break
+                for task in tasks:
+                    if task['status'] == 'failed':
+                        self.analyst.record_failure(task['file'], task['error'] or "Unknown error")
+                    elif task['rules'] is not None:
+                        self.analyst.rule_store.add_file(task['file'], task['rules'])
+            finished = progress['done'] + progress['failed']
+            if finished >= total:
+                return
+            if time.monotonic() - last_report >= self.progress_interval:
+                logger.info(f"⏳ {finished}/{total} files analyzed, {progress['leased']} in progress "
+                            f"on {progress['workers']} workers, {progress['failed']} failed")
+                last_report = time.monotonic()
+            # Leases of crashed workers expire even while no other worker is claiming tasks
+            await asyncio.to_thread(self.work_queue.requeue_expired)
+            await asyncio.sleep(self.poll_interval)
+
+class AnalysisWorker:
+    """
+    Worker process of a distributed analysis: claims per-file tasks from a
+    WorkQueue, extracts their rules with its own Analyst (and so its own model
+    settings and API key) and writes them back.
+
+    While a file is analyzed, the lease on its task is renewed every third of
+    `lease_seconds`; if the process dies the lease runs out and another worker
+    gets the task.
+    """
+
+    def __init__(self, work_queue: WorkQueue, model_name: str = "gemini-2.0-flash",
+                 strong_model_name: Optional[str] = None, worker_id: Optional[str] = None,
+                 concurrency: int = 1, lease_seconds: float = 120.0, poll_interval: float = 0.5,
+                 idle_exit: Optional[float] = 60.0):
+        """
+        Initialize the worker.
+
+        Args:
+            work_queue: Queue shared with the coordinator
+            model_name: Fast model used for simple files
+            strong_model_name: Stronger model for complex files
+            worker_id: Name of the worker in leases and logs (host, pid and a random suffix by default)
+            concurrency: Files analyzed at once
+            lease_seconds: Lease length; a task whose worker stops renewing it is re-queued after this long
+            poll_interval: Seconds to wait before asking again when the queue is empty
+            idle_exit: Stop after this many seconds without work (None waits forever)
+        """
+        self.work_queue = work_queue
+        self.model_name = model_name
+        self.strong_model_name = strong_model_name
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:4]}"
+        self.concurrency = concurrency
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self.idle_exit = idle_exit
+        self.completed = 0
+        self._analysts: Dict[str, AnalystAgent] = {}
+        self._last_work = time.monotonic()
+
+    async def run(self) -> int:
+        """
+        Processes tasks until no work arrived for `idle_exit` seconds.
+
+        Returns:
+            Number of tasks completed
+        """
+        logger.info(f"👷 Worker {self.worker_id} polling {self.work_queue.path} "
+                    f"({self.concurrency} file{'s' if self.concurrency != 1 else ''} at a time)")
+        try:
+            await asyncio.gather(*(self._loop() for _ in range(self.concurrency)))
+        finally:
+            await SearchTool.aclose()
+        logger.info(f"👋 Worker {self.worker_id} stopping after {self.completed} files")
+        return self.completed
+
+    async def _loop(self):
+        while True:
+            task = await asyncio.to_thread(self.work_queue.claim, self.worker_id, self.lease_seconds)
+            if task is None:
+                if self.idle_exit is not None and time.monotonic() - self._last_work >= self.idle_exit:
+                    return
+                await asyncio.sleep(self.poll_interval)
+                continue
+            await self._process(task)
+            self._last_work = time.monotonic()
+
+    def _analyst_for(self, run: Dict[str, Any]) -> AnalystAgent:
+        """One Analyst per run, configured like the coordinator's."""
+        analyst = self._analysts.get(run['run'])
+        if analyst is None:
+            analyst = AnalystAgent(self.model_name, self.strong_model_name,
+                                   min_compression_level=run['options'].get('min_compression_level', 0))
+            analyst.project = run['project']
+            # Analysts of earlier runs are not needed anymore
+            self._analysts = {run['run']: analyst}
+        return analyst
+
+    async def _process(self, task: Dict[str, Any]):
+        run = self.work_queue.get_run(task['run'])
+        analyst = self._analyst_for(run)
+        heartbeat = asyncio.create_task(self._heartbeat(task))
+        try:
+            with log_context(worker=self.worker_id):
+                rules = await analyst.analyze_file(task['file'], run['base_path'], task.get('imported', []),
+                                                   remaining_files=task.get('remaining', 1),
+                                                   dependency_rules=self.work_queue.results_of(task['run']))
+        except CassetteMismatchError:
+            raise
+        except Exception as e:
+            logger.error(f"Failed to analyze {task['file']} (attempt {task['attempts']}): {e}")
+            await asyncio.to_thread(self.work_queue.fail, task['id'], self.worker_id, f"{type(e).__name__}: {e}")
+            return
+        finally:
+            heartbeat.cancel()
+        if await asyncio.to_thread(self.work_queue.complete, task['id'], self.worker_id, rules):
+            self.completed += 1
+        else:
+            logger.warning(f"⚠️ Lease on {task['file']} was lost; another worker analyzes it again")
+
+    async def _heartbeat(self, task: Dict[str, Any]):
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            if not await asyncio.to_thread(self.work_queue.heartbeat, task['id'], self.worker_id, self.lease_seconds):
+                return
+            metrics.incr("work_queue_heartbeats_total")
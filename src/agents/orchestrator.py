@@ -1,25 +1,59 @@
-import google.generativeai as genai
-from src.utils.logger import setup_logger
+from typing import Callable, Optional
+from src.utils.logger import setup_logger, log_context
+from src.tools.llm_client import LLMClient
+from src.tools.cassette import CassetteMismatchError
+from src.utils.metrics import metrics
+from src.utils import budget
 from src.agents.scanner import ScannerAgent
 from src.agents.analyst import AnalystAgent
+from src.agents.distributed import AnalysisCoordinator
+from src.memory.compressor import COMPRESSION_LEVELS
 from src.agents.qa import QAAgent
+from src.tools.logic_filter import LogicFilter
+from src.tools.dependency_graph import DependencyGraph
+from src.tools.duplicate_files import DuplicateFileDetector
+from src.tools.search_tool import SearchTool
 from src.state.project_state import ProjectState
+from src.state.rule_store import RuleStore
+from src.state.work_queue import WorkQueue
 
 logger = setup_logger("Orchestrator")
 
 class OrchestratorAgent:
-    def __init__(self, model_name: str = "gemini-2.0-flash"):
+    def __init__(self, model_name: str = "gemini-2.0-flash", strong_model_name: Optional[str] = None,
+                 prefilter: bool = True, slice_logic: bool = False, dedupe_files: bool = True,
+                 max_prompt_rules: int = 200, work_queue: Optional[WorkQueue] = None):
         """
         Initializes the Orchestrator Agent.
+
+        Args:
+            model_name: Model used by every agent, and for simple files during analysis
+            strong_model_name: Optional stronger model the Analyst routes complex files to
+            prefilter: Skip files without business logic (tests, generated code, data classes) before analysis
+            slice_logic: Send only the logic slice of each file (conditionals, arithmetic, constants) to the Analyst
+            dedupe_files: Analyze one representative of each group of identical or near-identical files
+            max_prompt_rules: Most frequent rules listed in the architecture prompt (the others are summarized per module)
+            work_queue: Hand the files to worker processes through this queue instead of analyzing them here
         """
         self.model_name = model_name
-        self.model = genai.GenerativeModel(model_name)
+        self.strong_model_name = strong_model_name
+        self.prefilter = prefilter
+        self.slice_logic = slice_logic
+        self.dedupe_files = dedupe_files
+        self.max_prompt_rules = max_prompt_rules
+        self.work_queue = work_queue
+        self.llm = LLMClient(model_name)
         self.project_state = None
-        logger.info(f"🤖 Orchestrator initialized with model: {model_name}")
+        logger.info(f"🤖 Orchestrator initialized with model: {model_name}"
+                    + (f" (complex files: {strong_model_name})" if strong_model_name else ""))
 
-    async def process_repository(self, repo_url: str) -> str:
+    async def process_repository(self, repo_url: str, on_chunk: Optional[Callable[[str], None]] = None) -> str:
         """
         Orchestrates the modernization process. It is the main function that orchestrates the modernization process.    
+        
+        Args:
+            repo_url: URL or path of the repository to modernize
+            on_chunk: Optional callback receiving the report text as it is generated
         """
         logger.info(f"Orchestrator processing repo: {repo_url}")
         
@@ -28,23 +62,81 @@ class OrchestratorAgent:
         
         # Initialize Sub-Agents
         scanner = ScannerAgent(self.model_name)
-        analyst = AnalystAgent(self.model_name)
-        qa = QAAgent(self.model_name)
+        analyst = AnalystAgent(self.model_name, self.strong_model_name,
+                               min_compression_level=len(COMPRESSION_LEVELS) - 1 if self.slice_logic else 0)
+        qa = QAAgent(self.model_name, vector_store=analyst.vector_store)
         
         # --- Step 1: Discovery (Scanner Agent) ---
         logger.info("--- Step 1: Scanning Codebase ---")
-        scan_results = await scanner.scan_repository(repo_url)
+        with metrics.span("stage.scan"), log_context(stage="scan"):
+            scan_results = await scanner.scan_repository(repo_url)
         self.project_state.update_scan_results(scan_results)
         logger.info(f"Scanner Results: {scan_results['summary']}")
         
+        # --- Step 1a: Static dependency graph (no LLM calls) ---
+        graph = DependencyGraph()
+        with metrics.span("stage.dependency_graph"), log_context(stage="dependency_graph"):
+            dependencies = graph.build(scan_results["path"], scan_results["files"])
+            self.project_state.set_dependency_graph(graph.to_mermaid(), dependencies)
+        
+        # --- Step 1b: Pre-filter files without business logic (no LLM calls) ---
+        if self.prefilter:
+            with metrics.span("stage.prefilter"), log_context(stage="prefilter"):
+                kept_files, skipped_files = LogicFilter().filter(scan_results)
+            for file_path, reason in skipped_files.items():
+                self.project_state.mark_skipped(file_path, reason)
+            if skipped_files:
+                scan_results = dict(
+                    scan_results,
+                    files=kept_files,
+                    summary=f"{scan_results['summary']} Skipped {len(skipped_files)} files without business logic "
+                            f"(tests, migrations, generated code, declarations)."
+                )
+        
+        # --- Step 1c: Analyze one copy of duplicated files (no LLM calls) ---
+        duplicates = {}
+        if self.dedupe_files:
+            with metrics.span("stage.duplicates"), log_context(stage="duplicates"):
+                kept_files, duplicates = DuplicateFileDetector().group(scan_results)
+            if duplicates:
+                scan_results = dict(
+                    scan_results,
+                    files=kept_files,
+                    duplicates=duplicates,
+                    summary=f"{scan_results['summary']} {len(duplicates)} files are copies of other files "
+                            f"and reuse their analysis."
+                )
+        
+        # Analyze leaf modules first so their rules can be summarized for the files importing them
+        scan_results = dict(scan_results, files=graph.topological_order(scan_results["files"]),
+                            dependencies=dependencies)
+        
         # --- Step 2: Analysis (Analyst Agent) ---
         logger.info("--- Step 2: Analyzing Logic ---")
-        business_rules = await analyst.analyze_logic(scan_results)
-        
-        # Update state with extracted rules (simplified for now, ideally per file)
-        # In a real scenario, Analyst would return a dict of {file: rules}
-        # For now, we'll just log it, as the Analyst Agent doesn't return per-file rules in the current signature
-        # We will improve this in the next iteration or let the Analyst update the state directly if passed
+        with metrics.span("stage.analysis"), log_context(stage="analysis"):
+            try:
+                if self.work_queue is not None:
+                    rule_store = await AnalysisCoordinator(analyst, self.work_queue).analyze_logic(scan_results)
+                else:
+                    rule_store = await analyst.analyze_logic(scan_results)
+            finally:
+                # Pooled search connections belong to this event loop
+                await SearchTool.aclose()
+        for file_path, error in analyst.failed_files.items():
+            self.project_state.mark_analysis_failed(file_path, error)
+        # The rules stay in the rule store; the state records where, and how many each file has
+        self.project_state.set_rule_store(rule_store.path)
+        for entry in rule_store.iter_files():
+            if entry['duplicate_of']:
+                self.project_state.record_duplicate(entry['file'], entry['duplicate_of'],
+                                                    duplicates[entry['file']]['similarity'],
+                                                    rule_count=entry['rule_count'])
+            else:
+                self.project_state.update_analysis(entry['file'], rule_count=entry['rule_count'])
+        for duplicate, group in duplicates.items():
+            if group['of'] in analyst.failed_files:
+                self.project_state.mark_analysis_failed(duplicate, f"Copy of {group['of']}, which failed: "
+                                                                   f"{analyst.failed_files[group['of']]}")
         
         # --- Step 3: Architecture (Orchestrator as Architect) ---
         logger.info("--- Step 3: Generating Modernization Plan ---")
@@ -59,28 +151,66 @@ class OrchestratorAgent:
         {scan_results['languages']}
         
         Extracted Business Rules:
-        {business_rules}
+        {self._rules_for_prompt(rule_store)}
         
         Please generate a preliminary modernization report outlining the next steps.
         """
         
         try:
-            response = self.model.generate_content(prompt)
-            initial_plan = response.text
+            with metrics.span("stage.architect"), log_context(stage="architect"):
+                initial_plan = await self.llm.generate(prompt, on_chunk=on_chunk)
+        except CassetteMismatchError:
+            raise
         except Exception as e:
             import traceback
             logger.error(f"Failed to generate plan: {e}")
             logger.error(f"Traceback: {traceback.format_exc()}")
             initial_plan = f"Error generating modernization plan: {str(e)}"
+            if on_chunk:
+                on_chunk(initial_plan)
         
         # --- Step 4: Quality Assurance (QA Agent) ---
         logger.info("--- Step 4: QA Validation ---")
-        qa_review = await qa.validate_plan(initial_plan, business_rules)
+        qa_header = "\n\n---\n\n# 🕵️ QA Review\n"
+        if on_chunk:
+            on_chunk(qa_header)
+        with metrics.span("stage.qa"), log_context(stage="qa"):
+            qa_review = await qa.validate_plan(initial_plan, rule_store, on_chunk=on_chunk,
+                                               project=scan_results.get("project"))
+        
+        final_report = f"{initial_plan}{qa_header}{qa_review}"
+        if analyst.failed_files:
+            failed = "\n".join(f"- `{path}`: {error}" for path, error in analyst.failed_files.items())
+            notice = (f"\n\n---\n\n> ⚠️ {len(analyst.failed_files)} files could not be analyzed, "
+                      f"so their rules are missing from this report:\n\n{failed}\n")
+            final_report += notice
+            if on_chunk:
+                on_chunk(notice)
         
-        final_report = f"{initial_plan}\n\n---\n\n# 🕵️ QA Review\n{qa_review}"
+        run_budget = budget.get_active()
+        if run_budget:
+            section = f"\n\n---\n\n## 💰 Budget Usage\n\n{run_budget.to_markdown()}\n"
+            final_report += section
+            if on_chunk:
+                on_chunk(section)
+            self.project_state.set_budget_usage(run_budget.usage())
         
         # Update State
         self.project_state.set_modernization_plan(final_report)
         self.project_state.save_to_json()
         
         return final_report
+
+    def _rules_for_prompt(self, rule_store: RuleStore) -> str:
+        """
+        Lists the most frequent canonical rules, one per line. When there are more
+        than `max_prompt_rules`, the rest is summarized as rule counts per module,
+        so the prompt stays bounded however large the repository is.
+        """
+        lines = [f"- {canonical['rule']}" for canonical in rule_store.iter_canonical(limit=self.max_prompt_rules)]
+        total = rule_store.canonical_count()
+        if total > len(lines):
+            modules = ", ".join(f"{group['module']} ({group['rules']})"
+                                for group in rule_store.aggregate('module', limit=20))
+            lines.append(f"- ... and {total - len(lines)} less frequent rules. Rules per module: {modules}")
+        return "\n".join(lines) or "(no business rules found)"
@@ -1,43 +1,216 @@
-import google.generativeai as genai
-from typing import List, Dict, Any
+import re
+import heapq
+import asyncio
+from typing import List, Dict, Any, Callable, Iterable, Optional, Union
 from src.utils.logger import setup_logger
+from src.tools.llm_client import LLMClient
+from src.tools.cassette import CassetteMismatchError
+from src.memory.vector_store import VectorStore
+from src.state.rule_store import RuleStore
+from src.utils.metrics import metrics
 
 logger = setup_logger("QAAgent")
 
 class QAAgent:
-    def __init__(self, model_name: str = "gemini-1.5-pro-latest"):
-        self.model = genai.GenerativeModel(model_name)
+    def __init__(self, model_name: str = "gemini-2.0-flash", vector_store: Optional[VectorStore] = None,
+                 rules_per_section: int = 8, max_sections: int = 8, max_concurrency: int = 4):
+        """
+        Initializes the QA Agent.
+
+        Args:
+            model_name: Gemini model used for the section reviews
+            vector_store: Memory bank used to retrieve the rules relevant to each plan section
+            rules_per_section: Maximum number of rules sent along with a single section
+            max_sections: Upper bound on the number of section reviews per plan
+            max_concurrency: Maximum number of section reviews in flight at once
+        """
+        self.llm = LLMClient(model_name)
+        self.vector_store = vector_store
+        self.rules_per_section = rules_per_section
+        self.max_sections = max_sections
+        self.max_concurrency = max_concurrency
 
-    async def validate_plan(self, plan: str, business_rules: List[str]) -> str:
+    async def validate_plan(self, plan: str, business_rules: Union[List[str], RuleStore],
+                            on_chunk: Optional[Callable[[str], None]] = None,
+                            project: Optional[str] = None) -> str:
         """
         Validates the proposed modernization plan against the extracted business rules.
+
+        The plan is split into sections and each section is reviewed concurrently against
+        only the rules relevant to it, so the prompt size does not grow with the rule count.
+        When `on_chunk` is given, each section review is emitted as soon as it completes.
+        Rules are retrieved from `project`'s memory (every project's when None).
+        `business_rules` may be the analysis's RuleStore, whose rules are then
+        looked up and streamed from disk instead of held in memory.
         """
         logger.info("🕵️ QA Agent reviewing the plan...")
-        
+
+        sections = self._split_plan(plan)
+        logger.info(f"🧩 Plan split into {len(sections)} sections for review")
+
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def review(section: Dict[str, str]) -> Dict[str, Any]:
+            async with semaphore:
+                verdict = await self._validate_section(section, business_rules, project)
+            if on_chunk:
+                on_chunk(f"\n### {verdict['title']} — {verdict['verdict']}\n{verdict['review'].strip()}\n")
+            return verdict
+
+        verdicts = await asyncio.gather(*(review(section) for section in sections))
+
+        report = self._merge_verdicts(verdicts)
+        if on_chunk:
+            on_chunk(f"\n{report.splitlines()[0]}\n")
+        logger.info("✅ QA Review complete.")
+        return report
+
+    async def _validate_section(self, section: Dict[str, str], business_rules: Union[List[str], RuleStore],
+                                project: Optional[str] = None) -> Dict[str, Any]:
+        """Reviews a single plan section against its retrieved rules."""
+        with metrics.span("qa.retrieve_rules"):
+            rules = self._retrieve_rules(section['body'], business_rules, project)
+        rules_text = "\n".join(f"- {rule}" for rule in rules) if rules else "- (no related business rules found)"
+
         prompt = f"""
         You are the Quality Assurance (QA) Lead.
-        
-        Your goal is to validate the following Modernization Plan against the extracted Business Rules.
-        
-        Extracted Business Rules:
-        {business_rules}
-        
-        Proposed Modernization Plan:
-        {plan}
-        
+
+        Your goal is to validate ONE section of a Modernization Plan against the Business Rules related to it.
+
+        Related Business Rules:
+        {rules_text}
+
+        Plan Section: {section['title']}
+        {section['body']}
+
         Task:
-        1. Verify that the plan addresses the business rules.
+        1. Verify that the section is consistent with the business rules.
         2. Check for any hallucinations (claims about code that isn't in the rules).
-        3. Rate the plan's quality (Pass/Fail).
-        
-        Output your review in Markdown format.
+        3. Rate the section's quality (Pass/Fail).
+
+        Output your review in Markdown format and finish with a single line that reads
+        either "VERDICT: PASS" or "VERDICT: FAIL".
         """
-        
+
         try:
-            response = self.model.generate_content(prompt)
-            review = response.text
-            logger.info("✅ QA Review complete.")
-            return review
+            review = await self.llm.generate(prompt)
+            verdict = self._parse_verdict(review)
+            metrics.incr("qa_sections_total", labels={'verdict': verdict})
+        except CassetteMismatchError:
+            raise
         except Exception as e:
-            logger.error(f"QA Validation failed: {e}")
-            return "QA Validation Failed due to error."
+            logger.error(f"QA Validation failed for section '{section['title']}': {e}")
+            review = "QA Validation Failed due to error."
+            verdict = "ERROR"
+
+        return {
+            'title': section['title'],
+            'verdict': verdict,
+            'review': review,
+            'rules_checked': len(rules)
+        }
+
+    def _split_plan(self, plan: str) -> List[Dict[str, str]]:
+        """
+        Splits a Markdown plan into sections on its headings.
+        Adjacent sections are merged until at most `max_sections` remain.
+        """
+        sections = []
+        title = "Overview"
+        body_lines = []
+
+        for line in plan.split('\n'):
+            if re.match(r'^\s{0,3}#{1,3}\s+\S', line):
+                if any(l.strip() for l in body_lines):
+                    sections.append({'title': title, 'body': '\n'.join(body_lines).strip()})
+                title = line.strip().lstrip('#').strip()
+                body_lines = []
+            else:
+                body_lines.append(line)
+
+        if any(l.strip() for l in body_lines) or not sections:
+            sections.append({'title': title, 'body': '\n'.join(body_lines).strip()})
+
+        # Merge the smallest neighbouring pair until we are within the section cap
+        while len(sections) > self.max_sections:
+            sizes = [len(sections[i]['body']) + len(sections[i + 1]['body']) for i in range(len(sections) - 1)]
+            i = sizes.index(min(sizes))
+            merged = {
+                'title': f"{sections[i]['title']} / {sections[i + 1]['title']}",
+                'body': f"{sections[i]['body']}\n\n### {sections[i + 1]['title']}\n{sections[i + 1]['body']}"
+            }
+            sections[i:i + 2] = [merged]
+
+        return sections
+
+    def _retrieve_rules(self, section_text: str, business_rules: Union[List[str], RuleStore],
+                        project: Optional[str] = None) -> List[str]:
+        """
+        Retrieves the business rules relevant to a plan section.
+        Uses the memory bank when available and falls back to keyword overlap.
+        """
+        if isinstance(business_rules, RuleStore):
+            has_rules, is_known = len(business_rules) > 0, business_rules.has_rule
+        else:
+            known_rules = set(business_rules)
+            has_rules, is_known = bool(known_rules), known_rules.__contains__
+
+        if self.vector_store is not None:
+            try:
+                matches = self.vector_store.search_similar_rules(
+                    section_text, n_results=self.rules_per_section * 3,
+                    project=project, all_projects=project is None
+                )
+                # The memory bank spans previous runs, so only keep rules from this analysis
+                rules = [m['rule'] for m in matches if not has_rules or is_known(m['rule'])]
+                if rules:
+                    return rules[:self.rules_per_section]
+            except Exception as e:
+                logger.warning(f"Rule retrieval from memory bank failed, using keyword overlap: {e}")
+
+        return self._rank_by_overlap(section_text, business_rules, self.rules_per_section)
+
+    def _rank_by_overlap(self, text: str, rules: Iterable[str], limit: Optional[int] = None) -> List[str]:
+        """Ranks rules by the number of words they share with the given text (keeping the `limit` best)."""
+        words = set(re.findall(r'[a-z0-9%]{3,}', text.lower()))
+
+        def scored():
+            for index, rule in enumerate(rules):
+                score = len(words.intersection(re.findall(r'[a-z0-9%]{3,}', rule.lower())))
+                if score:
+                    yield score, -index, rule
+
+        # A bounded heap, so the rules can be streamed from the rule store
+        best = heapq.nlargest(limit, scored()) if limit is not None else sorted(scored(), reverse=True)
+        return [rule for _, _, rule in best]
+
+    def _parse_verdict(self, review: str) -> str:
+        """Extracts the PASS/FAIL verdict from a section review."""
+        match = re.findall(r'VERDICT:\s*\**\s*(PASS|FAIL)', review, flags=re.IGNORECASE)
+        if match:
+            return match[-1].upper()
+        if re.search(r'\bfail(ed)?\b', review, flags=re.IGNORECASE):
+            return "FAIL"
+        return "PASS" if re.search(r'\bpass(ed)?\b', review, flags=re.IGNORECASE) else "FAIL"
+
+    def _merge_verdicts(self, verdicts: List[Dict[str, Any]]) -> str:
+        """Merges the per-section reviews into one report with a Pass/Fail rollup."""
+        passed = sum(1 for v in verdicts if v['verdict'] == "PASS")
+        overall = "PASS" if passed == len(verdicts) else "FAIL"
+        icon = "✅" if overall == "PASS" else "❌"
+
+        lines = [
+            f"## {icon} Overall Verdict: {overall} ({passed}/{len(verdicts)} sections passed)",
+            "",
+            "| Section | Verdict | Rules Checked |",
+            "|---|---|---|",
+        ]
+        for v in verdicts:
+            lines.append(f"| {v['title']} | {v['verdict']} | {v['rules_checked']} |")
+
+        for v in verdicts:
+            lines.append("")
+            lines.append(f"### {v['title']} — {v['verdict']}")
+            lines.append(v['review'].strip())
+
+        return '\n'.join(lines)
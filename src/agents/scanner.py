@@ -1,9 +1,10 @@
 import os
 import tempfile
 import subprocess
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 from src.utils.logger import setup_logger
 from src.tools.file_system import FileSystemTools
+from src.utils.metrics import metrics
 
 logger = setup_logger("ScannerAgent")
 
@@ -25,27 +26,55 @@ class ScannerAgent:
         
         if self._is_git_url(repo_path):
             logger.info(f"📥 Detected git repository URL, cloning...")
-            actual_path = self._clone_repository(repo_path)
+            with metrics.span("scanner.clone"):
+                actual_path = self._clone_repository(repo_path)
             cloned = True
             logger.info(f"✅ Repository cloned to: {actual_path}")
         
-        files = FileSystemTools.list_files(actual_path)
+        with metrics.span("scanner.list_files"):
+            files = FileSystemTools.list_files(actual_path)
+        
+        # Report files relative to the scanned root, which downstream agents join back on
+        if os.path.isfile(actual_path):
+            actual_path, files = os.path.dirname(actual_path), [os.path.basename(actual_path)]
+        else:
+            files = [os.path.relpath(f, actual_path) for f in files]
         
         # Filter out non-code files for this demo
         code_files = [f for f in files if f.endswith(('.py', '.java', '.js', '.ts', '.cpp', '.h'))]
         
         languages = self._identify_languages(code_files)
         
+        metrics.incr("scanner_files_total", len(code_files))
         logger.info(f"✅ Found {len(code_files)} code files.")
         
         return {
             "path": actual_path,
+            "project": self._project_name(repo_path),
+            "repo": repo_path,
+            "commit": self._head_commit(actual_path),
             "files": code_files,
             "languages": languages,
             "summary": f"Scanned {len(code_files)} files. Languages: {', '.join(languages.keys())}",
             "cloned": cloned
         }
 
+    def _project_name(self, repo_path: str) -> str:
+        """Project the memory bank files the rules under: the repository (or directory) name."""
+        if self._is_git_url(repo_path):
+            name = repo_path.rstrip('/').rsplit('/', 1)[-1].rsplit(':', 1)[-1]
+            return name[:-4] if name.endswith('.git') else name
+        return os.path.basename(os.path.abspath(repo_path))
+
+    def _head_commit(self, path: str) -> Optional[str]:
+        """Commit checked out at `path`, or None when it is not a git work tree."""
+        try:
+            result = subprocess.run(['git', '-C', path, 'rev-parse', 'HEAD'],
+                                    capture_output=True, text=True, timeout=10)
+        except (OSError, subprocess.TimeoutExpired):
+            return None
+        return result.stdout.strip() if result.returncode == 0 else None
+
     def _is_git_url(self, path: str) -> bool:
         """Check if the path is a git repository URL."""
         return path.startswith(('http://', 'https://', 'git@', 'git://'))
@@ -1,13 +1,41 @@
 import re
-from typing import Dict, List
+import ast
+import logging
+from typing import Dict, List, Optional, Set
 from src.utils.logger import setup_logger
+from src.utils.budget import token_counter
+from src.tools.logic_filter import CONDITION_PATTERN, ARITHMETIC_PATTERN, NUMBER_PATTERN
 
 logger = setup_logger("Compressor")
 
+# Escalating compression levels; each level also applies the ones before it
+COMPRESSION_LEVELS = ("minify", "strip_docstrings", "collapse_literals", "slice_logic")
+
+DOCSTRING_START = re.compile(r'^\s*[rRuUbB]{0,2}("""|\'\'\')')
+STRING_LITERAL = re.compile(r'"(?:\\.|[^"\\\n])*"|\'(?:\\.|[^\'\\\n])*\'')
+LITERAL_LINE = re.compile(r'^[\s,:;{}\[\]()"\'.+\-\d]*$')
+SIGNATURE = re.compile(r'^\s*(?:(?:async\s+)?def |class |function\b|(?:public|private|protected|static|export|interface)\b|'
+                       r'[\w<>\[\],*&:]+\s+[\w:~]+\s*\([^;]*\)\s*(?:const\s*)?\{?\s*$)|\breturn\b|'
+                       r'^\s*(?:(?:static\s+)?(?:final\s+|const\s+)+[\w<>]+\s+)?[A-Z][A-Z0-9_]+\s*[:=]')
+CONSTANT_DEFINITION = re.compile(r'^\s*(?:(?:public|private|protected|static|final|const|let|var|export|readonly)\s+)*'
+                                 r'(?:[\w<>\[\]]+\s+)?[A-Z][A-Z0-9_]+\s*(?::|=(?!=))')
+# Returns of a literal outcome (`return 0;`, `return false`); other returns only count when they compute something
+RETURN_LITERAL = re.compile(r'\breturn\s+(?:-?\d|true\b|false\b|True\b|False\b|"|\')')
+# Logging and printing statements, dropped by slicing even when they contain numbers or arithmetic
+LOGGING_CALL = re.compile(r'^\s*(?:(?:self\.|this\.)?(?:log|logger|logging|_log|_logger|LOG|LOGGER)\.\w+|print|printf|puts|'
+                          r'console\.\w+|System\.(?:out|err)\.\w+|fmt\.Print\w*|std::(?:cout|cerr))\b')
+# Languages whose blocks are delimited by braces, sliced block by block
+BRACE_LANGUAGES = ('.java', '.js', '.ts', '.cpp', '.c', '.h', '.hpp', '.cs', '.go')
+ARITHMETIC_OPS = (ast.Add, ast.Sub, ast.Mult, ast.Div, ast.FloorDiv, ast.Mod, ast.Pow)
+
 class ContextCompressor:
     """
     Compresses code context by removing comments, empty lines, and unnecessary whitespace.
     This reduces token usage when sending large legacy files to the LLM.
+    
+    Stronger levels (see COMPRESSION_LEVELS) additionally strip docstrings, collapse
+    long literals, and finally keep only the lines carrying logic, for runs whose
+    budget would otherwise be exceeded.
     """
     
     def __init__(self):
@@ -21,28 +49,42 @@ class ContextCompressor:
             '.h': self._compress_c_style,
         }
     
-    def compress(self, content: str, file_extension: str) -> str:
+    def compress(self, content: str, file_extension: str, level: int = 0) -> str:
         """
         Compresses code content based on file type.
         
         Args:
             content: The raw code content
             file_extension: File extension (e.g., '.py', '.java')
+            level: Index into COMPRESSION_LEVELS (0 only strips comments and blank lines)
             
         Returns:
             Compressed code content
         """
-        handler = self.language_handlers.get(file_extension, self._compress_generic)
-        compressed = handler(content)
-        
-        original_lines = len(content.split('\n'))
-        compressed_lines = len(compressed.split('\n'))
-        reduction = ((original_lines - compressed_lines) / original_lines * 100) if original_lines > 0 else 0
+        compressed = self.minify(content, file_extension)
+        if level >= 3:
+            # Slicing goes first, so Python is still parseable; it drops docstrings itself
+            compressed = self._slice_logic(compressed, file_extension)
+        elif level >= 1 and file_extension == '.py':
+            compressed = self._strip_docstrings(compressed)
+        if level >= 2:
+            compressed = self._collapse_literals(compressed)
         
-        logger.info(f"Compressed {file_extension} file: {original_lines} → {compressed_lines} lines ({reduction:.1f}% reduction)")
+        # The stats cost a pass over both texts, which only pays off when the line is printed
+        if logger.isEnabledFor(logging.INFO):
+            stats = self.get_compression_stats(content, compressed)
+            logger.info(f"Compressed {file_extension} file ({COMPRESSION_LEVELS[level]}): "
+                        f"{stats['original_lines']} → {stats['compressed_lines']} lines, "
+                        f"~{stats['original_tokens']} → ~{stats['compressed_tokens']} tokens "
+                        f"({stats['reduction_percent']:.1f}% reduction)")
         
         return compressed
     
+    def minify(self, content: str, file_extension: str) -> str:
+        """Strips comments and blank lines (compression level 0), without logging."""
+        handler = self.language_handlers.get(file_extension, self._compress_generic)
+        return handler(content)
+    
     def _compress_python(self, content: str) -> str:
         """Compress Python code."""
         lines = content.split('\n')
@@ -122,6 +164,241 @@ class ContextCompressor:
         
         return '\n'.join(lines)
     
+    def _strip_docstrings(self, content: str) -> str:
+        """Drops string literals that stand alone as statements (docstrings)."""
+        lines = []
+        closing = None
+        for line in content.split('\n'):
+            if closing:
+                if closing in line:
+                    closing = None
+                continue
+            match = DOCSTRING_START.match(line)
+            if match:
+                delimiter = match.group(1)
+                # A docstring closing on its own line is dropped whole; otherwise skip to its end
+                if delimiter not in line[match.end():]:
+                    closing = delimiter
+                continue
+            lines.append(line)
+        return '\n'.join(lines)
+    
+    def _collapse_literals(self, content: str, max_run: int = 3) -> str:
+        """Shortens long string literals and runs of literal-only lines (data tables)."""
+        content = STRING_LITERAL.sub(
+            lambda m: f"{m.group(0)[0]}...{m.group(0)[0]}" if len(m.group(0)) > 42 else m.group(0), content
+        )
+        lines, run = [], []
+        for line in content.split('\n') + [None]:
+            if line is not None and line.strip() and LITERAL_LINE.match(STRING_LITERAL.sub('""', line)):
+                run.append(line)
+                continue
+            lines.extend(run[:max_run])
+            if len(run) > max_run:
+                indent = run[max_run][:len(run[max_run]) - len(run[max_run].lstrip())]
+                lines.append(f"{indent}... ({len(run) - max_run} more literal lines)")
+            run = []
+            if line is not None:
+                lines.append(line)
+        return '\n'.join(lines)
+    
+    def _slice_logic(self, content: str, file_extension: str) -> str:
+        """
+        Keeps only the code carrying business logic: conditionals, comparisons,
+        arithmetic, numeric literals, constants, returns and the signatures of the
+        blocks containing them. Every run of other lines becomes a single '...'
+        placeholder.
+
+        Python is sliced on its syntax tree, brace languages block by block, and
+        everything else (or Python that does not parse) line by line.
+        """
+        if file_extension == '.py':
+            sliced = self._slice_python(content)
+            if sliced is not None:
+                return sliced
+            return self._slice_lines(self._strip_docstrings(content), file_extension)
+        if file_extension in BRACE_LANGUAGES:
+            return self._slice_blocks(content, file_extension)
+        return self._slice_lines(content, file_extension)
+
+    def _is_logic_line(self, code: str, file_extension: str) -> bool:
+        """Whether a line (with string literals blanked out) carries logic, ignoring signatures."""
+        if LOGGING_CALL.match(code):
+            return False
+        return bool(CONDITION_PATTERN.search(code) or NUMBER_PATTERN.search(code)
+                    or (file_extension not in ('.h', '.hpp') and ARITHMETIC_PATTERN.search(code))
+                    or RETURN_LITERAL.search(code) or CONSTANT_DEFINITION.match(code))
+
+    def _slice_lines(self, content: str, file_extension: str) -> str:
+        """Line-by-line slicing for languages without a parser or block structure."""
+        lines = content.split('\n')
+        keep = set()
+        for i, line in enumerate(lines):
+            code = STRING_LITERAL.sub('""', line)
+            if (self._is_logic_line(code, file_extension) or (SIGNATURE.search(code) and not LOGGING_CALL.match(code))
+                    or code.strip() in ('}', '};', 'else:', 'else {', '} else {')):
+                keep.add(i)
+        return self._render_slice(lines, keep)
+
+    def _slice_blocks(self, content: str, file_extension: str) -> str:
+        """
+        Slicing for brace languages: logic lines are kept together with the headers
+        and closing braces of the blocks around them; blocks without any logic
+        (getters, logging helpers, boilerplate methods) are elided whole.
+        """
+        lines = content.split('\n')
+        keep: Set[int] = set()
+        # Open blocks as [header line, line of the brace, whether logic was kept inside]
+        blocks: List[List] = []
+        for i, line in enumerate(lines):
+            code = STRING_LITERAL.sub('""', line)
+            if self._is_logic_line(code, file_extension):
+                keep.add(i)
+                for block in blocks:
+                    block[2] = True
+            for char in code:
+                if char == '{':
+                    header = i
+                    # Braces on their own line belong to the declaration above
+                    if code.strip() == '{' and i > 0:
+                        header = i - 1
+                    blocks.append([header, i, i in keep])
+                elif char == '}' and blocks:
+                    header, opening, has_logic = blocks.pop()
+                    if has_logic:
+                        keep.update((header, opening, i))
+                        if blocks:
+                            blocks[-1][2] = True
+        # Braces opened on a kept header line but never closed stay as they are
+        return self._render_slice(lines, keep)
+
+    def _slice_python(self, content: str) -> Optional[str]:
+        """
+        Slices Python on its syntax tree.
+
+        Returns:
+            The sliced code, or None when the content does not parse
+        """
+        try:
+            tree = ast.parse(content)
+        except (SyntaxError, ValueError):
+            return None
+        lines = content.split('\n')
+        keep: Set[int] = set()
+        self._keep_python_logic(tree.body, lines, keep)
+        return self._render_slice(lines, {line - 1 for line in keep})
+
+    def _keep_python_logic(self, body: List[ast.stmt], lines: List[str], keep: Set[int]) -> bool:
+        """
+        Adds the (1-based) line numbers of the logic in `body` to `keep`.
+
+        Returns:
+            Whether anything in `body` was kept
+        """
+        kept = False
+        for node in body:
+            clauses = self._python_clauses(node)
+            if clauses is None:
+                if self._is_python_logic(node, lines):
+                    keep.update(range(node.lineno, node.end_lineno + 1))
+                    kept = True
+                continue
+            # Conditions are rules in themselves; other headers only give context to what they contain
+            conditional = isinstance(node, (ast.If, ast.While)) or type(node).__name__ == 'Match'
+            previous_end = None
+            for header_start, clause_body in clauses:
+                start = header_start if header_start is not None else previous_end + 1
+                header = range(start, max(start + 1, clause_body[0].lineno)) if clause_body else range(start, start + 1)
+                if self._keep_python_logic(clause_body, lines, keep) or conditional:
+                    keep.update(line for line in header if line <= len(lines) and lines[line - 1].strip())
+                    kept = True
+                previous_end = clause_body[-1].end_lineno if clause_body else start
+        return kept
+
+    @staticmethod
+    def _python_clauses(node: ast.stmt) -> Optional[List]:
+        """
+        The clauses of a compound statement as (header line, body) pairs; a header
+        line of None means the clause starts right after the previous one (else,
+        finally). Returns None for simple statements.
+        """
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            return [(node.lineno, node.body)]
+        if isinstance(node, (ast.If, ast.For, ast.AsyncFor, ast.While)):
+            clauses = [(node.lineno, node.body)]
+            if isinstance(node, ast.If) and len(node.orelse) == 1 and isinstance(node.orelse[0], ast.If) \
+                    and node.orelse[0].col_offset == node.col_offset:
+                # elif: the nested If starts at its own header (an If inside else: is indented further)
+                clauses.append((node.orelse[0].lineno, node.orelse))
+            elif node.orelse:
+                clauses.append((None, node.orelse))
+            return clauses
+        if isinstance(node, (ast.With, ast.AsyncWith)):
+            return [(node.lineno, node.body)]
+        if isinstance(node, ast.Try) or type(node).__name__ == 'TryStar':
+            clauses = [(node.lineno, node.body)]
+            clauses += [(handler.lineno, handler.body) for handler in node.handlers]
+            if node.orelse:
+                clauses.append((None, node.orelse))
+            if node.finalbody:
+                clauses.append((None, node.finalbody))
+            return clauses
+        if type(node).__name__ == 'Match':
+            return [(node.lineno, [])] + [(case.pattern.lineno, case.body) for case in node.cases]
+        return None
+
+    @staticmethod
+    def _is_python_logic(node: ast.stmt, lines: List[str]) -> bool:
+        """Whether a simple statement carries logic."""
+        if isinstance(node, (ast.Import, ast.ImportFrom, ast.Pass, ast.Global, ast.Nonlocal,
+                             ast.Break, ast.Continue)):
+            return False
+        if isinstance(node, (ast.Raise, ast.Assert)):
+            return True
+        if isinstance(node, ast.Return):
+            # Literal outcomes are rules (`return 0`); `return self.amount` only is when it computes something
+            if node.value is None:
+                return False
+            if isinstance(node.value, ast.Constant):
+                return True
+        if isinstance(node, ast.Expr):
+            if isinstance(node.value, ast.Constant) or LOGGING_CALL.match(lines[node.lineno - 1]):
+                return False
+        if isinstance(node, ast.AugAssign) and isinstance(node.op, ARITHMETIC_OPS):
+            return True
+        if isinstance(node, (ast.Assign, ast.AnnAssign)):
+            targets = node.targets if isinstance(node, ast.Assign) else [node.target]
+            if node.value is not None and any(isinstance(t, ast.Name) and re.fullmatch(r'[A-Z][A-Z0-9_]+', t.id)
+                                              for t in targets):
+                return True
+            # Setting a literal outcome (`rate = 0`, `eligible = False`)
+            if isinstance(node.value, ast.Constant) and isinstance(node.value.value, (int, float)):
+                return True
+        for child in ast.walk(node):
+            if isinstance(child, (ast.Compare, ast.BoolOp, ast.IfExp)):
+                return True
+            if isinstance(child, ast.BinOp) and isinstance(child.op, ARITHMETIC_OPS) and not any(
+                    isinstance(side, ast.JoinedStr) or isinstance(side, ast.Constant) and isinstance(side.value, str)
+                    for side in (child.left, child.right)):
+                return True
+            if isinstance(child, ast.Constant) and isinstance(child.value, (int, float)) \
+                    and not isinstance(child.value, bool) and child.value not in (0, 1):
+                return True
+        return False
+
+    @staticmethod
+    def _render_slice(lines: List[str], keep: Set[int]) -> str:
+        """Joins the kept lines (0-based), replacing every run of other lines with '...'."""
+        sliced, elided = [], False
+        for i, line in enumerate(lines):
+            if i in keep:
+                sliced.append(line)
+                elided = False
+            elif not elided and line.strip():
+                sliced.append(line[:len(line) - len(line.lstrip())] + "...")
+                elided = True
+        return '\n'.join(sliced)
+    
     def _compress_generic(self, content: str) -> str:
         """Generic compression - just remove empty lines."""
         lines = [line for line in content.split('\n') if line.strip()]
@@ -147,5 +424,7 @@ class ContextCompressor:
             'compressed_lines': len(compressed.split('\n')),
             'original_chars': len(original),
             'compressed_chars': len(compressed),
+            'original_tokens': token_counter.count(original),
+            'compressed_tokens': token_counter.count(compressed),
             'reduction_percent': round((1 - len(compressed) / len(original)) * 100, 2) if len(original) > 0 else 0
         }
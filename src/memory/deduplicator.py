@@ -0,0 +1,217 @@
+import re
+import zlib
+import numpy as np
+from typing import List, Dict, Any, Callable, Iterable, Optional, Tuple, Union
+from src.utils.logger import setup_logger
+
+logger = setup_logger("Deduplicator")
+
+class RuleDeduplicator:
+    """
+    Clusters near-duplicate business rules extracted from different files.
+
+    Moderate rule sets are clustered with vectorized cosine similarity over embeddings,
+    very large ones with MinHash signatures and LSH banding. Rules that mention different
+    numbers ("Tax is 5%" vs "Tax is 7%") are never merged.
+    """
+
+    _MERSENNE_PRIME = np.uint64(4294967311)
+
+    def __init__(self, similarity_threshold: float = 0.85, jaccard_threshold: float = 0.75,
+                 lsh_min_rules: int = 20000, num_perm: int = 64, bands: int = 16,
+                 embedding_dims: int = 1024, block_size: int = 2048,
+                 embedding_function: Optional[Callable[[List[str]], List[List[float]]]] = None):
+        """
+        Initialize the deduplicator.
+
+        Args:
+            similarity_threshold: Cosine similarity above which two rules are merged
+            jaccard_threshold: Estimated Jaccard similarity above which two rules are merged (LSH mode)
+            lsh_min_rules: Number of distinct rules from which MinHash/LSH is used instead of cosine
+            num_perm: Number of MinHash permutations
+            bands: Number of LSH bands (must divide num_perm)
+            embedding_dims: Dimensions of the local hashed bag-of-words embedding
+            block_size: Rows per block of the similarity matrix product
+            embedding_function: Optional embedding function (e.g. GeminiEmbeddingFunction);
+                a local hashed embedding is used when omitted
+        """
+        if num_perm % bands != 0:
+            raise ValueError("num_perm must be a multiple of bands")
+
+        self.similarity_threshold = similarity_threshold
+        self.jaccard_threshold = jaccard_threshold
+        self.lsh_min_rules = lsh_min_rules
+        self.num_perm = num_perm
+        self.bands = bands
+        self.embedding_dims = embedding_dims
+        self.block_size = block_size
+        self.embedding_function = embedding_function
+
+        rng = np.random.default_rng(1337)
+        self._perm_a = rng.integers(1, 2**31, size=num_perm, dtype=np.uint64)
+        self._perm_b = rng.integers(0, 2**31, size=num_perm, dtype=np.uint64)
+
+    def deduplicate(self, rules_by_file: Union[Dict[str, List[str]], Iterable[Tuple[str, List[str]]]]) -> List[Dict[str, Any]]:
+        """
+        Clusters rules by similarity and returns one canonical rule per cluster.
+
+        Args:
+            rules_by_file: Mapping of source file to the rules extracted from it, or a
+                stream of (file, rules) pairs (e.g. RuleStore.iter_rules_by_file())
+
+        Returns:
+            List of canonical rules, each with its source files and occurrence count
+        """
+        # Collapse exact duplicates (after normalization) before any vector work
+        texts = []
+        index_of = {}
+        occurrences = []
+        pairs = rules_by_file.items() if isinstance(rules_by_file, dict) else rules_by_file
+        for file_path, rules in pairs:
+            for rule in rules:
+                key = self._normalize(rule)
+                if not key:
+                    continue
+                if key not in index_of:
+                    index_of[key] = len(texts)
+                    texts.append(key)
+                    occurrences.append([])
+                occurrences[index_of[key]].append((rule, file_path))
+
+        total = sum(len(o) for o in occurrences)
+        if not texts:
+            return []
+
+        if len(texts) >= self.lsh_min_rules:
+            labels = self._cluster_minhash(texts)
+            mode = "MinHash/LSH"
+        else:
+            labels = self._cluster_cosine(texts)
+            mode = "cosine"
+
+        clusters: Dict[int, List[int]] = {}
+        for i, label in enumerate(labels):
+            clusters.setdefault(int(label), []).append(i)
+
+        canonical = []
+        for members in clusters.values():
+            counts: Dict[str, int] = {}
+            sources = set()
+            for i in members:
+                for rule, file_path in occurrences[i]:
+                    counts[rule] = counts.get(rule, 0) + 1
+                    sources.add(file_path)
+            # Most frequent wording wins, the shortest one on ties
+            rule = min(counts, key=lambda r: (-counts[r], len(r), r))
+            canonical.append({
+                'rule': rule,
+                'sources': sorted(sources),
+                'count': sum(counts.values())
+            })
+
+        canonical.sort(key=lambda c: -c['count'])
+        logger.info(f"🧹 Deduplicated {total} rules into {len(canonical)} canonical rules ({mode})")
+        return canonical
+
+    def _normalize(self, rule: str) -> str:
+        """Lowercases a rule and strips list markers, punctuation and extra whitespace."""
+        text = rule.lower().strip().lstrip('-*• ').strip()
+        text = re.sub(r'[^\w%.$]+', ' ', text)
+        text = re.sub(r'(?<!\d)\.|\.(?!\d)', ' ', text)
+        text = re.sub(r'(\d)\s+%', r'\1%', text)
+        return ' '.join(text.split())
+
+    def _numbers(self, texts: List[str]) -> np.ndarray:
+        """Maps each rule to an id of the set of numeric literals it mentions."""
+        ids = {}
+        out = np.empty(len(texts), dtype=np.int64)
+        for i, text in enumerate(texts):
+            key = ' '.join(sorted(set(re.findall(r'\d+(?:\.\d+)?', text))))
+            out[i] = ids.setdefault(key, len(ids))
+        return out
+
+    def _tokens(self, text: str) -> List[str]:
+        words = text.split()
+        return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+    def _embed(self, texts: List[str]) -> np.ndarray:
+        """Returns L2-normalized float32 embeddings for the given texts."""
+        if self.embedding_function is not None:
+            vectors = np.asarray(self.embedding_function(texts), dtype=np.float32)
+        else:
+            rows, cols = [], []
+            for i, text in enumerate(texts):
+                for token in self._tokens(text):
+                    rows.append(i)
+                    cols.append(zlib.crc32(token.encode('utf-8')) % self.embedding_dims)
+            vectors = np.zeros((len(texts), self.embedding_dims), dtype=np.float32)
+            np.add.at(vectors, (np.asarray(rows, dtype=np.int64), np.asarray(cols, dtype=np.int64)), 1.0)
+
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+    def _cluster_cosine(self, texts: List[str]) -> np.ndarray:
+        """Clusters with blockwise cosine similarity, restricted to rules with equal numbers."""
+        vectors = self._embed(texts)
+        numbers = self._numbers(texts)
+        parent = np.arange(len(texts))
+
+        for start in range(0, len(texts), self.block_size):
+            block = vectors[start:start + self.block_size]
+            mask = (block @ vectors.T) >= self.similarity_threshold
+            mask &= numbers[start:start + self.block_size, None] == numbers[None, :]
+            rows, cols = np.nonzero(mask)
+            rows += start
+            keep = cols > rows
+            self._union_pairs(parent, rows[keep], cols[keep])
+
+        return self._roots(parent)
+
+    def _cluster_minhash(self, texts: List[str]) -> np.ndarray:
+        """Clusters with MinHash signatures bucketed by LSH bands, verified per bucket."""
+        hashes, offsets = [], [0]
+        for text in texts:
+            tokens = self._tokens(text) or [text]
+            hashes.extend(zlib.crc32(t.encode('utf-8')) for t in tokens)
+            offsets.append(len(hashes))
+        hashes = np.asarray(hashes, dtype=np.uint64)
+        starts = np.asarray(offsets[:-1], dtype=np.int64)
+
+        signatures = np.empty((len(texts), self.num_perm), dtype=np.uint64)
+        for k in range(self.num_perm):
+            permuted = (self._perm_a[k] * hashes + self._perm_b[k]) % self._MERSENNE_PRIME
+            signatures[:, k] = np.minimum.reduceat(permuted, starts)
+
+        numbers = self._numbers(texts).astype(np.uint64)
+        parent = np.arange(len(texts))
+        rows_per_band = self.num_perm // self.bands
+
+        for band in range(self.bands):
+            key = np.column_stack([signatures[:, band * rows_per_band:(band + 1) * rows_per_band], numbers])
+            key = np.ascontiguousarray(key).view(np.dtype((np.void, key.dtype.itemsize * key.shape[1]))).ravel()
+            _, first, inverse = np.unique(key, return_index=True, return_inverse=True)
+            representative = first[inverse.ravel()]
+            members = np.nonzero(representative != np.arange(len(texts)))[0]
+            if len(members) == 0:
+                continue
+            estimate = (signatures[members] == signatures[representative[members]]).mean(axis=1)
+            keep = estimate >= self.jaccard_threshold
+            self._union_pairs(parent, representative[members][keep], members[keep])
+
+        return self._roots(parent)
+
+    def _union_pairs(self, parent: np.ndarray, left: np.ndarray, right: np.ndarray):
+        for a, b in zip(left.tolist(), right.tolist()):
+            root_a, root_b = self._find(parent, a), self._find(parent, b)
+            if root_a != root_b:
+                parent[max(root_a, root_b)] = min(root_a, root_b)
+
+    def _find(self, parent: np.ndarray, i: int) -> int:
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    def _roots(self, parent: np.ndarray) -> np.ndarray:
+        return np.array([self._find(parent, i) for i in range(len(parent))], dtype=np.int64)
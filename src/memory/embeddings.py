@@ -0,0 +1,46 @@
+from chromadb import Documents, EmbeddingFunction, Embeddings
+import google.generativeai as genai
+from src.utils.logger import setup_logger
+from src.utils.metrics import metrics
+from src.tools import cassette
+from src.utils.resilience import CallPolicy, get_breaker
+
+logger = setup_logger("Embeddings")
+
+class GeminiEmbeddingFunction(EmbeddingFunction):
+    """
+    Custom embedding function using Google Gemini API.
+    Removes dependency on onnxruntime and uses the same API key.
+    Every request runs under a timeout/retry policy with its own circuit breaker.
+    """
+    def __init__(self, policy: CallPolicy = None):
+        self.policy = policy or CallPolicy("embedding", timeout=60.0, breaker=get_breaker("gemini-embedding"))
+
+    def __call__(self, input: Documents) -> Embeddings:
+        model = 'models/text-embedding-004'
+        tape = cassette.get_active()
+        if tape and tape.replaying:
+            return [cassette.decode_vector(tape.replay("embedding", {'model': model, 'content': text}))
+                    for text in input]
+        try:
+            # Batch embed content
+            with metrics.span("embedding", texts=len(input)):
+                embeddings = [
+                    self.policy.call_sync(lambda: genai.embed_content(
+                        model=model,
+                        content=text,
+                        task_type="retrieval_document",
+                        request_options={'timeout': self.policy.timeout}
+                    ))['embedding']
+                    for text in input
+                ]
+            metrics.incr("embedding_texts_total", len(input))
+            if tape and tape.recording:
+                for text, embedding in zip(input, embeddings):
+                    tape.record("embedding", {'model': model, 'content': text}, cassette.encode_vector(embedding))
+            return embeddings
+        except Exception as e:
+            logger.error(f"Embedding error: {e}")
+            # Return empty embeddings or re-raise? 
+            # For robustness, we'll try to return zero vectors or raise
+            raise e
@@ -0,0 +1,188 @@
+import re
+import json
+import sqlite3
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from src.utils.logger import setup_logger
+from src.utils.metrics import metrics
+
+logger = setup_logger("LexicalIndex")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS rules (
+    row INTEGER PRIMARY KEY, rule_id TEXT UNIQUE, project TEXT, document TEXT, files TEXT, metadata TEXT
+);
+CREATE INDEX IF NOT EXISTS rules_project ON rules(project);
+CREATE VIRTUAL TABLE IF NOT EXISTS rules_fts USING fts5(
+    document, files, content='rules', content_rowid='row', tokenize='unicode61'
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS rules_vocab USING fts5vocab(rules_fts, 'row');
+"""
+
+# Query terms: runs of letters and digits, so identifiers and paths split into words
+TERM_PATTERN = re.compile(r'[^\W_]+')
+
+class LexicalIndex:
+    """
+    Full-text (SQLite FTS5) index of the memory bank's rule texts and source files.
+
+    Kept next to the vector store, so queries made of exact terms (a constant
+    name, a file path) are answered by a local BM25 lookup without embedding the
+    query. Terms occurring in more than `max_df` of the rules (e.g. "py" in a
+    Python code base) are left out of queries: they do not tell rules apart, and
+    ranking every rule they match is what makes a lookup slow.
+    """
+
+    def __init__(self, path: str, max_df: float = 0.2, file_weight: float = 2.0):
+        """
+        Initialize the index. The SQLite file is opened on first use.
+
+        Args:
+            path: SQLite file holding the index
+            max_df: Largest share of rules a query term may occur in
+            file_weight: BM25 weight of the source file column relative to the rule text
+        """
+        self.path = path
+        self.max_df = max_df
+        self.file_weight = file_weight
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        if self._conn is None:
+            with self._lock:
+                if self._conn is None:
+                    conn = sqlite3.connect(self.path, check_same_thread=False)
+                    conn.executescript(SCHEMA)
+                    self._conn = conn
+        return self._conn
+
+    @property
+    def synced(self) -> bool:
+        """Whether the index holds every rule of the bank (False until the first backfill)."""
+        return self.conn.execute("SELECT 1 FROM meta WHERE key = 'synced'").fetchone() is not None
+
+    def count(self) -> int:
+        return self.conn.execute("SELECT count(*) FROM rules").fetchone()[0]
+
+    def add(self, entries: Dict[str, Tuple[str, Dict[str, Any]]]) -> int:
+        """
+        Indexes rules that are not indexed yet.
+
+        Args:
+            entries: {rule id: (document, metadata)}, as stored in the vector store
+
+        Returns:
+            Number of rules added
+        """
+        conn = self.conn
+        added = 0
+        with self._lock, conn:
+            for rule_id, (document, rule_metadata) in entries.items():
+                files = str(rule_metadata.get('sources') or rule_metadata.get('file') or '')
+                cursor = conn.execute(
+                    "INSERT OR IGNORE INTO rules (rule_id, project, document, files, metadata) VALUES (?, ?, ?, ?, ?)",
+                    (rule_id, str(rule_metadata.get('project', '')), document, files,
+                     json.dumps(rule_metadata, ensure_ascii=False))
+                )
+                if cursor.rowcount:
+                    conn.execute("INSERT INTO rules_fts (rowid, document, files) VALUES (?, ?, ?)",
+                                 (cursor.lastrowid, document, files))
+                    added += 1
+        return added
+
+    def delete(self, rule_ids: Iterable[str]):
+        """Removes rules from the index."""
+        conn = self.conn
+        with self._lock, conn:
+            for rule_id in rule_ids:
+                row = conn.execute("SELECT row, document, files FROM rules WHERE rule_id = ?", (rule_id,)).fetchone()
+                if row:
+                    conn.execute("INSERT INTO rules_fts (rules_fts, rowid, document, files) VALUES ('delete', ?, ?, ?)", row)
+                    conn.execute("DELETE FROM rules WHERE row = ?", (row[0],))
+
+    def rebuild(self, entries: Iterable[Tuple[str, str, Dict[str, Any]]]):
+        """Replaces the index contents with (rule id, document, metadata) entries and marks it synced."""
+        self.clear()
+        batch: Dict[str, Tuple[str, Dict[str, Any]]] = {}
+        for rule_id, document, rule_metadata in entries:
+            batch[rule_id] = (document, rule_metadata or {})
+            if len(batch) >= 5000:
+                self.add(batch)
+                batch = {}
+        self.add(batch)
+        with self._lock, self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO meta VALUES ('synced', '1')")
+        logger.info(f"🔤 Indexed {self.count()} memory bank rules for full-text search")
+
+    def clear(self):
+        conn = self.conn
+        with self._lock, conn:
+            conn.execute("DELETE FROM rules")
+            conn.execute("INSERT INTO rules_fts (rules_fts) VALUES ('delete-all')")
+            conn.execute("DELETE FROM meta WHERE key = 'synced'")
+
+    def query_terms(self, query: str) -> List[str]:
+        """Terms of a query that are selective enough to search for."""
+        # Single letters carry no meaning; single digits do (pricing_3.py)
+        terms = list(dict.fromkeys(term.lower() for term in TERM_PATTERN.findall(query)
+                                   if len(term) > 1 or term.isdigit()))
+        if not terms:
+            return []
+        total = self.count()
+        if not total:
+            return []
+        placeholders = ', '.join('?' * len(terms))
+        frequencies = dict(self.conn.execute(
+            f"SELECT term, doc FROM rules_vocab WHERE term IN ({placeholders})", terms
+        ).fetchall())
+        return [term for term in terms if frequencies.get(term, 0) <= self.max_df * total]
+
+    def search(self, query: str, n_results: int = 5, project: Optional[str] = None,
+               where: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """
+        BM25 search over rule texts and source files.
+
+        Args:
+            query: Free text; every selective term is searched for (OR), rules
+                matching more and rarer terms rank first
+            n_results: Number of results to return
+            project: Only search this project's rules (every project if None)
+            where: Additional metadata equality filters
+
+        Returns:
+            Hits with 'rule', 'metadata', 'id' and 'bm25' (lower is better), best first
+        """
+        terms = self.query_terms(query)
+        if not terms:
+            return []
+        match = ' OR '.join('"' + term.replace('"', '""') + '"' for term in terms)
+        sql = ("SELECT r.rule_id, r.document, r.metadata, bm25(rules_fts, 1.0, ?) AS score "
+               "FROM rules_fts JOIN rules r ON r.row = rules_fts.rowid WHERE rules_fts MATCH ?")
+        params: List[Any] = [self.file_weight, match]
+        if project is not None:
+            sql += " AND r.project = ?"
+            params.append(project)
+        # Other metadata filters are checked on the rows, so fetch a few more than needed
+        sql += " ORDER BY score LIMIT ?"
+        params.append(n_results * 4 if where else n_results)
+
+        with metrics.span("lexical_index.query"):
+            rows = self.conn.execute(sql, params).fetchall()
+        hits = []
+        for rule_id, document, metadata_json, score in rows:
+            rule_metadata = json.loads(metadata_json)
+            if where and any(rule_metadata.get(key) != value for key, value in where.items()):
+                continue
+            hits.append({'id': rule_id, 'rule': document, 'metadata': rule_metadata, 'bm25': score})
+            if len(hits) == n_results:
+                break
+        return hits
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
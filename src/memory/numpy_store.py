@@ -0,0 +1,474 @@
+import os
+import json
+import threading
+from typing import List, Dict, Any, Optional, Tuple
+import numpy as np
+from src.utils.logger import setup_logger
+from src.utils.metrics import metrics
+from src.memory.vector_store import VectorStore
+
+logger = setup_logger("NumpyVectorStore")
+
+class NumpyVectorStore(VectorStore):
+    """
+    Memory bank backend keeping normalized float32 vectors in a memory-mapped file.
+
+    Rule texts and metadata live in an append-only JSON-lines side table whose line
+    numbers are the rows of the vector file. Rows are partitioned by project, so a
+    project-scoped search only reads that project's vectors. Search is an exact top-k
+    over one matrix product; scopes of at least `ivf_min_rules` rules are searched
+    through IVF lists (k-means centroids), scanning only the `nprobe` closest lists.
+
+    Distances are squared L2 between unit vectors (2 - 2 * cosine), like Chroma's default space.
+    Evictions rewrite both files without the evicted rows (compaction in the same pass).
+    """
+
+    default_directory = "./numpy_memory_bank"
+
+    def __init__(self, persist_directory: str = "./numpy_memory_bank",
+                 embedding_function: Optional[Any] = None,
+                 ivf_min_rules: Optional[int] = 50000, nprobe: int = 8):
+        """
+        Initialize the store. Nothing is read until first use.
+
+        Args:
+            persist_directory: Directory holding vectors.f32, rules.jsonl and the IVF index
+            embedding_function: Embedding function (Gemini by default)
+            ivf_min_rules: Rule count from which IVF partitioning is used (None for exact search only)
+            nprobe: IVF lists scanned per query
+        """
+        super().__init__(persist_directory, embedding_function)
+        self.ivf_min_rules = ivf_min_rules
+        self.nprobe = nprobe
+
+        self._ids: Dict[str, int] = {}
+        # Raw side-table lines, parsed on first access so opening a large bank stays fast
+        self._lines: List[str] = []
+        self._entries: Dict[int, Dict[str, Any]] = {}
+        # Rows of each project, and their cached index arrays
+        self._partitions: Dict[str, List[int]] = {}
+        self._partition_arrays: Dict[str, np.ndarray] = {}
+        self._vectors: Optional[np.memmap] = None
+        self._dims: Optional[int] = None
+        self._opened = False
+        self._write_lock = threading.Lock()
+
+        # IVF state: centroids, list id per row, and rows grouped by list
+        self._centroids: Optional[np.ndarray] = None
+        self._assignments = np.empty(0, dtype=np.int32)
+        self._trained_rows = 0
+        self._list_order: Optional[np.ndarray] = None
+        self._list_offsets: Optional[np.ndarray] = None
+
+    @property
+    def _vectors_path(self) -> str:
+        return os.path.join(self.persist_directory, "vectors.f32")
+
+    @property
+    def _rules_path(self) -> str:
+        return os.path.join(self.persist_directory, "rules.jsonl")
+
+    @property
+    def _header_path(self) -> str:
+        return os.path.join(self.persist_directory, "header.json")
+
+    @property
+    def _ivf_path(self) -> str:
+        return os.path.join(self.persist_directory, "ivf.npz")
+
+    def _open(self):
+        """Loads the side table and maps the vector file on first use."""
+        if self._opened:
+            return
+        with self._open_lock:
+            if self._opened:
+                return
+            with metrics.span("vector_store.open", backend="numpy"):
+                os.makedirs(self.persist_directory, exist_ok=True)
+                if os.path.exists(self._header_path):
+                    with open(self._header_path, 'r', encoding='utf-8') as f:
+                        self._dims = json.load(f)['dims']
+
+                if os.path.exists(self._rules_path):
+                    with open(self._rules_path, 'r', encoding='utf-8') as f:
+                        self._lines = [line for line in f if line.strip()]
+                    # Lines start with {"id": "<rule id>", so the id is the second quoted string
+                    self._ids = {line.split('"', 4)[3]: row for row, line in enumerate(self._lines)}
+
+                rows = 0
+                if self._dims and os.path.exists(self._vectors_path):
+                    rows = os.path.getsize(self._vectors_path) // (4 * self._dims)
+                    if rows:
+                        self._vectors = np.memmap(self._vectors_path, dtype=np.float32, mode='r+',
+                                                  shape=(rows, self._dims))
+
+                # A crash between the two appends leaves a vector without metadata (or the reverse)
+                self._count = min(len(self._lines), rows)
+                if self._count < len(self._lines):
+                    for rule_id, row in list(self._ids.items()):
+                        if row >= self._count:
+                            del self._ids[rule_id]
+                    del self._lines[self._count:]
+                for row, line in enumerate(self._lines):
+                    self._partitions.setdefault(self._line_project(row, line), []).append(row)
+
+                self._load_ivf()
+                self._load_access_times()
+            self._opened = True
+            logger.info(f"✅ Vector store initialized at {self.persist_directory} (numpy backend)")
+            logger.info(f"📊 Current collection size: {self._count} rules")
+
+    def _line_project(self, row: int, line: str) -> str:
+        """Project of a side-table line, read from the line prefix without parsing the JSON."""
+        # Lines start with {"id": "<rule id>", "project": "<project>",
+        parts = line.split('"', 8)
+        if len(parts) > 8 and parts[5] == 'project' and '\\' not in parts[7]:
+            return parts[7]
+        # Escaped names, and lines written before rules were scoped to projects
+        entry = self._entry(row)
+        return entry.get('project', entry['metadata'].get('project', ''))
+
+    def _partition_rows(self, project: str) -> np.ndarray:
+        if project not in self._partition_arrays:
+            self._partition_arrays[project] = np.asarray(self._partitions.get(project, []), dtype=np.int64)
+        return self._partition_arrays[project]
+
+    def _entry(self, row: int) -> Dict[str, Any]:
+        if row not in self._entries:
+            self._entries[row] = json.loads(self._lines[row])
+        return self._entries[row]
+
+    def _embedding(self):
+        if self.embedding_function is None:
+            factory = type(self).embedding_function_factory
+            if factory is None:
+                from src.memory.embeddings import GeminiEmbeddingFunction
+                factory = GeminiEmbeddingFunction
+            self.embedding_function = factory()
+        return self.embedding_function
+
+    def _embed(self, texts: List[str]) -> np.ndarray:
+        """Embeds and L2-normalizes texts."""
+        vectors = np.asarray(self._embedding()(texts), dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+
+    def _ensure_capacity(self, rows: int):
+        """Grows the vector file (doubling) so it holds at least `rows` rows."""
+        capacity = 0 if self._vectors is None else self._vectors.shape[0]
+        if rows <= capacity:
+            return
+        capacity = max(1024, capacity * 2, rows)
+        if self._vectors is not None:
+            self._vectors.flush()
+            self._vectors = None
+        with open(self._vectors_path, 'ab') as f:
+            f.truncate(capacity * self._dims * 4)
+        self._vectors = np.memmap(self._vectors_path, dtype=np.float32, mode='r+',
+                                  shape=(capacity, self._dims))
+
+    def _add_entries(self, entries: Dict[str, tuple], embeddings: Optional[Dict[str, Any]] = None) -> int:
+        """
+        Appends the entries that are not stored yet.
+
+        Args:
+            entries: {rule id: (document, metadata)}, see _prepare_entries
+            embeddings: Precomputed vectors by rule id (embedded here if None)
+
+        Returns:
+            Number of rules added
+        """
+        self._open()
+        new_ids = [rule_id for rule_id in entries if rule_id not in self._ids]
+        metrics.incr("cache_hits_total", len(entries) - len(new_ids), {'cache': 'memory_bank_rules'})
+        metrics.incr("cache_misses_total", len(new_ids), {'cache': 'memory_bank_rules'})
+        if not new_ids:
+            return 0
+
+        if embeddings:
+            vectors = np.asarray([embeddings[rule_id] for rule_id in new_ids], dtype=np.float32)
+            vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        else:
+            vectors = self._embed([entries[rule_id][0] for rule_id in new_ids])
+        with self._write_lock, metrics.span("vector_store.add", rules=len(new_ids), backend="numpy"):
+            if self._dims is None:
+                self._dims = int(vectors.shape[1])
+                with open(self._header_path, 'w', encoding='utf-8') as f:
+                    json.dump({'dims': self._dims}, f)
+
+            start = self._count
+            self._ensure_capacity(start + len(new_ids))
+            self._vectors[start:start + len(new_ids)] = vectors
+            self._vectors.flush()
+
+            with open(self._rules_path, 'a', encoding='utf-8') as f:
+                for offset, rule_id in enumerate(new_ids):
+                    document, rule_metadata = entries[rule_id]
+                    project = str(rule_metadata.get('project', ''))
+                    entry = {'id': rule_id, 'project': project, 'document': document, 'metadata': rule_metadata}
+                    line = json.dumps(entry, ensure_ascii=False) + '\n'
+                    f.write(line)
+                    self._ids[rule_id] = start + offset
+                    self._lines.append(line)
+                    self._entries[start + offset] = entry
+                    self._partitions.setdefault(project, []).append(start + offset)
+                    self._partition_arrays.pop(project, None)
+            self._count += len(new_ids)
+            self._assign_new_rows()
+        return len(new_ids)
+
+    def search_many(self, queries: List[str], n_results: int = 5, project: Optional[str] = None,
+                    where: Optional[Dict[str, Any]] = None, all_projects: bool = False) -> List[List[Dict[str, Any]]]:
+        """
+        Searches several queries with one embedding call and one matrix product,
+        scoped like search_similar_rules.
+
+        Returns:
+            One result list per query, in the format of search_similar_rules
+        """
+        conditions = self._scope(project, where, all_projects)
+        if self.count == 0 or not queries:
+            if self.count == 0:
+                logger.info("🧠 No prior memory found. Starting fresh.")
+            return [[] for _ in queries]
+
+        rows = self._candidate_rows(conditions)
+        if rows is not None and len(rows) == 0:
+            return [[] for _ in queries]
+
+        query_vectors = self._embed(queries)
+        with metrics.span("vector_store.query", backend="numpy", queries=len(queries)):
+            if self._use_ivf(self._count if rows is None else len(rows)):
+                allowed = None
+                if rows is not None:
+                    allowed = np.zeros(self._count, dtype=bool)
+                    allowed[rows] = True
+                hits = [self._search_ivf(vector, n_results, allowed) for vector in query_vectors]
+            else:
+                hits = self._search_exact(query_vectors, n_results, rows)
+
+        results = []
+        for rows, scores in hits:
+            self._touch([self._entry(row)['id'] for row in rows])
+            results.append([{
+                'rule': self._entry(row)['document'],
+                'metadata': self._entry(row)['metadata'],
+                'distance': float(2.0 - 2.0 * score)
+            } for row, score in zip(rows, scores)])
+        logger.info(f"🔍 Found {sum(len(r) for r in results)} similar rules from memory")
+        return results
+
+    def _candidate_rows(self, conditions: Dict[str, Any]) -> Optional[np.ndarray]:
+        """
+        Rows matching the metadata equality filters, or None when every row matches.
+
+        The project comes from the partitions; other fields are checked on the
+        candidate rows only, so filtering never touches other projects' metadata.
+        """
+        conditions = dict(conditions)
+        rows = None
+        if 'project' in conditions:
+            rows = self._partition_rows(str(conditions.pop('project')))
+        if conditions:
+            candidates = range(self._count) if rows is None else rows
+            rows = np.asarray([row for row in candidates
+                               if all(self._entry(row)['metadata'].get(key) == value
+                                      for key, value in conditions.items())], dtype=np.int64)
+        # A scope holding every row is searched without gathering a copy of the matrix
+        return None if rows is not None and len(rows) == self._count else rows
+
+    def _search_exact(self, query_vectors: np.ndarray, k: int,
+                      rows: Optional[np.ndarray] = None) -> List[Tuple[np.ndarray, np.ndarray]]:
+        if rows is None:
+            rows, matrix = np.arange(self._count), self._vectors[:self._count]
+        else:
+            matrix = self._vectors[rows]
+        scores = query_vectors @ matrix.T  # (queries, rules)
+        return [self._top_k(rows, row_scores, k) for row_scores in scores]
+
+    @staticmethod
+    def _top_k(rows: np.ndarray, scores: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        k = min(k, len(scores))
+        if k == 0:
+            return rows[:0], scores[:0]
+        best = np.argpartition(-scores, k - 1)[:k] if k < len(scores) else np.arange(len(scores))
+        best = best[np.argsort(-scores[best])]
+        return rows[best], scores[best]
+
+    def _use_ivf(self, scope_size: int) -> bool:
+        """Whether a search over `scope_size` rules goes through the IVF lists."""
+        if self.ivf_min_rules is None or scope_size < self.ivf_min_rules:
+            return False
+        if self._centroids is None or self._count > 2 * self._trained_rows:
+            self._train_ivf()
+        return True
+
+    def _train_ivf(self, iterations: int = 10, sample_size: int = 20000):
+        """Trains k-means centroids (sqrt(n) lists) on a sample and assigns every row."""
+        with metrics.span("vector_store.ivf_train", rules=self._count):
+            rng = np.random.default_rng(1337)
+            matrix = self._vectors[:self._count]
+            lists = int(min(4096, max(16, np.sqrt(self._count))))
+            sample = np.asarray(matrix[rng.choice(self._count, min(sample_size, self._count), replace=False)])
+            centroids = sample[rng.choice(len(sample), lists, replace=False)].copy()
+            for _ in range(iterations):
+                assignment = np.argmax(sample @ centroids.T, axis=1)
+                for list_id in range(lists):
+                    members = sample[assignment == list_id]
+                    # Re-seed empty lists with a random sample vector
+                    centroid = members.sum(axis=0) if len(members) else sample[rng.integers(len(sample))]
+                    centroids[list_id] = centroid / max(np.linalg.norm(centroid), 1e-12)
+            self._centroids = centroids.astype(np.float32)
+            self._assignments = np.empty(0, dtype=np.int32)
+            self._assign_new_rows()
+            self._trained_rows = self._count
+            self._save_ivf()
+        logger.info(f"🗂️ Built IVF index with {lists} lists over {self._count} rules")
+
+    def _assign_new_rows(self, chunk: int = 65536):
+        """Assigns rows added since the last assignment to their closest IVF list."""
+        if self._centroids is None or len(self._assignments) >= self._count:
+            return
+        parts = [self._assignments]
+        for start in range(len(self._assignments), self._count, chunk):
+            block = self._vectors[start:min(start + chunk, self._count)]
+            parts.append(np.argmax(block @ self._centroids.T, axis=1).astype(np.int32))
+        self._assignments = np.concatenate(parts)
+        self._list_order = np.argsort(self._assignments, kind='stable')
+        self._list_offsets = np.searchsorted(self._assignments[self._list_order],
+                                             np.arange(len(self._centroids) + 1))
+
+    def _search_ivf(self, query_vector: np.ndarray, k: int,
+                    allowed: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        probes = np.argsort(-(self._centroids @ query_vector))[:self.nprobe]
+        rows = np.concatenate([self._list_order[self._list_offsets[p]:self._list_offsets[p + 1]] for p in probes])
+        if allowed is not None:
+            rows = rows[allowed[rows]]
+        if len(rows) < k:
+            scope = None if allowed is None else np.flatnonzero(allowed)
+            return self._search_exact(query_vector[None, :], k, scope)[0]
+        rows.sort()  # sequential reads from the memory map
+        return self._top_k(rows, self._vectors[rows] @ query_vector, k)
+
+    def _save_ivf(self):
+        np.savez(self._ivf_path, centroids=self._centroids, assignments=self._assignments,
+                 trained_rows=np.int64(self._trained_rows))
+
+    def _load_ivf(self):
+        if not os.path.exists(self._ivf_path) or not self._count:
+            return
+        with np.load(self._ivf_path) as data:
+            self._centroids = data['centroids']
+            self._assignments = data['assignments'][:self._count]
+            self._trained_rows = int(data['trained_rows'])
+        self._assign_new_rows()
+        if self._list_order is None:
+            self._list_order = np.argsort(self._assignments, kind='stable')
+            self._list_offsets = np.searchsorted(self._assignments[self._list_order],
+                                                 np.arange(len(self._centroids) + 1))
+
+    def get_all_rules(self, project: Optional[str] = None) -> List[str]:
+        """
+        Retrieve all stored business rules.
+
+        Args:
+            project: Only return the rules of this project (all projects if None)
+
+        Returns:
+            List of all business rules
+        """
+        self._open()
+        rows = range(self._count) if project is None else self._partitions.get(project, [])
+        return [self._entry(row)['document'] for row in rows]
+
+    def _iter_entries(self):
+        for row in range(self._count):
+            entry = self._entry(row)
+            yield entry['id'], entry['document'], entry['metadata']
+
+    def clear_memory(self):
+        """Clear all stored rules (use with caution)."""
+        self._open()
+        with self._write_lock:
+            self._vectors = None
+            for path in (self._vectors_path, self._rules_path, self._header_path, self._ivf_path):
+                if os.path.exists(path):
+                    os.remove(path)
+            self._reset()
+            self._dims = None
+            self._count = 0
+            self._clear_access_times()
+        self.lexical.rebuild([])
+        logger.warning("🗑️ Memory bank cleared")
+
+    def _reset(self):
+        """Forgets the in-memory side table and IVF state."""
+        self._ids, self._lines, self._entries = {}, [], {}
+        self._partitions, self._partition_arrays = {}, {}
+        self._centroids = None
+        self._assignments = np.empty(0, dtype=np.int32)
+        self._trained_rows = 0
+        self._list_order = self._list_offsets = None
+
+    def _rule_times(self) -> Dict[str, Optional[float]]:
+        self._open()
+        return {self._entry(row)['id']: self._entry(row)['metadata'].get('stored_at') for row in range(self._count)}
+
+    def _delete_rules(self, rule_ids: set):
+        """Deletes rules by id, compacting the files in the same pass."""
+        dropped = {self._ids[rule_id] for rule_id in rule_ids if rule_id in self._ids}
+        self._rewrite([row for row in range(self._count) if row not in dropped])
+
+    def compact(self, projects: Optional[List[str]] = None):
+        """
+        Rewrites the vector file and side table without deleted rows or spare capacity.
+
+        Args:
+            projects: Accepted for API compatibility; the files are shared by all projects
+        """
+        self._open()
+        self._rewrite(list(range(self._count)))
+        logger.info(f"🗜️ Compacted memory bank to {self._count} rules")
+
+    def _rewrite(self, rows: List[int], chunk: int = 65536):
+        """Rewrites the files with only `rows`, then reopens them; the IVF lists are retrained on demand."""
+        with self._write_lock, metrics.span("vector_store.compact", backend="numpy", rules=len(rows)):
+            temp_vectors, temp_rules = self._vectors_path + ".tmp", self._rules_path + ".tmp"
+            if rows:
+                out = np.memmap(temp_vectors, dtype=np.float32, mode='w+', shape=(len(rows), self._dims))
+                for start in range(0, len(rows), chunk):
+                    out[start:start + chunk] = self._vectors[rows[start:start + chunk]]
+                out.flush()
+                del out
+            with open(temp_rules, 'w', encoding='utf-8') as f:
+                f.writelines(self._lines[row] for row in rows)
+
+            self._vectors = None
+            if rows:
+                os.replace(temp_vectors, self._vectors_path)
+            elif os.path.exists(self._vectors_path):
+                os.remove(self._vectors_path)
+            os.replace(temp_rules, self._rules_path)
+            if os.path.exists(self._ivf_path):
+                os.remove(self._ivf_path)
+            self._reset()
+            self._opened = False
+        self._open()
+
+    def _snapshot_columns(self, project: Optional[str]) -> tuple:
+        self._open()
+        rows = list(range(self._count)) if project is None else self._partitions.get(project, [])
+        vectors = np.asarray(self._vectors[rows]) if rows else np.empty((0, self._dims or 0), dtype=np.float32)
+        entries = [self._entry(row) for row in rows]
+        return ([entry['id'] for entry in entries], vectors,
+                [entry['document'] for entry in entries], [entry['metadata'] for entry in entries])
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get statistics about the memory bank."""
+        return {
+            'total_rules': self.count,
+            'persist_directory': self.persist_directory,
+            'backend': 'numpy',
+            'ivf_lists': 0 if self._centroids is None else len(self._centroids),
+            'projects': {project: len(rows) for project, rows in self._partitions.items() if project}
+        }
@@ -1,181 +1,773 @@
-import chromadb
-from chromadb.config import Settings
 import os
-from typing import List, Dict, Any
+import re
+import json
+import time
+import hashlib
+import threading
+from typing import List, Dict, Any, Callable, Optional
 from src.utils.logger import setup_logger
+from src.utils.metrics import metrics
+from src.memory.lexical_index import LexicalIndex
 
-from chromadb import Documents, EmbeddingFunction, Embeddings
-import google.generativeai as genai
-from src.utils.logger import setup_logger
+# chromadb and the Gemini SDK take seconds to import; they are loaded when the
+# memory bank is first opened (see VectorStore._open), not at import time.
 
 logger = setup_logger("VectorStore")
 
-class GeminiEmbeddingFunction(EmbeddingFunction):
-    """
-    Custom embedding function using Google Gemini API.
-    Removes dependency on onnxruntime and uses the same API key.
-    """
-    def __call__(self, input: Documents) -> Embeddings:
-        model = 'models/text-embedding-004'
-        try:
-            # Batch embed content
-            embeddings = [
-                genai.embed_content(
-                    model=model,
-                    content=text,
-                    task_type="retrieval_document"
-                )['embedding']
-                for text in input
-            ]
-            return embeddings
-        except Exception as e:
-            logger.error(f"Embedding error: {e}")
-            # Return empty embeddings or re-raise? 
-            # For robustness, we'll try to return zero vectors or raise
-            raise e
+# Version tag of the files written by VectorStore.export_snapshot
+SNAPSHOT_FORMAT = "logicmapper-memory-bank/1"
+
+# Chroma keeps each vector segment's index in a directory named after the segment id
+SEGMENT_DIR_PATTERN = re.compile(r'[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}')
 
 class VectorStore:
     """
     Long-term memory bank using ChromaDB.
     Stores business rules and allows retrieval for context in future analyses.
+    
+    Each project's rules live in their own collection, so a project-scoped search
+    only walks that project's index. Rules stored without a project (and banks
+    written before rules were scoped to projects) use the "business_rules" collection.
+    
+    The bank can be capped by size and age (see prune): rules are evicted least
+    recently used first, and the affected collections are compacted afterwards.
+    
+    A full-text index (LexicalIndex) of the rules is kept next to the vectors;
+    search_rules answers from it when it can and falls back to vector search.
     """
     
-    def __init__(self, persist_directory: str = "./chroma_db_data"):
+    # Builds the embedding function when none is passed; defaults to GeminiEmbeddingFunction.
+    # Benchmarks and tests swap in a local stand-in here.
+    embedding_function_factory: Optional[Callable[[], Any]] = None
+    
+    # Backend used by shared(): "chroma" (this class) or "numpy" (NumpyVectorStore)
+    backend: str = "chroma"
+    default_directory = "./chroma_db_data"
+    
+    # Lifecycle caps applied after each store (None disables them), see prune()
+    max_rules: Optional[int] = None
+    max_age_days: Optional[float] = None
+    # A bank over max_rules is pruned down to this fraction of it, so a full bank
+    # is not compacted again on every store
+    prune_low_water: float = 0.9
+    
+    # Process-wide instances by backend and directory, see shared()
+    _shared: Dict[tuple, 'VectorStore'] = {}
+    _shared_lock = threading.Lock()
+    
+    def __init__(self, persist_directory: str = "./chroma_db_data",
+                 embedding_function: Optional[Any] = None):
         """
         Initialize the vector store.
         
+        The ChromaDB client and collection are opened on first use, so runs that
+        never touch the memory bank pay nothing for it.
+        
         Args:
             persist_directory: Directory to persist the ChromaDB data
+            embedding_function: chromadb embedding function for the collection (Gemini by default)
         """
         self.persist_directory = persist_directory
+        self.embedding_function = embedding_function
+        self._client = None
+        self._collection = None
+        # Collections by project ('' is the "business_rules" collection) and their sizes
+        self._collections: Dict[str, Any] = {}
+        self._project_counts: Dict[str, int] = {}
+        self._count: Optional[int] = None
+        self._open_lock = threading.Lock()
+        # Last time each rule was returned by a search, persisted in access_times.json
+        self._last_used: Dict[str, float] = {}
+        self._pruned_at = 0.0
+        self._access_loaded = False
+        self._access_dirty = False
+        self._lexical: Optional[LexicalIndex] = None
+    
+    @classmethod
+    def shared(cls, persist_directory: Optional[str] = None) -> 'VectorStore':
+        """
+        Returns the process-wide memory bank for a directory, shared by all agents and runs.
         
-        # Create the directory if it doesn't exist
-        os.makedirs(persist_directory, exist_ok=True)
-        
-        # Initialize ChromaDB client with persistence
-        self.client = chromadb.PersistentClient(path=persist_directory)
-        
-        # Initialize Gemini Embedding Function
-        self.embedding_function = GeminiEmbeddingFunction()
+        Args:
+            persist_directory: Directory to persist the data (the backend's default directory if None)
+        """
+        store_class = cls
+        if cls.backend == "numpy":
+            from src.memory.numpy_store import NumpyVectorStore
+            store_class = NumpyVectorStore
+        elif cls.backend != "chroma":
+            raise ValueError(f"Unknown memory bank backend: {cls.backend}")
         
-        # Get or create collection for business rules
-        # Handle migration from old embedding function
-        try:
-            self.collection = self.client.get_or_create_collection(
+        persist_directory = persist_directory or store_class.default_directory
+        key = (cls.backend, os.path.abspath(persist_directory))
+        with cls._shared_lock:
+            if key not in cls._shared:
+                cls._shared[key] = store_class(persist_directory)
+            return cls._shared[key]
+    
+    @classmethod
+    def reset_shared(cls):
+        """Forgets the shared instances (e.g. after swapping the embedding function factory)."""
+        with cls._shared_lock:
+            cls._shared = {}
+    
+    @property
+    def client(self):
+        self._open()
+        return self._client
+    
+    @property
+    def collection(self):
+        self._open()
+        return self._collection
+    
+    @property
+    def lexical(self) -> LexicalIndex:
+        """Full-text index of the rules, backfilled from the bank on first use."""
+        if self._lexical is None:
+            with self._open_lock:
+                if self._lexical is None:
+                    os.makedirs(self.persist_directory, exist_ok=True)
+                    self._lexical = LexicalIndex(os.path.join(self.persist_directory, "lexical.sqlite3"))
+            if not self._lexical.synced:
+                # Banks written before the full-text index existed
+                self._open()
+                self._lexical.rebuild(self._iter_entries())
+        return self._lexical
+    
+    @property
+    def count(self) -> int:
+        """Number of stored rules, queried once and then tracked locally."""
+        self._open()
+        return self._count
+    
+    def _open(self):
+        """Opens the client and the collection on first use."""
+        if self._collection is not None:
+            return
+        with self._open_lock:
+            if self._collection is not None:
+                return
+            
+            # Create the directory if it doesn't exist
+            os.makedirs(self.persist_directory, exist_ok=True)
+            
+            # Initialize ChromaDB client with persistence
+            with metrics.span("vector_store.open"):
+                import chromadb
+                self._client = chromadb.PersistentClient(path=self.persist_directory)
+            
+            # Initialize Gemini Embedding Function
+            if self.embedding_function is None:
+                factory = type(self).embedding_function_factory
+                if factory is None:
+                    from src.memory.embeddings import GeminiEmbeddingFunction
+                    factory = GeminiEmbeddingFunction
+                self.embedding_function = factory()
+            
+            # Get or create collection for business rules
+            # Handle migration from old embedding function
+            try:
+                collection = self._get_or_create_collection()
+            except Exception as e:
+                if "embedding function" in str(e).lower() or "embedding" in str(e).lower():
+                    # Delete old collection and create new one
+                    logger.warning("⚠️ Detected old embedding function. Migrating to Gemini embeddings...")
+                    try:
+                        self._client.delete_collection("business_rules")
+                        logger.info("🗑️ Deleted old collection")
+                    except Exception as del_err:
+                        logger.warning(f"Could not delete old collection: {del_err}")
+                    collection = self._get_or_create_collection()
+                    logger.info("✅ Migration complete. Memory bank reset.")
+                else:
+                    raise e
+            
+            self._collections = {'': collection}
+            self._project_counts = {'': collection.count()}
+            for listed in self._client.list_collections():
+                name = getattr(listed, 'name', listed)
+                if name.startswith("business_rules_"):
+                    project_collection = self._client.get_collection(name, embedding_function=self.embedding_function)
+                    project = (project_collection.metadata or {}).get('project', name)
+                    self._collections[project] = project_collection
+                    self._project_counts[project] = project_collection.count()
+            
+            self._count = sum(self._project_counts.values())
+            self._load_access_times()
+            self._collection = collection
+            logger.info(f"✅ Vector store initialized at {self.persist_directory}")
+            logger.info(f"📊 Current collection size: {self._count} rules")
+    
+    def _get_or_create_collection(self, project: str = ''):
+        if not project:
+            return self._client.get_or_create_collection(
                 name="business_rules",
                 embedding_function=self.embedding_function,
                 metadata={"description": "Extracted business rules from legacy code"}
             )
-        except Exception as e:
-            if "embedding function" in str(e).lower() or "embedding" in str(e).lower():
-                # Delete old collection and create new one
-                logger.warning("⚠️ Detected old embedding function. Migrating to Gemini embeddings...")
-                try:
-                    self.client.delete_collection("business_rules")
-                    logger.info("🗑️ Deleted old collection")
-                except Exception as del_err:
-                    logger.warning(f"Could not delete old collection: {del_err}")
-                self.collection = self.client.get_or_create_collection(
-                    name="business_rules",
-                    embedding_function=self.embedding_function,
-                    metadata={"description": "Extracted business rules from legacy code"}
-                )
-                logger.info("✅ Migration complete. Memory bank reset.")
-            else:
-                raise e
-        
-        logger.info(f"✅ Vector store initialized at {persist_directory}")
-        logger.info(f"📊 Current collection size: {self.collection.count()} rules")
+        # Collection names are restricted to [a-zA-Z0-9._-], so the project name goes in the metadata
+        return self._client.get_or_create_collection(
+            name=f"business_rules_{hashlib.sha1(project.encode('utf-8')).hexdigest()[:16]}",
+            embedding_function=self.embedding_function,
+            metadata={"description": f"Extracted business rules of {project}", "project": project}
+        )
+    
+    def _project_collection(self, project: str):
+        """Collection holding a project's rules, created on first use."""
+        self._open()
+        if project not in self._collections:
+            with self._open_lock:
+                if project not in self._collections:
+                    self._collections[project] = self._get_or_create_collection(project)
+                    self._project_counts[project] = 0
+        return self._collections[project]
     
-    def store_rules(self, rules: List[str], metadata: Dict[str, Any] = None):
+    def store_rules(self, rules: List[str], metadata: Dict[str, Any] = None,
+                    metadatas: List[Dict[str, Any]] = None):
         """
         Store business rules in the vector database.
         
+        Rules are keyed by a hash of their project and normalized text, so a rule that
+        is already in the project's memory is not embedded or stored a second time.
+        
         Args:
             rules: List of business rule strings
-            metadata: Optional metadata about the source (file, project, etc.)
+            metadata: Optional metadata about the source (project, repo, commit, language, file)
+            metadatas: Optional per-rule metadata, overriding `metadata`
         """
         if not rules:
             logger.warning("No rules to store")
             return
         
-        # Generate unique IDs for each rule
-        ids = [f"rule_{self.collection.count() + i}" for i in range(len(rules))]
+        entries = self._prepare_entries(rules, metadata, metadatas)
+        stored = self._add_entries(entries)
+        self.lexical.add(entries)
+        if not stored:
+            logger.info(f"💾 All {len(entries)} rules already in memory bank")
+        else:
+            logger.info(f"💾 Stored {stored} rules in memory bank ({len(entries) - stored} already known)")
+        self._save_access_times()
+        self._enforce_limits()
+    
+    def _add_entries(self, entries: Dict[str, tuple], embeddings: Optional[Dict[str, Any]] = None) -> int:
+        """
+        Adds the entries that are not stored yet to their project's collection.
         
-        # Prepare metadata for each rule
-        metadatas = []
-        for rule in rules:
-            rule_metadata = metadata.copy() if metadata else {}
-            rule_metadata['rule_text'] = rule[:100]  # Store snippet in metadata
-            metadatas.append(rule_metadata)
+        Args:
+            entries: {rule id: (document, metadata)}, see _prepare_entries
+            embeddings: Precomputed vectors by rule id (embedded by the collection if None)
         
-        # Add to collection
-        self.collection.add(
-            documents=rules,
-            metadatas=metadatas,
-            ids=ids
-        )
+        Returns:
+            Number of rules added
+        """
+        by_project: Dict[str, List[str]] = {}
+        for rule_id, (_, rule_metadata) in entries.items():
+            by_project.setdefault(str(rule_metadata.get('project', '')), []).append(rule_id)
         
-        logger.info(f"💾 Stored {len(rules)} rules in memory bank")
+        stored = 0
+        for project, rule_ids in by_project.items():
+            collection = self._project_collection(project)
+            
+            # Skip rules that are already in the memory bank
+            existing = set(collection.get(ids=rule_ids, include=[])['ids'])
+            new_ids = [rule_id for rule_id in rule_ids if rule_id not in existing]
+            metrics.incr("cache_hits_total", len(existing), {'cache': 'memory_bank_rules'})
+            metrics.incr("cache_misses_total", len(new_ids), {'cache': 'memory_bank_rules'})
+            if not new_ids:
+                continue
+            
+            # Add to the project's collection
+            with metrics.span("vector_store.add", rules=len(new_ids)):
+                collection.add(
+                    documents=[entries[rule_id][0] for rule_id in new_ids],
+                    metadatas=[entries[rule_id][1] for rule_id in new_ids],
+                    embeddings=[embeddings[rule_id] for rule_id in new_ids] if embeddings else None,
+                    ids=new_ids
+                )
+            self._project_counts[project] += len(new_ids)
+            self._count += len(new_ids)
+            stored += len(new_ids)
+        return stored
+    
+    def _prepare_entries(self, rules: List[str], metadata: Optional[Dict[str, Any]],
+                         metadatas: Optional[List[Dict[str, Any]]]) -> Dict[str, tuple]:
+        """Generates content-addressed IDs and drops duplicates within the batch."""
+        entries = {}
+        for i, rule in enumerate(rules):
+            source = metadatas[i] if metadatas else metadata or {}
+            # Metadata values must be scalars; unknown fields (e.g. no git commit) are left out
+            rule_metadata = {key: value for key, value in source.items() if value is not None}
+            rule_metadata.setdefault('stored_at', round(time.time(), 3))
+            rule_id = self._rule_id(rule, rule_metadata.get('project'))
+            if rule_id in entries:
+                continue
+            rule_metadata['rule_text'] = rule[:100]  # Store snippet in metadata
+            entries[rule_id] = (rule, rule_metadata)
+        return entries
     
-    def search_similar_rules(self, query: str, n_results: int = 5) -> List[Dict[str, Any]]:
+    def _rule_id(self, rule: str, project: Optional[str] = None) -> str:
+        """Content-addressed ID for a rule within a project (case and whitespace insensitive)."""
+        normalized = ' '.join(rule.lower().split())
+        if project:
+            normalized = f"{project}\x00{normalized}"
+        return f"rule_{hashlib.sha1(normalized.encode('utf-8')).hexdigest()[:16]}"
+    
+    @staticmethod
+    def _scope(project: Optional[str], where: Optional[Dict[str, Any]], all_projects: bool) -> Dict[str, Any]:
+        """
+        Builds the metadata equality filter of a search.
+        
+        Searches are scoped to one project; searching every project has to be asked for.
+        """
+        if project is None and not all_projects:
+            raise ValueError("Memory bank searches are scoped to a project: pass project=... or all_projects=True")
+        conditions = dict(where or {})
+        if not all_projects:
+            conditions['project'] = project
+        return conditions
+    
+    def search_similar_rules(self, query: str, n_results: int = 5, project: Optional[str] = None,
+                             where: Optional[Dict[str, Any]] = None, all_projects: bool = False) -> List[Dict[str, Any]]:
         """
         Search for similar business rules.
         
         Args:
             query: Query text to search for
             n_results: Number of results to return
+            project: Project whose rules are searched
+            where: Additional metadata equality filters, e.g. {'language': 'java', 'commit': '...'}
+            all_projects: Search the rules of every project instead (cross-project search)
             
         Returns:
             List of similar rules with metadata
         """
-        if self.collection.count() == 0:
-            logger.info("🧠 No prior memory found. Starting fresh.")
-            return []
+        return self.search_many([query], n_results, project, where, all_projects)[0]
+    
+    def search_many(self, queries: List[str], n_results: int = 5, project: Optional[str] = None,
+                    where: Optional[Dict[str, Any]] = None, all_projects: bool = False) -> List[List[Dict[str, Any]]]:
+        """
+        Searches several queries in one query per collection, scoped like search_similar_rules.
         
-        results = self.collection.query(
-            query_texts=[query],
-            n_results=min(n_results, self.collection.count())
-        )
+        A project search queries that project's collection only; a cross-project
+        search queries every collection and merges the hits by distance.
+        
+        Returns:
+            One result list per query, in the format of search_similar_rules
+        """
+        conditions = self._scope(project, where, all_projects)
+        if self.count == 0 or not queries:
+            if self.count == 0:
+                logger.info("🧠 No prior memory found. Starting fresh.")
+            return [[] for _ in queries]
+        
+        if 'project' in conditions:
+            scoped = str(conditions.pop('project'))
+            projects = [scoped] if self._project_counts.get(scoped) else []
+        else:
+            projects = [name for name, size in self._project_counts.items() if size]
+        # Remaining fields are pre-filters on the rule metadata
+        clauses = [{key: value} for key, value in sorted(conditions.items())]
+        
+        all_rules = [[] for _ in queries]
+        for name in projects:
+            with metrics.span("vector_store.query", queries=len(queries)):
+                results = self._collections[name].query(
+                    query_texts=queries,
+                    n_results=min(n_results, self._project_counts[name]),
+                    where=(clauses[0] if len(clauses) == 1 else {'$and': clauses}) if clauses else None
+                )
+            
+            # Format results
+            for q in range(len(queries)):
+                if results['documents'] and results['documents'][q]:
+                    self._touch(results['ids'][q])
+                    for i, doc in enumerate(results['documents'][q]):
+                        all_rules[q].append({
+                            'rule': doc,
+                            'metadata': results['metadatas'][q][i] if results['metadatas'] else {},
+                            'distance': results['distances'][q][i] if results['distances'] else None
+                        })
+        if len(projects) > 1:
+            all_rules = [sorted(hits, key=lambda hit: hit['distance'])[:n_results] for hits in all_rules]
+        
+        logger.info(f"🔍 Found {sum(len(r) for r in all_rules)} similar rules from memory")
+        return all_rules
+    
+    def search_rules(self, query: str, n_results: int = 5, project: Optional[str] = None,
+                     where: Optional[Dict[str, Any]] = None, all_projects: bool = False,
+                     mode: str = "auto", min_lexical_hits: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Hybrid search: a BM25 lookup in the full-text index first, vector search when needed.
+        
+        Exact-term queries (a constant name, a file path) are answered locally,
+        without embedding the query.
+        
+        Args:
+            query: Query text to search for
+            n_results: Number of results to return
+            project: Project whose rules are searched
+            where: Additional metadata equality filters
+            all_projects: Search the rules of every project instead
+            mode: "auto" returns the full-text hits when there are enough of them and
+                otherwise fuses them with the vector hits (reciprocal rank fusion);
+                "lexical" and "vector" use one of the two only
+            min_lexical_hits: Full-text hits that are enough in "auto" mode (n_results by default)
+            
+        Returns:
+            Rules in the format of search_similar_rules plus 'match' ("lexical", "vector"
+            or "both"); 'distance' is None for rules only the full-text index found
+        """
+        if mode not in ("auto", "lexical", "vector"):
+            raise ValueError(f"Unknown memory search mode: {mode}")
+        conditions = self._scope(project, where, all_projects)
+        scoped = conditions.pop('project', None)
         
-        # Format results
-        similar_rules = []
-        if results['documents'] and results['documents'][0]:
-            for i, doc in enumerate(results['documents'][0]):
-                similar_rules.append({
-                    'rule': doc,
-                    'metadata': results['metadatas'][0][i] if results['metadatas'] else {},
-                    'distance': results['distances'][0][i] if results['distances'] else None
-                })
+        lexical_hits = []
+        if mode != "vector":
+            lexical_hits = self.lexical.search(query, n_results, None if scoped is None else str(scoped), conditions)
+            self._touch([hit['id'] for hit in lexical_hits])
+        enough = n_results if min_lexical_hits is None else min_lexical_hits
+        if mode == "lexical" or (mode == "auto" and lexical_hits and len(lexical_hits) >= enough):
+            metrics.incr("memory_searches_total", labels={'mode': 'lexical'})
+            return [{'rule': hit['rule'], 'metadata': hit['metadata'], 'distance': None, 'match': 'lexical'}
+                    for hit in lexical_hits]
         
-        logger.info(f"🔍 Found {len(similar_rules)} similar rules from memory")
-        return similar_rules
+        vector_hits = self.search_similar_rules(query, n_results, project, where, all_projects)
+        metrics.incr("memory_searches_total", labels={'mode': 'hybrid' if lexical_hits else 'vector'})
+        return self._fuse(lexical_hits, vector_hits, n_results)
+    
+    def _fuse(self, lexical_hits: List[Dict[str, Any]], vector_hits: List[Dict[str, Any]],
+              n_results: int, k: int = 60) -> List[Dict[str, Any]]:
+        """Reciprocal rank fusion of full-text and vector hits, matched by rule id."""
+        fused: Dict[str, Dict[str, Any]] = {}
+        for rank, hit in enumerate(lexical_hits):
+            fused[hit['id']] = {'rule': hit['rule'], 'metadata': hit['metadata'], 'distance': None,
+                                'match': 'lexical', 'score': 1.0 / (k + rank + 1)}
+        for rank, hit in enumerate(vector_hits):
+            rule_id = self._rule_id(hit['rule'], (hit['metadata'] or {}).get('project'))
+            if rule_id in fused:
+                fused[rule_id].update(distance=hit['distance'], match='both')
+                fused[rule_id]['score'] += 1.0 / (k + rank + 1)
+            else:
+                fused[rule_id] = dict(hit, match='vector', score=1.0 / (k + rank + 1))
+        ranked = sorted(fused.values(), key=lambda hit: -hit['score'])[:n_results]
+        return [{key: value for key, value in hit.items() if key != 'score'} for hit in ranked]
     
-    def get_all_rules(self) -> List[str]:
+    def get_all_rules(self, project: Optional[str] = None) -> List[str]:
         """
         Retrieve all stored business rules.
         
+        Args:
+            project: Only return the rules of this project (all projects if None)
+        
         Returns:
             List of all business rules
         """
-        if self.collection.count() == 0:
+        if self.count == 0:
             return []
         
-        results = self.collection.get()
-        return results['documents'] if results['documents'] else []
+        rules = []
+        for name, collection in list(self._collections.items()):
+            if project is None or name == project:
+                results = collection.get()
+                rules.extend(results['documents'] or [])
+        return rules
+    
+    def _iter_entries(self):
+        """Yields (rule id, document, metadata) of every stored rule."""
+        for collection in list(self._collections.values()):
+            data = collection.get(include=['documents', 'metadatas'])
+            yield from zip(data['ids'], data['documents'] or [], data['metadatas'] or [])
     
     def clear_memory(self):
-        """Clear all stored rules (use with caution)."""
-        self.client.delete_collection("business_rules")
-        self.collection = self.client.get_or_create_collection(
-            name="business_rules",
-            metadata={"description": "Extracted business rules from legacy code"}
-        )
+        """Clear all stored rules of every project (use with caution)."""
+        self._open()
+        for name, collection in list(self._collections.items()):
+            if name:
+                self._client.delete_collection(collection.name)
+        self._client.delete_collection("business_rules")
+        # Recreated through _get_or_create_collection so it keeps the embedding function
+        self._collection = self._get_or_create_collection()
+        self._collections = {'': self._collection}
+        self._project_counts = {'': 0}
+        self._count = 0
+        self._clear_access_times()
+        self.lexical.rebuild([])
         logger.warning("🗑️ Memory bank cleared")
     
+    # --- Lifecycle: access times, eviction, compaction ---
+    
+    @property
+    def _access_path(self) -> str:
+        return os.path.join(self.persist_directory, "access_times.json")
+    
+    def _load_access_times(self):
+        if self._access_loaded:
+            return
+        self._access_loaded = True
+        if os.path.exists(self._access_path):
+            try:
+                with open(self._access_path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                self._last_used = data.get('last_used', {})
+                self._pruned_at = data.get('pruned_at', 0.0)
+            except (OSError, ValueError) as e:
+                logger.warning(f"Could not read rule access times, starting over: {e}")
+    
+    def _save_access_times(self):
+        if not self._access_dirty:
+            return
+        temp_path = self._access_path + ".tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump({'pruned_at': self._pruned_at, 'last_used': self._last_used}, f)
+        os.replace(temp_path, self._access_path)
+        self._access_dirty = False
+    
+    def _clear_access_times(self):
+        self._last_used, self._pruned_at, self._access_dirty = {}, 0.0, False
+        if os.path.exists(self._access_path):
+            os.remove(self._access_path)
+    
+    def _touch(self, rule_ids: List[str]):
+        """Records that rules were returned by a search (for LRU and TTL eviction)."""
+        now = round(time.time(), 3)
+        for rule_id in rule_ids:
+            self._last_used[rule_id] = now
+        self._access_dirty = True
+    
+    def _enforce_limits(self):
+        """Applies the class-level caps after a store."""
+        if self.max_rules is not None and self._count > self.max_rules:
+            self.prune(max_rules=int(self.max_rules * self.prune_low_water))
+        elif self.max_age_days is not None and time.time() - self._pruned_at > 86400:
+            # Age-based eviction needs a pass over every rule, so it runs at most daily
+            self.prune()
+    
+    def prune(self, max_rules: Optional[int] = None, max_age_days: Optional[float] = None) -> int:
+        """
+        Evicts rules that were neither stored nor used within `max_age_days` (TTL),
+        then the least recently used rules until at most `max_rules` remain (LRU),
+        and compacts the store.
+        
+        Args:
+            max_rules: Size cap (the class-level max_rules if None)
+            max_age_days: Age cap (the class-level max_age_days if None)
+            
+        Returns:
+            Number of evicted rules
+        """
+        max_rules = self.max_rules if max_rules is None else max_rules
+        max_age_days = self.max_age_days if max_age_days is None else max_age_days
+        if self.count == 0:
+            return 0
+        
+        now = time.time()
+        last_active = {}
+        for rule_id, stored_at in self._rule_times().items():
+            used_at = self._last_used.get(rule_id)
+            if stored_at is None and used_at is None:
+                # Rules stored before ages were tracked start their clock now
+                used_at = self._last_used[rule_id] = now
+            last_active[rule_id] = max(stored_at or 0.0, used_at or 0.0)
+        
+        evicted = set()
+        if max_age_days is not None:
+            cutoff = now - max_age_days * 86400
+            evicted = {rule_id for rule_id, active in last_active.items() if active < cutoff}
+        if max_rules is not None and len(last_active) - len(evicted) > max_rules:
+            remaining = sorted((active, rule_id) for rule_id, active in last_active.items() if rule_id not in evicted)
+            evicted.update(rule_id for _, rule_id in remaining[:len(remaining) - max_rules])
+        
+        if evicted:
+            with metrics.span("vector_store.prune", rules=len(evicted)):
+                self._delete_rules(evicted)
+                self.lexical.delete(evicted)
+            metrics.incr("memory_bank_evictions_total", len(evicted))
+            logger.info(f"🧹 Evicted {len(evicted)} rules from memory bank ({self._count} remain)")
+        self._last_used = {rule_id: used_at for rule_id, used_at in self._last_used.items()
+                           if rule_id in last_active and rule_id not in evicted}
+        self._pruned_at = now
+        self._access_dirty = True
+        self._save_access_times()
+        return len(evicted)
+    
+    def _rule_times(self) -> Dict[str, Optional[float]]:
+        """Store time of every rule by id (None for rules stored before it was recorded)."""
+        times = {}
+        for collection in list(self._collections.values()):
+            data = collection.get(include=['metadatas'])
+            for rule_id, rule_metadata in zip(data['ids'], data['metadatas'] or []):
+                times[rule_id] = (rule_metadata or {}).get('stored_at')
+        return times
+    
+    def _delete_rules(self, rule_ids: set):
+        """Deletes rules by id and compacts the collections they were in."""
+        remaining, affected = set(rule_ids), []
+        for project, collection in list(self._collections.items()):
+            if not remaining:
+                break
+            members = collection.get(ids=list(remaining), include=[])['ids']
+            if members:
+                collection.delete(ids=members)
+                self._project_counts[project] -= len(members)
+                self._count -= len(members)
+                remaining.difference_update(members)
+                affected.append(project)
+        self.compact(affected)
+    
+    def compact(self, projects: Optional[List[str]] = None):
+        """
+        Rebuilds collections so the storage and index entries of deleted rules are reclaimed.
+        
+        The rules are copied with their vectors (nothing is re-embedded) into a new
+        collection, which replaces the old one once it is complete. The SQLite file is
+        vacuumed and the index directories of replaced collections are removed.
+        
+        Args:
+            projects: Projects whose collections are rebuilt (all if None)
+        """
+        self._open()
+        projects = list(self._collections) if projects is None else projects
+        for project in projects:
+            collection = self._collections.get(project)
+            if collection is None:
+                continue
+            with metrics.span("vector_store.compact", rules=self._project_counts.get(project, 0)):
+                data = collection.get(include=['embeddings', 'documents', 'metadatas'])
+                name = collection.name
+                temp_name = f"{name}_compact"
+                try:
+                    self._client.delete_collection(temp_name)
+                except Exception:
+                    pass
+                rebuilt = self._client.create_collection(temp_name, embedding_function=self.embedding_function,
+                                                         metadata=collection.metadata)
+                for start in range(0, len(data['ids']), 5000):
+                    end = start + 5000
+                    rebuilt.add(ids=data['ids'][start:end], embeddings=data['embeddings'][start:end],
+                                documents=data['documents'][start:end], metadatas=data['metadatas'][start:end])
+                self._client.delete_collection(name)
+                rebuilt.modify(name=name)
+            self._collections[project] = rebuilt
+            if not project:
+                self._collection = rebuilt
+        if projects:
+            self._reclaim_disk_space()
+            logger.info(f"🗜️ Compacted {len(projects)} memory bank collections")
+    
+    def _reclaim_disk_space(self):
+        """Vacuums chroma.sqlite3 and removes index directories no live segment refers to."""
+        import sqlite3
+        import shutil
+        
+        path = os.path.join(self.persist_directory, "chroma.sqlite3")
+        if not os.path.exists(path):
+            return
+        try:
+            db = sqlite3.connect(path, timeout=5)
+            try:
+                live_segments = {row[0] for row in db.execute("SELECT id FROM segments")}
+                db.execute("VACUUM")
+            finally:
+                db.close()
+        except sqlite3.Error as e:
+            logger.warning(f"Could not vacuum the memory bank database: {e}")
+            return
+        for name in os.listdir(self.persist_directory):
+            full_path = os.path.join(self.persist_directory, name)
+            if os.path.isdir(full_path) and SEGMENT_DIR_PATTERN.fullmatch(name) and name not in live_segments:
+                shutil.rmtree(full_path, ignore_errors=True)
+    
+    # --- Snapshots ---
+    
+    def export_snapshot(self, path: str, project: Optional[str] = None) -> int:
+        """
+        Writes rules with their vectors and metadata to a compact columnar .npz file.
+        
+        Strings are stored as one UTF-8 buffer per column plus offsets, vectors as a
+        float32 matrix, so a snapshot loads without pickling and without re-embedding.
+        
+        Args:
+            path: Snapshot file to write
+            project: Only export this project's rules (all projects if None)
+            
+        Returns:
+            Number of exported rules
+        """
+        import numpy as np
+        
+        ids, vectors, documents, metadatas = self._snapshot_columns(project)
+        columns = {}
+        for column, values in (('ids', ids), ('documents', documents),
+                               ('metadata', [json.dumps(value, ensure_ascii=False) for value in metadatas])):
+            columns[column], columns[f"{column}_offsets"] = self._pack_strings(values)
+        with metrics.span("vector_store.export", rules=len(ids)):
+            np.savez_compressed(path, format=np.array(SNAPSHOT_FORMAT),
+                                vectors=np.asarray(vectors, dtype=np.float32).reshape(len(ids), -1), **columns)
+        logger.info(f"📦 Exported {len(ids)} rules to {path}")
+        return len(ids)
+    
+    def import_snapshot(self, path: str) -> int:
+        """
+        Loads a snapshot written by export_snapshot, skipping rules already stored.
+        
+        Imported rules keep their vectors and metadata; their age starts at import time.
+        
+        Returns:
+            Number of rules added
+        """
+        import numpy as np
+        
+        with np.load(path, allow_pickle=False) as data:
+            if str(data['format']) != SNAPSHOT_FORMAT:
+                raise ValueError(f"{path} is not a memory bank snapshot ({SNAPSHOT_FORMAT})")
+            ids = self._unpack_strings(data['ids'], data['ids_offsets'])
+            documents = self._unpack_strings(data['documents'], data['documents_offsets'])
+            metadatas = [json.loads(value) for value in self._unpack_strings(data['metadata'], data['metadata_offsets'])]
+            vectors = data['vectors']
+        
+        now = round(time.time(), 3)
+        entries = {rule_id: (document, dict(rule_metadata, stored_at=now))
+                   for rule_id, document, rule_metadata in zip(ids, documents, metadatas)}
+        with metrics.span("vector_store.import", rules=len(entries)):
+            stored = self._add_entries(entries, embeddings=dict(zip(ids, vectors)))
+        self.lexical.add(entries)
+        logger.info(f"📦 Imported {stored} rules from {path} ({len(entries) - stored} already known)")
+        self._enforce_limits()
+        return stored
+    
+    def _snapshot_columns(self, project: Optional[str]) -> tuple:
+        """Returns (ids, vectors, documents, metadatas) of the rules to export."""
+        self._open()
+        ids, vectors, documents, metadatas = [], [], [], []
+        for name, collection in list(self._collections.items()):
+            if project is not None and name != project:
+                continue
+            data = collection.get(include=['embeddings', 'documents', 'metadatas'])
+            ids.extend(data['ids'])
+            vectors.extend(data['embeddings'] if data['embeddings'] is not None else [])
+            documents.extend(data['documents'] or [])
+            metadatas.extend(data['metadatas'] or [])
+        return ids, vectors, documents, metadatas
+    
+    @staticmethod
+    def _pack_strings(values: List[str]) -> tuple:
+        """Packs strings into one UTF-8 byte buffer and their end offsets."""
+        import numpy as np
+        encoded = [value.encode('utf-8') for value in values]
+        offsets = np.cumsum([0] + [len(value) for value in encoded], dtype=np.int64)
+        return np.frombuffer(b''.join(encoded), dtype=np.uint8), offsets
+    
+    @staticmethod
+    def _unpack_strings(buffer, offsets) -> List[str]:
+        raw = buffer.tobytes()
+        return [raw[offsets[i]:offsets[i + 1]].decode('utf-8') for i in range(len(offsets) - 1)]
+    
     def get_stats(self) -> Dict[str, Any]:
         """Get statistics about the memory bank."""
         return {
-            'total_rules': self.collection.count(),
-            'persist_directory': self.persist_directory
+            'total_rules': self.count,
+            'persist_directory': self.persist_directory,
+            'projects': {name: size for name, size in self._project_counts.items() if name}
         }
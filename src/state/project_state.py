@@ -4,6 +4,7 @@ import json
 import os
 from datetime import datetime
 from src.utils.logger import setup_logger
+from src.state.rule_store import RuleStore
 
 logger = setup_logger("ProjectState")
 
@@ -11,8 +12,15 @@ class FileAnalysis(BaseModel):
     """Represents the analysis status and results for a single file."""
     file_path: str
     language: str
+    # Empty when the rules are kept in the project's rule store (see ProjectState.rules_for)
     business_rules: List[str] = []
-    status: str = "pending"  # pending, analyzed, error
+    rule_count: int = 0
+    status: str = "pending"  # pending, analyzed, error, skipped
+    error: Optional[str] = None
+    skip_reason: Optional[str] = None
+    # Set when the rules were taken over from an identical or near-identical file
+    duplicate_of: Optional[str] = None
+    similarity: Optional[float] = None
 
 class ProjectState(BaseModel):
     """
@@ -26,6 +34,10 @@ class ProjectState(BaseModel):
     analyses: Dict[str, FileAnalysis] = {}
     modernization_plan: Optional[str] = None
     dependency_graph: Optional[str] = None
+    dependencies: Dict[str, List[str]] = {}
+    budget_usage: Dict[str, Any] = {}
+    # SQLite RuleStore holding the rules of each analyzed file
+    rule_store: Optional[str] = None
     
     def update_scan_results(self, scan_results: Dict[str, Any]):
         """Update state with results from the Scanner Agent."""
@@ -42,10 +54,20 @@ class ProjectState(BaseModel):
                 )
         logger.info(f"📊 State updated: {len(self.scanned_files)} files found.")
 
-    def update_analysis(self, file_path: str, rules: List[str]):
-        """Update state with results from the Analyst Agent."""
+    def update_analysis(self, file_path: str, rules: Optional[List[str]] = None, rule_count: Optional[int] = None):
+        """
+        Update state with results from the Analyst Agent.
+
+        Args:
+            file_path: Analyzed file
+            rules: Rules extracted from the file, kept in the state itself
+            rule_count: Number of rules, when the rules are kept in the rule store instead
+        """
+        rules = rules or []
+        rule_count = len(rules) if rule_count is None else rule_count
         if file_path in self.analyses:
             self.analyses[file_path].business_rules = rules
+            self.analyses[file_path].rule_count = rule_count
             self.analyses[file_path].status = "analyzed"
             logger.info(f"✅ Analysis recorded for {file_path}")
         else:
@@ -55,10 +77,69 @@ class ProjectState(BaseModel):
                 file_path=file_path,
                 language=ext,
                 business_rules=rules,
+                rule_count=rule_count,
                 status="analyzed"
             )
             logger.warning(f"⚠️ File {file_path} added to state during analysis phase.")
 
+    def mark_analysis_failed(self, file_path: str, error: str):
+        """Record that a file could not be analyzed, so its rules are not silently missing."""
+        if file_path not in self.analyses:
+            ext = os.path.splitext(file_path)[1]
+            self.analyses[file_path] = FileAnalysis(file_path=file_path, language=ext)
+        self.analyses[file_path].status = "error"
+        self.analyses[file_path].error = error
+        logger.warning(f"⚠️ Analysis failed for {file_path}: {error}")
+
+    def record_duplicate(self, file_path: str, representative: str, similarity: float,
+                         rules: Optional[List[str]] = None, rule_count: Optional[int] = None):
+        """Record the rules of a copy of another file, taken over from the analysis of that file."""
+        if file_path not in self.analyses:
+            ext = os.path.splitext(file_path)[1]
+            self.analyses[file_path] = FileAnalysis(file_path=file_path, language=ext)
+        analysis = self.analyses[file_path]
+        analysis.business_rules = list(rules or [])
+        analysis.rule_count = len(analysis.business_rules) if rule_count is None else rule_count
+        analysis.status = "analyzed"
+        analysis.duplicate_of = representative
+        analysis.similarity = similarity
+
+    def mark_skipped(self, file_path: str, reason: str):
+        """Record that the pre-filter skipped a file as unlikely to contain business logic."""
+        if file_path not in self.analyses:
+            ext = os.path.splitext(file_path)[1]
+            self.analyses[file_path] = FileAnalysis(file_path=file_path, language=ext)
+        self.analyses[file_path].status = "skipped"
+        self.analyses[file_path].skip_reason = reason
+
+    def set_dependency_graph(self, mermaid: str, dependencies: Dict[str, List[str]]):
+        """Store the import graph (file -> imported files) and its Mermaid rendering."""
+        self.dependency_graph = mermaid
+        self.dependencies = dependencies
+        logger.info(f"🕸️ Dependency graph stored in state ({len(dependencies)} files).")
+
+    def set_rule_store(self, path: str):
+        """Store where the rules of each file are kept, so they need not be copied into the state."""
+        self.rule_store = path
+        logger.info(f"🗄️ Rule store recorded in state: {path}")
+
+    def rules_for(self, file_path: str) -> List[str]:
+        """The rules of an analyzed file, from the state or else from the rule store."""
+        analysis = self.analyses.get(file_path)
+        if analysis is None:
+            return []
+        if analysis.business_rules or not analysis.rule_count or not self.rule_store:
+            return analysis.business_rules
+        if not os.path.exists(self.rule_store):
+            logger.warning(f"⚠️ Rule store {self.rule_store} not found, rules of {file_path} unavailable")
+            return []
+        return RuleStore.shared(self.rule_store).rules_for(file_path)
+
+    def set_budget_usage(self, usage: Dict[str, Any]):
+        """Store how much of the run budget (tokens, dollars, wall time) was used."""
+        self.budget_usage = usage
+        logger.info(f"💰 Budget usage stored in state: {usage.get('tokens')} tokens, ${usage.get('dollars')}")
+
     def set_modernization_plan(self, plan: str):
         """Store the final modernization plan."""
         self.modernization_plan = plan
@@ -0,0 +1,229 @@
+import os
+import sqlite3
+import threading
+from itertools import groupby
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+from src.tools.file_system import FileSystemTools
+from src.utils.logger import setup_logger
+
+logger = setup_logger("RuleStore")
+
+SCHEMA = """
+PRAGMA journal_mode = WAL;
+PRAGMA synchronous = NORMAL;
+CREATE TABLE IF NOT EXISTS files (
+    file TEXT PRIMARY KEY, module TEXT, language TEXT, rule_count INTEGER, duplicate_of TEXT
+);
+CREATE INDEX IF NOT EXISTS files_module ON files(module);
+CREATE TABLE IF NOT EXISTS rules (id INTEGER PRIMARY KEY, file TEXT, module TEXT, position INTEGER, rule TEXT);
+CREATE INDEX IF NOT EXISTS rules_file ON rules(file, position);
+CREATE INDEX IF NOT EXISTS rules_module ON rules(module);
+CREATE TABLE IF NOT EXISTS canonical (id INTEGER PRIMARY KEY, rule TEXT, sources TEXT, count INTEGER);
+CREATE INDEX IF NOT EXISTS canonical_rule ON canonical(rule);
+"""
+
+# Columns the rules of a run can be aggregated by
+AGGREGATES = ('file', 'module', 'language')
+
+class RuleStore:
+    """
+    On-disk store of the rules extracted during an analysis, keyed by file and module.
+
+    The Analyst writes the rules of each file as soon as they are extracted, so
+    neither it nor the later stages hold every rule of the repository in memory:
+    they read them back through streaming iterators (per file, per module, or the
+    deduplicated canonical rules) and aggregate queries. Copies of other files
+    (see DuplicateFileDetector) point at their representative instead of storing
+    its rules again.
+
+    The store is a SQLite file that outlives the run, so the UI and a resumed
+    run can look up the rules of any file without loading the whole analysis.
+    """
+
+    default_path: str = "./rule_store.db"
+
+    _shared: Dict[str, 'RuleStore'] = {}
+    _shared_lock = threading.Lock()
+
+    def __init__(self, path: Optional[str] = None, batch_size: int = 1000):
+        """
+        Initialize the store. The SQLite file is opened on first use.
+
+        Args:
+            path: SQLite file holding the rules
+            batch_size: Rows fetched at a time by the iterators
+        """
+        self.path = path or self.default_path
+        self.batch_size = batch_size
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def shared(cls, path: Optional[str] = None) -> 'RuleStore':
+        """Returns the process-wide store for a file, shared by all agents."""
+        path = path or cls.default_path
+        with cls._shared_lock:
+            if path not in cls._shared:
+                cls._shared[path] = cls(path)
+            return cls._shared[path]
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        if self._conn is None:
+            with self._lock:
+                if self._conn is None:
+                    conn = sqlite3.connect(self.path, check_same_thread=False)
+                    conn.executescript(SCHEMA)
+                    self._conn = conn
+        return self._conn
+
+    @staticmethod
+    def module_of(file_path: str) -> str:
+        """The module a file belongs to: its directory, '.' for top-level files."""
+        return os.path.dirname(file_path.replace('\\', '/')) or '.'
+
+    def clear(self):
+        """Removes every rule, e.g. before a new analysis."""
+        conn = self.conn
+        with self._lock, conn:
+            conn.execute("DELETE FROM files")
+            conn.execute("DELETE FROM rules")
+            conn.execute("DELETE FROM canonical")
+
+    def add_file(self, file_path: str, rules: List[str]):
+        """Stores the rules extracted from a file, replacing earlier ones."""
+        module = self.module_of(file_path)
+        conn = self.conn
+        with self._lock, conn:
+            conn.execute("DELETE FROM rules WHERE file = ?", (file_path,))
+            conn.executemany(
+                "INSERT INTO rules (file, module, position, rule) VALUES (?, ?, ?, ?)",
+                ((file_path, module, position, rule) for position, rule in enumerate(rules))
+            )
+            conn.execute("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, NULL)",
+                         (file_path, module, FileSystemTools.language_of(file_path), len(rules)))
+
+    def add_duplicate(self, file_path: str, representative: str):
+        """Records a copy of an analyzed file; it shares the rules of its representative."""
+        conn = self.conn
+        with self._lock, conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO files "
+                "SELECT ?, ?, ?, rule_count, file FROM files WHERE file = ? AND duplicate_of IS NULL",
+                (file_path, self.module_of(file_path), FileSystemTools.language_of(file_path), representative)
+            )
+
+    def set_canonical(self, canonical_rules: Iterable[Dict[str, Any]]):
+        """Stores the deduplicated rules (rule, sources, count), see RuleDeduplicator."""
+        conn = self.conn
+        with self._lock, conn:
+            conn.execute("DELETE FROM canonical")
+            conn.executemany(
+                "INSERT INTO canonical (rule, sources, count) VALUES (?, ?, ?)",
+                ((c['rule'], ', '.join(c['sources']), c['count']) for c in canonical_rules)
+            )
+
+    def rules_for(self, file_path: str, limit: Optional[int] = None) -> List[str]:
+        """The rules of one file (those of its representative for copies), in extraction order."""
+        rows = self.conn.execute(
+            "SELECT rule FROM rules WHERE file = COALESCE((SELECT duplicate_of FROM files WHERE file = ?), ?) "
+            "ORDER BY position LIMIT ?",
+            (file_path, file_path, -1 if limit is None else limit)
+        )
+        return [rule for rule, in rows]
+
+    def has_file(self, file_path: str) -> bool:
+        return self.conn.execute("SELECT 1 FROM files WHERE file = ?", (file_path,)).fetchone() is not None
+
+    def has_rule(self, rule: str) -> bool:
+        """Whether a rule is one of the canonical rules of the analysis."""
+        return self.conn.execute("SELECT 1 FROM canonical WHERE rule = ?", (rule,)).fetchone() is not None
+
+    def count(self, file_path: Optional[str] = None, module: Optional[str] = None) -> int:
+        """Number of rules extracted (from one file or module; copies are not counted twice)."""
+        sql, params = self._where("SELECT count(*) FROM rules", file_path, module)
+        return self.conn.execute(sql, params).fetchone()[0]
+
+    def canonical_count(self) -> int:
+        return self.conn.execute("SELECT count(*) FROM canonical").fetchone()[0]
+
+    def aggregate(self, by: str = 'module', limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Counts the analyzed files and their rules per file, module or language.
+
+        Args:
+            by: One of AGGREGATES
+            limit: Only return the groups with the most rules
+
+        Returns:
+            Groups with the value of `by`, 'files' and 'rules' (copies included), most rules first
+        """
+        if by not in AGGREGATES:
+            raise ValueError(f"Cannot aggregate rules by {by!r}, expected one of {AGGREGATES}")
+        rows = self.conn.execute(
+            f"SELECT {by}, count(*), sum(rule_count) FROM files GROUP BY {by} "
+            f"ORDER BY sum(rule_count) DESC, {by} LIMIT ?",
+            (-1 if limit is None else limit,)
+        )
+        return [{by: value, 'files': files, 'rules': rules} for value, files, rules in rows]
+
+    def iter_files(self) -> Iterator[Dict[str, Any]]:
+        """Streams the analyzed files with their module, language, rule count and representative."""
+        rows = self.conn.execute("SELECT file, module, language, rule_count, duplicate_of FROM files ORDER BY file")
+        for file_path, module, language, rule_count, duplicate_of in self._batches(rows):
+            yield {'file': file_path, 'module': module, 'language': language,
+                   'rule_count': rule_count, 'duplicate_of': duplicate_of}
+
+    def iter_rules(self, file_path: Optional[str] = None, module: Optional[str] = None) -> Iterator[Dict[str, str]]:
+        """Streams the extracted rules (of one file or module) with their file and module."""
+        sql, params = self._where("SELECT file, module, rule FROM rules", file_path, module)
+        rows = self.conn.execute(sql + " ORDER BY file, position", params)
+        for file_path, module, rule in self._batches(rows):
+            yield {'file': file_path, 'module': module, 'rule': rule}
+
+    def iter_rules_by_file(self) -> Iterator[Tuple[str, List[str]]]:
+        """Streams (file, rules) pairs, one file at a time, copies included."""
+        rows = self.conn.execute(
+            "SELECT f.file, r.rule FROM files f JOIN rules r ON r.file = COALESCE(f.duplicate_of, f.file) "
+            "ORDER BY f.file, r.position"
+        )
+        for file_path, group in groupby(self._batches(rows), key=lambda row: row[0]):
+            yield file_path, [rule for _, rule in group]
+
+    def iter_canonical(self, limit: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+        """Streams the canonical rules, the most frequent first."""
+        rows = self.conn.execute("SELECT rule, sources, count FROM canonical ORDER BY count DESC, id LIMIT ?",
+                                 (-1 if limit is None else limit,))
+        for rule, sources, count in self._batches(rows):
+            yield {'rule': rule, 'sources': sources.split(', '), 'count': count}
+
+    def __iter__(self) -> Iterator[str]:
+        """Streams the canonical rule texts, the most frequent first."""
+        return (canonical['rule'] for canonical in self.iter_canonical())
+
+    def __len__(self) -> int:
+        return self.canonical_count()
+
+    def _batches(self, cursor: sqlite3.Cursor) -> Iterator[tuple]:
+        while True:
+            rows = cursor.fetchmany(self.batch_size)
+            if not rows:
+                return
+            yield from rows
+
+    @staticmethod
+    def _where(sql: str, file_path: Optional[str], module: Optional[str]) -> Tuple[str, List[str]]:
+        clauses, params = [], []
+        if file_path is not None:
+            clauses.append("file = ?")
+            params.append(file_path)
+        if module is not None:
+            clauses.append("module = ?")
+            params.append(module)
+        return (sql + " WHERE " + " AND ".join(clauses) if clauses else sql), params
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
@@ -0,0 +1,263 @@
+import json
+import time
+import uuid
+import sqlite3
+import threading
+from typing import Any, Dict, Iterable, List, Optional
+from src.utils.logger import setup_logger
+from src.utils.metrics import metrics
+
+logger = setup_logger("WorkQueue")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run TEXT PRIMARY KEY, project TEXT, base_path TEXT, options TEXT, created REAL, closed INTEGER DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS tasks (
+    id INTEGER PRIMARY KEY, run TEXT NOT NULL, file TEXT NOT NULL, payload TEXT,
+    status TEXT NOT NULL DEFAULT 'pending', worker TEXT, lease_expires REAL, attempts INTEGER NOT NULL DEFAULT 0,
+    rules TEXT, error TEXT, collected INTEGER NOT NULL DEFAULT 0, UNIQUE (run, file)
+);
+CREATE INDEX IF NOT EXISTS tasks_status ON tasks(status, id);
+CREATE INDEX IF NOT EXISTS tasks_run ON tasks(run, status, collected);
+"""
+
+# Task states: pending -> leased -> done, or back to pending until max_attempts, then failed
+STATUSES = ('pending', 'leased', 'done', 'failed')
+
+class WorkQueue:
+    """
+    Durable queue of per-file analysis tasks in a SQLite file.
+
+    A coordinator enqueues the files of a run; any number of worker processes,
+    on this machine or on others sharing the file system, claim tasks with a
+    lease they renew by heartbeat while the model works, and write the rules
+    back. Leases of crashed or stalled workers expire and their tasks are handed
+    to the next worker, until a task has been attempted `max_attempts` times.
+
+    Every state change is a short transaction taking SQLite's write lock, so
+    claims never hand one task to two workers. The rollback journal (not WAL) is
+    used because WAL does not work on network file systems.
+    """
+
+    def __init__(self, path: str, max_attempts: int = 3, busy_timeout: float = 30.0):
+        """
+        Initialize the queue. The SQLite file is opened (and created) on first use.
+
+        Args:
+            path: SQLite file holding the queue, on a file system all workers can reach
+            max_attempts: Claims of a task before it is given up as failed
+            busy_timeout: Seconds to wait for another process's write lock
+        """
+        self.path = path
+        self.max_attempts = max_attempts
+        self.busy_timeout = busy_timeout
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        if self._conn is None:
+            with self._lock:
+                if self._conn is None:
+                    # Autocommit; write transactions are started explicitly with BEGIN IMMEDIATE
+                    conn = sqlite3.connect(self.path, timeout=self.busy_timeout,
+                                           isolation_level=None, check_same_thread=False)
+                    conn.executescript(SCHEMA)
+                    self._conn = conn
+        return self._conn
+
+    def _write(self, statements) -> Any:
+        """Runs `statements(conn)` in one write transaction and returns its result."""
+        conn = self.conn
+        with self._lock:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = statements(conn)
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+            return result
+
+    def create_run(self, project: Optional[str], base_path: str, options: Optional[Dict[str, Any]] = None) -> str:
+        """
+        Registers a run whose tasks workers may claim.
+
+        Args:
+            project: Memory bank project the files belong to
+            base_path: Directory the task files are relative to (reachable by the workers)
+            options: Analysis settings the workers apply, e.g. min_compression_level
+
+        Returns:
+            The run id
+        """
+        run = uuid.uuid4().hex[:12]
+        self._write(lambda conn: conn.execute(
+            "INSERT INTO runs (run, project, base_path, options, created) VALUES (?, ?, ?, ?, ?)",
+            (run, project, base_path, json.dumps(options or {}), time.time())
+        ))
+        return run
+
+    def get_run(self, run: str) -> Optional[Dict[str, Any]]:
+        row = self.conn.execute("SELECT project, base_path, options, closed FROM runs WHERE run = ?", (run,)).fetchone()
+        if row is None:
+            return None
+        project, base_path, options, closed = row
+        return {'run': run, 'project': project, 'base_path': base_path,
+                'options': json.loads(options or '{}'), 'closed': bool(closed)}
+
+    def close_run(self, run: str):
+        """Stops workers from claiming the run's remaining tasks (e.g. when the coordinator exits)."""
+        self._write(lambda conn: conn.execute("UPDATE runs SET closed = 1 WHERE run = ?", (run,)))
+
+    def enqueue(self, run: str, tasks: Iterable[Dict[str, Any]]) -> int:
+        """
+        Adds tasks to a run. They are claimed in the order they are enqueued.
+
+        Args:
+            run: Run id from create_run
+            tasks: Tasks with the 'file' to analyze and any other payload fields
+
+        Returns:
+            Number of tasks added
+        """
+        def insert(conn):
+            cursor = conn.executemany(
+                "INSERT OR IGNORE INTO tasks (run, file, payload) VALUES (?, ?, ?)",
+                ((run, task['file'], json.dumps({k: v for k, v in task.items() if k != 'file'})) for task in tasks)
+            )
+            return cursor.rowcount
+        added = self._write(insert)
+        metrics.incr("work_queue_enqueued_total", added)
+        return added
+
+    def claim(self, worker: str, lease_seconds: float) -> Optional[Dict[str, Any]]:
+        """
+        Leases the oldest pending task of any open run.
+
+        Expired leases are re-queued first, so the tasks of crashed workers are
+        picked up by the next claim.
+
+        Returns:
+            The task (id, run, file, attempts and payload fields), or None when there is nothing to do
+        """
+        def lease(conn):
+            now = time.time()
+            self._requeue_expired(conn, now)
+            row = conn.execute(
+                "SELECT t.id, t.run, t.file, t.payload, t.attempts FROM tasks t JOIN runs r ON r.run = t.run "
+                "WHERE t.status = 'pending' AND r.closed = 0 ORDER BY t.id LIMIT 1"
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute("UPDATE tasks SET status = 'leased', worker = ?, lease_expires = ?, attempts = attempts + 1 "
+                         "WHERE id = ?", (worker, now + lease_seconds, row[0]))
+            return row
+        row = self._write(lease)
+        if row is None:
+            return None
+        task_id, run, file_path, payload, attempts = row
+        return dict(json.loads(payload or '{}'), id=task_id, run=run, file=file_path, attempts=attempts + 1)
+
+    def heartbeat(self, task_id: int, worker: str, lease_seconds: float) -> bool:
+        """Extends a lease. False when the worker no longer holds it (it expired and was re-queued)."""
+        return self._write(lambda conn: conn.execute(
+            "UPDATE tasks SET lease_expires = ? WHERE id = ? AND worker = ? AND status = 'leased'",
+            (time.time() + lease_seconds, task_id, worker)
+        ).rowcount) == 1
+
+    def complete(self, task_id: int, worker: str, rules: Optional[List[str]]) -> bool:
+        """
+        Stores the rules extracted for a task (None when the file could not be read).
+
+        Returns:
+            False when the lease was lost; another worker then owns the task and its result
+        """
+        done = self._write(lambda conn: conn.execute(
+            "UPDATE tasks SET status = 'done', rules = ?, error = NULL, lease_expires = NULL "
+            "WHERE id = ? AND worker = ? AND status = 'leased'",
+            (json.dumps(rules), task_id, worker)
+        ).rowcount) == 1
+        metrics.incr("work_queue_tasks_total", labels={'status': 'done' if done else 'lease_lost'})
+        return done
+
+    def fail(self, task_id: int, worker: str, error: str) -> bool:
+        """Records a failed attempt: the task is re-queued, or failed after max_attempts attempts."""
+        failed = self._write(lambda conn: conn.execute(
+            "UPDATE tasks SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, "
+            "error = ?, worker = NULL, lease_expires = NULL WHERE id = ? AND worker = ? AND status = 'leased'",
+            (self.max_attempts, error, task_id, worker)
+        ).rowcount) == 1
+        metrics.incr("work_queue_tasks_total", labels={'status': 'failed' if failed else 'lease_lost'})
+        return failed
+
+    def requeue_expired(self) -> int:
+        """Hands the tasks of workers whose lease expired back to the queue."""
+        return self._write(lambda conn: self._requeue_expired(conn, time.time()))
+
+    def _requeue_expired(self, conn: sqlite3.Connection, now: float) -> int:
+        expired = conn.execute(
+            "UPDATE tasks SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, "
+            "error = 'Lease of worker ' || worker || ' expired', worker = NULL, lease_expires = NULL "
+            "WHERE status = 'leased' AND lease_expires < ?",
+            (self.max_attempts, now)
+        ).rowcount
+        if expired:
+            logger.warning(f"⏰ Re-queued {expired} tasks whose worker stopped renewing its lease")
+            metrics.incr("work_queue_requeued_total", expired)
+        return expired
+
+    def collect(self, run: str, limit: int = 1000) -> List[Dict[str, Any]]:
+        """
+        Returns finished tasks (done or failed) not collected yet, and marks them collected.
+
+        Returns:
+            Tasks with file, status, rules (None for unreadable files) and error
+        """
+        def take(conn):
+            rows = conn.execute(
+                "SELECT id, file, status, rules, error FROM tasks "
+                "WHERE run = ? AND status IN ('done', 'failed') AND collected = 0 ORDER BY id LIMIT ?",
+                (run, limit)
+            ).fetchall()
+            conn.executemany("UPDATE tasks SET collected = 1 WHERE id = ?", ((row[0],) for row in rows))
+            return rows
+        return [{'file': file_path, 'status': status, 'rules': json.loads(rules) if rules else None, 'error': error}
+                for _, file_path, status, rules, error in self._write(take)]
+
+    def progress(self, run: str) -> Dict[str, int]:
+        """Number of the run's tasks in each state, plus the number of workers holding leases."""
+        counts = dict.fromkeys(STATUSES, 0)
+        counts.update(self.conn.execute("SELECT status, count(*) FROM tasks WHERE run = ? GROUP BY status",
+                                        (run,)).fetchall())
+        counts['workers'] = self.conn.execute(
+            "SELECT count(DISTINCT worker) FROM tasks WHERE run = ? AND status = 'leased'", (run,)
+        ).fetchone()[0]
+        return counts
+
+    def rules_for(self, run: str, file_path: str, limit: Optional[int] = None) -> List[str]:
+        """The rules already extracted for a file of a run (empty until its task is done)."""
+        row = self.conn.execute("SELECT rules FROM tasks WHERE run = ? AND file = ? AND status = 'done'",
+                                (run, file_path)).fetchone()
+        rules = json.loads(row[0]) if row and row[0] else []
+        return rules if limit is None else rules[:limit]
+
+    def results_of(self, run: str) -> 'RunResults':
+        return RunResults(self, run)
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+class RunResults:
+    """The rules of a run's finished tasks, looked up like RuleStore.rules_for (for dependency context)."""
+
+    def __init__(self, work_queue: WorkQueue, run: str):
+        self.work_queue = work_queue
+        self.run = run
+
+    def rules_for(self, file_path: str, limit: Optional[int] = None) -> List[str]:
+        return self.work_queue.rules_for(self.run, file_path, limit)
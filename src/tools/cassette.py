@@ -0,0 +1,154 @@
+import os
+import gzip
+import json
+import base64
+import hashlib
+import threading
+from array import array
+from typing import Any, Dict, List, Optional
+from src.utils.logger import setup_logger
+
+logger = setup_logger("Cassette")
+
+class CassetteMismatchError(Exception):
+    """Raised in replay mode when a request has no recorded interaction."""
+
+class Cassette:
+    """
+    Records model, embedding and search interactions to a compact gzipped
+    JSON-lines file and replays them offline.
+
+    Interactions are keyed by a hash of the request. Identical requests recorded
+    several times are replayed in the order they were recorded.
+    """
+
+    def __init__(self, path: str, mode: str = "replay"):
+        """
+        Initialize the cassette.
+
+        Args:
+            path: Cassette file (conventionally *.jsonl.gz)
+            mode: "record" to call the real services and save every interaction,
+                "replay" to serve interactions from the file without any network access
+        """
+        if mode not in ("record", "replay"):
+            raise ValueError(f"Unknown cassette mode: {mode}")
+
+        self.path = path
+        self.mode = mode
+        self._lock = threading.Lock()
+        self._interactions: Dict[str, List[Dict[str, Any]]] = {}
+        self._cursor: Dict[str, int] = {}
+        self._requests: Dict[str, Dict[str, Any]] = {}
+
+        if mode == "replay":
+            self._load()
+        logger.info(f"📼 Cassette {mode} mode: {path} ({len(self._interactions)} recorded requests)")
+
+    @property
+    def recording(self) -> bool:
+        return self.mode == "record"
+
+    @property
+    def replaying(self) -> bool:
+        return self.mode == "replay"
+
+    def _key(self, kind: str, request: Dict[str, Any]) -> str:
+        payload = json.dumps([kind, request], sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def record(self, kind: str, request: Dict[str, Any], response: Any):
+        """Stores one interaction."""
+        key = self._key(kind, request)
+        with self._lock:
+            self._interactions.setdefault(key, []).append({'kind': kind, 'response': response})
+            self._requests[key] = {'kind': kind, 'request': request}
+
+    def replay(self, kind: str, request: Dict[str, Any]) -> Any:
+        """
+        Returns the recorded response for the request.
+
+        Raises:
+            CassetteMismatchError: If the request was never recorded
+        """
+        key = self._key(kind, request)
+        with self._lock:
+            recorded = self._interactions.get(key)
+            if not recorded:
+                raise CassetteMismatchError(self._describe_mismatch(kind, request))
+            # Serve repeated requests in recording order, then keep returning the last one
+            position = self._cursor.get(key, 0)
+            self._cursor[key] = position + 1
+            return recorded[min(position, len(recorded) - 1)]['response']
+
+    def _describe_mismatch(self, kind: str, request: Dict[str, Any]) -> str:
+        """Explains a replay miss, pointing at the closest recorded request of the same kind."""
+        text = json.dumps(request, sort_keys=True, ensure_ascii=False)
+        best, best_prefix = None, -1
+        for entry in self._requests.values():
+            if entry['kind'] != kind:
+                continue
+            candidate = json.dumps(entry['request'], sort_keys=True, ensure_ascii=False)
+            prefix = len(os.path.commonprefix([text, candidate]))
+            if prefix > best_prefix:
+                best, best_prefix = candidate, prefix
+
+        message = f"No recorded '{kind}' interaction in {self.path} for request: {text[:200]}"
+        if best is None:
+            return message + f" (the cassette has no '{kind}' interactions)"
+        start = max(0, best_prefix - 40)
+        return (f"{message}\n  Closest recorded request diverges at character {best_prefix}:\n"
+                f"    recorded: ...{best[start:best_prefix + 80]!r}\n"
+                f"    current : ...{text[start:best_prefix + 80]!r}")
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            raise FileNotFoundError(f"Cassette not found: {self.path}")
+        with gzip.open(self.path, 'rt', encoding='utf-8') as f:
+            for line in f:
+                entry = json.loads(line)
+                key = entry['key']
+                self._interactions[key] = [{'kind': entry['kind'], 'response': r} for r in entry['responses']]
+                self._requests[key] = {'kind': entry['kind'], 'request': entry['request']}
+
+    def save(self):
+        """Writes every recorded interaction to the cassette file."""
+        if not self.recording:
+            return
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._lock, gzip.open(self.path, 'wt', encoding='utf-8') as f:
+            for key, responses in self._interactions.items():
+                entry = {'key': key, 'kind': self._requests[key]['kind'],
+                         'request': self._requests[key]['request'],
+                         'responses': [r['response'] for r in responses]}
+                f.write(json.dumps(entry, ensure_ascii=False, separators=(',', ':')) + '\n')
+        logger.info(f"📼 Saved {len(self._interactions)} interactions to {self.path}")
+
+def encode_vector(vector: List[float]) -> str:
+    """Packs an embedding as base64 float32, roughly 4x smaller than JSON floats."""
+    return base64.b64encode(array('f', vector).tobytes()).decode('ascii')
+
+def decode_vector(data: str) -> List[float]:
+    values = array('f')
+    values.frombytes(base64.b64decode(data))
+    return values.tolist()
+
+_active: Optional[Cassette] = None
+
+def activate(path: str, mode: str) -> Cassette:
+    """Activates a cassette for all model, embedding and search calls in this process."""
+    global _active
+    _active = Cassette(path, mode)
+    return _active
+
+def deactivate():
+    """Saves (when recording) and deactivates the current cassette."""
+    global _active
+    if _active is not None:
+        _active.save()
+    _active = None
+
+def get_active() -> Optional[Cassette]:
+    return _active
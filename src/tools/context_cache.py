@@ -0,0 +1,160 @@
+import time
+import hashlib
+import threading
+from typing import Any, Callable, Dict, Optional, Set, Tuple
+from src.utils.logger import setup_logger
+from src.utils.metrics import metrics
+from src.utils.budget import token_counter
+
+logger = setup_logger("ContextCache")
+
+# Smallest prefix (in tokens) the provider accepts for explicit context caching, by
+# longest model-name prefix. Shorter prefixes are sent inline with every prompt.
+CACHE_MIN_TOKENS: Dict[str, int] = {
+    "gemini-1.5": 32768,
+    "gemini-2.0": 4096,
+    "gemini-2.5-flash": 1024,
+    "gemini-2.5-pro": 2048,
+}
+DEFAULT_MIN_TOKENS = 4096
+
+# Errors meaning a cache handle is no longer usable (expired or deleted on the provider side)
+STALE_CACHE_ERRORS = ("NotFound", "PermissionDenied", "FailedPrecondition")
+
+def min_cache_tokens(model: str) -> int:
+    """Returns the minimum cacheable prefix size of a model."""
+    name = model[len("models/"):] if model.startswith("models/") else model
+    matches = [prefix for prefix in CACHE_MIN_TOKENS if name.startswith(prefix)]
+    return CACHE_MIN_TOKENS[max(matches, key=len)] if matches else DEFAULT_MIN_TOKENS
+
+def _create_gemini_cache(model_name: str, prefix: str, ttl_seconds: float) -> Tuple[Any, Callable[[], None]]:
+    """Creates a Gemini cached content holding `prefix` as system instruction."""
+    import datetime
+    import google.generativeai as genai
+    from google.generativeai import caching
+
+    cached = caching.CachedContent.create(
+        model=model_name if model_name.startswith("models/") else f"models/{model_name}",
+        display_name="logicmapper-prefix",
+        system_instruction=prefix,
+        ttl=datetime.timedelta(seconds=ttl_seconds),
+    )
+    return genai.GenerativeModel.from_cached_content(cached_content=cached), cached.delete
+
+class _Entry:
+    def __init__(self, model: Any, release: Callable[[], None], expires: float):
+        self.model = model
+        self.release = release
+        self.expires = expires
+
+class ContextCache:
+    """
+    Serves invariant prompt prefixes (e.g. the Analyst instructions) through
+    provider-side context caching, so they are processed once per TTL instead of
+    once per call.
+
+    Caches are keyed by model and a hash of the prefix, so a changed prefix gets a
+    new cache. They are recreated shortly before their TTL runs out and released
+    with `invalidate()`. Whenever caching is unavailable (prefix below the model's
+    minimum, unsupported model, API error) the caller sends the prefix inline.
+    """
+
+    # Builds a cache from (model_name, prefix, ttl_seconds) and returns a model bound
+    # to it plus a function releasing it; defaults to Gemini cached content.
+    # Benchmarks and tests swap in a local stand-in here.
+    cache_factory: Optional[Callable[[str, str, float], Tuple[Any, Callable[[], None]]]] = None
+
+    enabled: bool = True
+    ttl_seconds: float = 3600.0
+    # Caches are recreated this long before they expire, so no call races the expiry
+    refresh_margin: float = 60.0
+    # Overrides CACHE_MIN_TOKENS (e.g. 0 for a local stand-in)
+    min_tokens: Optional[int] = None
+
+    _entries: Dict[Tuple[str, str], _Entry] = {}
+    _unavailable: Set[Tuple[str, str]] = set()
+    _lock = threading.Lock()
+
+    @staticmethod
+    def _key(model_name: str, prefix: str) -> Tuple[str, str]:
+        return model_name, hashlib.sha256(prefix.encode('utf-8')).hexdigest()
+
+    @classmethod
+    def model_for(cls, model_name: str, prefix: str) -> Optional[Any]:
+        """
+        Returns a model with `prefix` cached, creating or refreshing the cache as needed.
+
+        Args:
+            model_name: Model the prompts go to
+            prefix: Invariant prompt prefix
+
+        Returns:
+            A model to send only the rest of the prompt to, or None when the prefix
+            has to be sent inline
+        """
+        if not cls.enabled or not prefix:
+            return None
+        key = cls._key(model_name, prefix)
+        with cls._lock:
+            if key in cls._unavailable:
+                return None
+            entry = cls._entries.get(key)
+            if entry and time.monotonic() < entry.expires - cls.refresh_margin:
+                metrics.incr("context_cache_hits_total", labels={'model': model_name})
+                return entry.model
+            if entry:
+                metrics.incr("context_cache_refreshes_total", labels={'model': model_name})
+                cls._release(cls._entries.pop(key))
+
+            min_tokens = cls.min_tokens if cls.min_tokens is not None else min_cache_tokens(model_name)
+            prefix_tokens = token_counter.count(prefix)
+            if prefix_tokens < min_tokens:
+                logger.info(f"ℹ️ Prefix of {prefix_tokens} tokens is below the {min_tokens}-token caching "
+                            f"minimum of {model_name}; sending it inline")
+                cls._unavailable.add(key)
+                return None
+
+            factory = cls.cache_factory or _create_gemini_cache
+            try:
+                model, release = factory(model_name, prefix, cls.ttl_seconds)
+            except Exception as e:
+                logger.warning(f"⚠️ Context caching unavailable for {model_name}, sending the prefix inline: {e}")
+                metrics.incr("context_cache_failures_total", labels={'model': model_name})
+                cls._unavailable.add(key)
+                return None
+            cls._entries[key] = _Entry(model, release, time.monotonic() + cls.ttl_seconds)
+            metrics.incr("context_cache_creations_total", labels={'model': model_name})
+            logger.info(f"🗄️ Cached a {prefix_tokens}-token prefix for {model_name} (TTL {cls.ttl_seconds:.0f}s)")
+            return model
+
+    @classmethod
+    def invalidate(cls, model_name: Optional[str] = None, prefix: Optional[str] = None):
+        """
+        Releases cached prefixes and forgets that caching was unavailable for them.
+
+        Args:
+            model_name: Only release caches of this model (all models by default)
+            prefix: Only release the cache of this prefix (all prefixes by default)
+        """
+        with cls._lock:
+            keys = [key for key in set(cls._entries) | cls._unavailable
+                    if (model_name is None or key[0] == model_name)
+                    and (prefix is None or key == cls._key(key[0], prefix))]
+            for key in keys:
+                cls._unavailable.discard(key)
+                entry = cls._entries.pop(key, None)
+                if entry:
+                    cls._release(entry)
+
+    @staticmethod
+    def _release(entry: _Entry):
+        try:
+            entry.release()
+        except Exception as e:
+            # The provider deletes it at the end of its TTL anyway
+            logger.debug(f"Could not release cached prefix: {e}")
+
+    @staticmethod
+    def is_stale_error(error: BaseException) -> bool:
+        """Whether a failed call means its cache handle is no longer usable."""
+        return type(error).__name__ in STALE_CACHE_ERRORS
@@ -0,0 +1,340 @@
+import os
+import re
+import sys
+import json
+import hashlib
+import posixpath
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Set, Tuple
+from src.utils.logger import setup_logger
+from src.utils.metrics import metrics
+
+logger = setup_logger("DependencyGraph")
+
+PYTHON_IMPORT = re.compile(r'^[ \t]*import[ \t]+([\w.]+(?:[ \t]*,[ \t]*[\w.]+)*)', re.MULTILINE)
+PYTHON_FROM_IMPORT = re.compile(r'^[ \t]*from[ \t]+(\.*[\w.]*)[ \t]+import[ \t]+(?:\(([^)]*)\)|([\w.*, \t]+))', re.MULTILINE)
+JAVA_IMPORT = re.compile(r'^[ \t]*import[ \t]+(?:static[ \t]+)?([\w.]+?)(\.\*)?[ \t]*;', re.MULTILINE)
+JS_IMPORT = re.compile(r'''(?:\bfrom|\bimport|\brequire\(|\bimport\()\s*['"]([^'"]+)['"]''')
+C_INCLUDE = re.compile(r'^[ \t]*#[ \t]*include[ \t]*"([^"]+)"', re.MULTILINE)
+
+JS_EXTENSIONS = ('.js', '.jsx', '.ts', '.tsx', '.mjs', '.cjs')
+C_EXTENSIONS = ('.c', '.cc', '.cpp', '.cxx', '.h', '.hh', '.hpp')
+JS_RESOLVE_SUFFIXES = ['', '.ts', '.tsx', '.js', '.jsx', '/index.ts', '/index.js']
+# Never resolve e.g. `import logging` to a repository file that happens to be called logging.py
+STDLIB_MODULES = set(getattr(sys, 'stdlib_module_names', ())) - {''}
+
+def extract_imports(content: str, file_ext: str) -> List[str]:
+    """
+    Extracts the raw import specifiers of a source file.
+
+    Python specifiers are dotted module names ('.'-prefixed when relative, with
+    'module:name' entries for `from module import name`), Java ones are fully
+    qualified names ('pkg.*' for wildcards), JS/TS and C/C++ ones are the quoted paths.
+    """
+    if file_ext == '.py':
+        imports = []
+        for match in PYTHON_IMPORT.finditer(content):
+            imports += [name.strip() for name in match.group(1).split(',')]
+        for match in PYTHON_FROM_IMPORT.finditer(content):
+            module = match.group(1)
+            names = [n.strip().split(' as ')[0].strip() for n in (match.group(2) or match.group(3)).split(',')]
+            imports += [f"{module}:{name}" for name in names if name and name != '*'] or [module]
+        return imports
+    if file_ext == '.java':
+        return [m.group(1) + ('.*' if m.group(2) else '') for m in JAVA_IMPORT.finditer(content)]
+    if file_ext in JS_EXTENSIONS:
+        return [spec for spec in JS_IMPORT.findall(content) if spec.startswith('.')]
+    if file_ext in C_EXTENSIONS:
+        return C_INCLUDE.findall(content)
+    return []
+
+def _scan_chunk(root: str, chunk: List[str], known_hashes: Dict[str, str]) -> List[Tuple[str, str, Optional[List[str]]]]:
+    """Hashes each file and extracts its imports unless the hash is unchanged (runs in a worker process)."""
+    results = []
+    for rel_path in chunk:
+        try:
+            with open(os.path.join(root, rel_path), 'rb') as f:
+                data = f.read()
+        except OSError:
+            continue
+        digest = hashlib.sha1(data).hexdigest()
+        if known_hashes.get(rel_path) == digest:
+            results.append((rel_path, digest, None))
+            continue
+        content = data.decode('utf-8', errors='ignore')
+        results.append((rel_path, digest, extract_imports(content, os.path.splitext(rel_path)[1])))
+    return results
+
+class DependencyGraph:
+    """
+    Static import/include graph of a repository.
+
+    Imports are extracted with per-language regexes (Python, Java, JS/TS, C/C++) in
+    parallel worker processes and resolved to files of the repository; external
+    packages are ignored. Extracted imports are cached by file hash, so a rebuild
+    only re-parses files that changed.
+    """
+
+    def __init__(self, cache_path: Optional[str] = "./dependency_cache.json",
+                 max_workers: Optional[int] = None, parallel_threshold: int = 2000):
+        """
+        Initialize the graph builder.
+
+        Args:
+            cache_path: JSON file holding the per-file hashes and imports (None disables caching)
+            max_workers: Worker processes used for large repositories (default: CPU count)
+            parallel_threshold: File count from which parsing is spread over worker processes
+        """
+        self.cache_path = cache_path
+        self.max_workers = max_workers
+        self.parallel_threshold = parallel_threshold
+        self.edges: Dict[str, List[str]] = {}
+
+    def build(self, root: str, files: List[str]) -> Dict[str, List[str]]:
+        """
+        Builds the graph for the given files.
+
+        Args:
+            root: Repository root
+            files: Paths relative to root
+
+        Returns:
+            Mapping of every file to the repository files it imports
+        """
+        cache = self._load_cache()
+        entries: Dict[str, Dict[str, Any]] = cache.get(os.path.abspath(root), {})
+        known_hashes = {rel: entry['hash'] for rel, entry in entries.items()}
+
+        with metrics.span("dependency_graph.extract", files=len(files)):
+            scanned = self._scan(root, files, known_hashes)
+
+        reparsed = 0
+        current: Dict[str, Dict[str, Any]] = {}
+        for rel_path, digest, imports in scanned:
+            if imports is None:
+                current[rel_path] = entries[rel_path]
+            else:
+                current[rel_path] = {'hash': digest, 'imports': imports}
+                reparsed += 1
+        metrics.incr("dependency_graph_files_parsed_total", reparsed)
+
+        with metrics.span("dependency_graph.resolve"):
+            resolver = _Resolver(list(current.keys()))
+            self.edges = {
+                rel_path: sorted(resolver.resolve(rel_path, entry['imports']) - {rel_path})
+                for rel_path, entry in current.items()
+            }
+
+        cache[os.path.abspath(root)] = current
+        self._save_cache(cache)
+        edge_count = sum(len(deps) for deps in self.edges.values())
+        logger.info(f"🕸️ Dependency graph: {len(self.edges)} files, {edge_count} edges "
+                    f"({reparsed} parsed, {len(current) - reparsed} unchanged)")
+        return self.edges
+
+    def _scan(self, root: str, files: List[str], known_hashes: Dict[str, str]):
+        if len(files) < self.parallel_threshold:
+            return _scan_chunk(root, files, known_hashes)
+
+        workers = self.max_workers or os.cpu_count() or 1
+        size = max(200, len(files) // (workers * 4))
+        chunks = [files[i:i + size] for i in range(0, len(files), size)]
+        results = []
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(_scan_chunk, root, chunk, {f: known_hashes[f] for f in chunk if f in known_hashes})
+                       for chunk in chunks]
+            for future in futures:
+                results.extend(future.result())
+        return results
+
+    def topological_order(self, files: Optional[List[str]] = None) -> List[str]:
+        """
+        Orders files so that every file comes after the files it imports (leaves first).
+        Files in an import cycle are kept next to each other.
+
+        Args:
+            files: Optional subset to order (by default every file in the graph)
+        """
+        nodes = list(self.edges.keys())
+        order: List[str] = []
+        index: Dict[str, int] = {}
+        lowlink: Dict[str, int] = {}
+        on_stack: Set[str] = set()
+        stack: List[str] = []
+        counter = 0
+
+        # Iterative Tarjan: SCCs come out dependencies-first
+        for start in nodes:
+            if start in index:
+                continue
+            work = [(start, iter(self.edges.get(start, [])))]
+            index[start] = lowlink[start] = counter
+            counter += 1
+            stack.append(start)
+            on_stack.add(start)
+            while work:
+                node, children = work[-1]
+                advanced = False
+                for child in children:
+                    if child not in index:
+                        index[child] = lowlink[child] = counter
+                        counter += 1
+                        stack.append(child)
+                        on_stack.add(child)
+                        work.append((child, iter(self.edges.get(child, []))))
+                        advanced = True
+                        break
+                    if child in on_stack:
+                        lowlink[node] = min(lowlink[node], index[child])
+                if advanced:
+                    continue
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    lowlink[parent] = min(lowlink[parent], lowlink[node])
+                if lowlink[node] == index[node]:
+                    component = []
+                    while True:
+                        member = stack.pop()
+                        on_stack.discard(member)
+                        component.append(member)
+                        if member == node:
+                            break
+                    order.extend(sorted(component))
+
+        if files is None:
+            return order
+        wanted = set(files)
+        ordered = [f for f in order if f in wanted]
+        return ordered + [f for f in files if f not in self.edges]
+
+    def to_mermaid(self, max_nodes: int = 60) -> str:
+        """
+        Renders the graph as a Mermaid flowchart.
+
+        Graphs with more than `max_nodes` files are collapsed into package-level
+        clusters (directories, shortened until they fit), with edge labels counting
+        the file-level imports between two packages.
+        """
+        if not self.edges:
+            return ""
+
+        depth = None
+        groups = {f: f for f in self.edges}
+        if len(self.edges) > max_nodes:
+            max_depth = max(len(f.split('/')) for f in self.edges)
+            for depth in range(max_depth - 1, -1, -1):
+                groups = {f: '/'.join(f.split('/')[:-1][:depth]) or '.' for f in self.edges}
+                if len(set(groups.values())) <= max_nodes:
+                    break
+
+        weights: Dict[Tuple[str, str], int] = defaultdict(int)
+        for source, targets in self.edges.items():
+            for target in targets:
+                if groups[source] != groups[target]:
+                    weights[(groups[source], groups[target])] += 1
+
+        names = sorted(set(groups.values()))
+        ids = {name: f"n{i}" for i, name in enumerate(names)}
+        lines = ["graph LR"]
+        for name in names:
+            label = name.replace('"', "'") + ('/' if depth is not None and name != '.' else '')
+            lines.append(f'    {ids[name]}["{label}"]')
+        for (source, target), count in sorted(weights.items()):
+            arrow = f"-->|{count}|" if depth is not None and count > 1 else "-->"
+            lines.append(f"    {ids[source]} {arrow} {ids[target]}")
+        return "\n".join(lines)
+
+    def _load_cache(self) -> Dict[str, Any]:
+        if not self.cache_path or not os.path.exists(self.cache_path):
+            return {}
+        try:
+            with open(self.cache_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            logger.warning(f"⚠️ Ignoring unreadable dependency cache {self.cache_path}: {e}")
+            return {}
+
+    def _save_cache(self, cache: Dict[str, Any]):
+        if not self.cache_path:
+            return
+        try:
+            with open(self.cache_path, 'w', encoding='utf-8') as f:
+                json.dump(cache, f, separators=(',', ':'))
+        except Exception as e:
+            logger.warning(f"⚠️ Failed to save dependency cache: {e}")
+
+class _Resolver:
+    """Maps raw import specifiers to repository files."""
+
+    def __init__(self, files: List[str]):
+        self.files = set(files)
+        # Every dotted suffix of a Python/Java module path -> candidate files ("a.b.c" -> a/b/c.py)
+        self.modules: Dict[str, List[str]] = defaultdict(list)
+        # Every path suffix of a C/C++ file -> candidate files ("util/x.h" -> src/util/x.h)
+        self.path_suffixes: Dict[str, List[str]] = defaultdict(list)
+        self.packages: Dict[str, List[str]] = defaultdict(list)
+
+        for rel_path in files:
+            parts = rel_path.split('/')
+            stem, ext = os.path.splitext(parts[-1])
+            if ext in ('.py', '.java'):
+                module_parts = parts[:-1] if stem == '__init__' else parts[:-1] + [stem]
+                for i in range(len(module_parts)):
+                    self.modules['.'.join(module_parts[i:])].append(rel_path)
+                for i in range(len(parts) - 1):
+                    self.packages['.'.join(parts[i:-1])].append(rel_path)
+            elif ext in C_EXTENSIONS:
+                for i in range(len(parts)):
+                    self.path_suffixes['/'.join(parts[i:])].append(rel_path)
+
+    @staticmethod
+    def _closest(importer: str, candidates: List[str]) -> str:
+        """Picks the candidate sharing the longest directory prefix with the importer."""
+        if len(candidates) == 1:
+            return candidates[0]
+        return max(candidates, key=lambda c: (len(os.path.commonprefix([importer, c])), -len(c)))
+
+    def _module(self, importer: str, name: str) -> Optional[str]:
+        candidates = self.modules.get(name)
+        return self._closest(importer, candidates) if candidates else None
+
+    def resolve(self, importer: str, imports: List[str]) -> Set[str]:
+        ext = os.path.splitext(importer)[1]
+        directory = posixpath.dirname(importer)
+        resolved: Set[str] = set()
+        for spec in imports:
+            if ext == '.py':
+                module, _, name = spec.partition(':')
+                if module.split('.')[0] in STDLIB_MODULES:
+                    continue
+                if module.startswith('.'):
+                    level = len(module) - len(module.lstrip('.'))
+                    base = directory.split('/') if directory else []
+                    base = base[:len(base) - (level - 1)] if level > 1 else base
+                    module = '.'.join(base + ([module.lstrip('.')] if module.lstrip('.') else []))
+                target = (self._module(importer, f"{module}.{name}") if name and module else None) \
+                    or self._module(importer, module or name)
+                if target:
+                    resolved.add(target)
+            elif ext == '.java':
+                if spec.endswith('.*'):
+                    resolved.update(self.packages.get(spec[:-2], []))
+                else:
+                    target = self._module(importer, spec) or self._module(importer, spec.rsplit('.', 1)[0])
+                    if target:
+                        resolved.add(target)
+            elif ext in JS_EXTENSIONS:
+                base = posixpath.normpath(posixpath.join(directory, spec))
+                for suffix in JS_RESOLVE_SUFFIXES:
+                    if base + suffix in self.files:
+                        resolved.add(base + suffix)
+                        break
+            elif ext in C_EXTENSIONS:
+                local = posixpath.normpath(posixpath.join(directory, spec))
+                if local in self.files:
+                    resolved.add(local)
+                elif self.path_suffixes.get(spec):
+                    resolved.add(self._closest(importer, self.path_suffixes[spec]))
+        return resolved
@@ -0,0 +1,193 @@
+import os
+import re
+import hashlib
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from src.utils.logger import setup_logger
+from src.utils.metrics import metrics
+from src.tools.file_system import FileSystemTools
+from src.tools.logic_filter import NUMBER_PATTERN
+from src.memory.compressor import ContextCompressor
+
+logger = setup_logger("DuplicateFiles")
+
+TOKEN_PATTERN = re.compile(r'\w+|[^\w\s]')
+
+class DuplicateFileDetector:
+    """
+    Groups copies of the same file (vendored copies, per-client forks, generated
+    files that differ only in their header) so only one representative per group
+    is analyzed.
+
+    Files are fingerprinted after minification (comments, blank lines and
+    indentation removed): an exact hash finds identical copies, and a 64-bit
+    SimHash over the token shingles nominates near-duplicates (within
+    `max_distance` bits), which are confirmed by the Jaccard similarity of their
+    shingles. Like the rule deduplicator, near-duplicates whose numeric literals
+    differ (a fork with another rate or limit) are never grouped, since their
+    rules differ.
+    """
+
+    def __init__(self, max_distance: int = 6, shingle_size: int = 2, min_tokens: int = 50,
+                 min_size_ratio: float = 0.8, min_jaccard: float = 0.8, sketch_size: int = 128):
+        """
+        Initialize the detector.
+
+        Args:
+            max_distance: Largest Hamming distance between SimHashes of near-duplicates
+                (None or a negative value only groups exact copies)
+            shingle_size: Tokens per shingle
+            min_tokens: Files shorter than this are only grouped with exact copies
+            min_size_ratio: Smallest token count ratio of two near-duplicates
+            min_jaccard: Smallest (estimated) Jaccard similarity of the shingles of two near-duplicates
+            sketch_size: Smallest shingle hashes kept per file to estimate the Jaccard similarity
+        """
+        self.max_distance = max_distance if max_distance is not None and max_distance >= 0 else None
+        self.shingle_size = shingle_size
+        self.min_tokens = min_tokens
+        self.min_size_ratio = min_size_ratio
+        self.min_jaccard = min_jaccard
+        self.sketch_size = sketch_size
+        self.compressor = ContextCompressor()
+
+    def group(self, scan_results: Dict[str, Any]) -> Tuple[List[str], Dict[str, Dict[str, Any]]]:
+        """
+        Groups the scanned files into representatives and their duplicates.
+
+        Args:
+            scan_results: Output of ScannerAgent.scan_repository (possibly pre-filtered)
+
+        Returns:
+            Tuple of (files to analyze, {duplicate file: {'of': representative, 'similarity': 0-1, 'kind': 'exact'|'near'}}),
+            the files to analyze keeping the scan order; 'similarity' is the Jaccard
+            similarity of the shingles (1.0 for exact copies)
+        """
+        base_path = scan_results.get("path", "")
+        files = scan_results.get("files", [])
+        fingerprints = []
+        for file_rel_path in files:
+            full_path = os.path.join(base_path, file_rel_path) if base_path else file_rel_path
+            content = FileSystemTools.read_file(full_path)
+            if not content or content.startswith("Error"):
+                fingerprints.append(None)
+                continue
+            fingerprints.append(self.fingerprint(content, os.path.splitext(file_rel_path)[1]))
+
+        # Every file is compared with the representatives before it, never with other
+        # copies, so a group cannot drift away from its representative through a chain
+        representative_of = list(range(len(files)))
+        by_digest: Dict[Tuple[str, str], int] = {}
+        buckets: Dict[Tuple, List[int]] = {}
+        bands = self.max_distance + 1 if self.max_distance is not None else 0
+        width = 64 // bands if bands else 0
+        for i, fingerprint in enumerate(fingerprints):
+            if fingerprint is None:
+                continue
+            # Exact copies share the hash of their minified content
+            key = (fingerprint['ext'], fingerprint['digest'])
+            if key in by_digest:
+                representative_of[i] = by_digest[key]
+                continue
+            if not bands or fingerprint['tokens'] < self.min_tokens:
+                by_digest[key] = i
+                continue
+            # With at most `max_distance` differing bits, at least one of max_distance + 1
+            # bands of the SimHash is identical, so only files sharing a band are compared
+            keys = [(fingerprint['ext'], band, (fingerprint['simhash'] >> (band * width)) & ((1 << width) - 1))
+                    for band in range(bands)]
+            candidates = sorted({j for band_key in keys for j in buckets.get(band_key, ())})
+            match = next((j for j in candidates if self._near(fingerprints[j], fingerprint)), None)
+            if match is not None:
+                representative_of[i] = match
+                by_digest[key] = match
+                continue
+            by_digest[key] = i
+            for band_key in keys:
+                buckets.setdefault(band_key, []).append(i)
+
+        kept, duplicates = [], {}
+        for i, file_rel_path in enumerate(files):
+            root = representative_of[i]
+            if root == i:
+                kept.append(file_rel_path)
+                continue
+            exact = fingerprints[i]['digest'] == fingerprints[root]['digest']
+            duplicates[file_rel_path] = {
+                'of': files[root],
+                'similarity': 1.0 if exact else round(self._jaccard(fingerprints[i]['sketch'], fingerprints[root]['sketch']), 3),
+                'kind': 'exact' if exact else 'near',
+            }
+            metrics.incr("duplicate_files_total", labels={'kind': duplicates[file_rel_path]['kind']})
+
+        if duplicates:
+            logger.info(f"👯 {len(duplicates)} of {len(files)} files are copies of other files; "
+                        f"analyzing {len(kept)} representatives")
+        return kept, duplicates
+
+    def fingerprint(self, content: str, file_ext: str) -> Dict[str, Any]:
+        """
+        Fingerprints a file.
+
+        Returns:
+            Dict with the extension, the SHA-1 'digest' of the minified content, its
+            64-bit 'simhash', a bottom-k 'sketch' of its shingles, the number of
+            'tokens' and the sorted numeric 'literals'
+        """
+        minified = '\n'.join(line.strip() for line in self.compressor.minify(content, file_ext).split('\n'))
+        tokens = TOKEN_PATTERN.findall(minified)
+        shingles = self._shingles(tokens)
+        return {
+            'ext': file_ext,
+            'digest': hashlib.sha1(minified.encode('utf-8')).hexdigest(),
+            'simhash': self._simhash(shingles),
+            'sketch': shingles[:self.sketch_size],
+            'tokens': len(tokens),
+            'literals': sorted(NUMBER_PATTERN.findall(minified)),
+        }
+
+    def _shingles(self, tokens: List[str]) -> np.ndarray:
+        """Sorted distinct 64-bit hashes of the token shingles of a file."""
+        if not tokens:
+            return np.zeros(0, dtype=np.uint64)
+        # Hash every distinct token once, then combine neighbouring token hashes into shingle hashes
+        vocabulary: Dict[str, int] = {}
+        ids = np.fromiter((vocabulary.setdefault(token, len(vocabulary)) for token in tokens),
+                          dtype=np.int64, count=len(tokens))
+        token_hashes = np.array([int.from_bytes(hashlib.blake2b(token.encode('utf-8'), digest_size=8).digest(), 'little')
+                                 for token in vocabulary], dtype=np.uint64)[ids]
+        size = min(self.shingle_size, len(tokens))
+        shingles = np.zeros(len(tokens) - size + 1, dtype=np.uint64)
+        for offset in range(size):
+            # Multiplying by a distinct odd constant per position keeps the shingles order-sensitive
+            shingles ^= token_hashes[offset:offset + len(shingles)] * np.uint64(0x9E3779B97F4A7C15 + 2 * offset)
+        return np.unique(shingles)
+
+    @staticmethod
+    def _simhash(shingles: np.ndarray) -> int:
+        """64-bit SimHash: each bit is set when the majority of shingle hashes has it set."""
+        if not len(shingles):
+            return 0
+        bits = np.unpackbits(shingles.view(np.uint8).reshape(-1, 8), axis=1, bitorder='little')
+        majority = bits.sum(axis=0, dtype=np.int64) * 2 > len(shingles)
+        return int(sum(1 << int(bit) for bit in np.nonzero(majority)[0]))
+
+    def _jaccard(self, a: np.ndarray, b: np.ndarray) -> float:
+        """Bottom-k estimate of the Jaccard similarity of two shingle sets from their sketches."""
+        union = np.union1d(a, b)[:self.sketch_size]
+        if not len(union):
+            return 1.0
+        return len(np.intersect1d(union, np.intersect1d(a, b, assume_unique=True), assume_unique=True)) / len(union)
+
+    def _near(self, a: Optional[Dict[str, Any]], b: Optional[Dict[str, Any]]) -> bool:
+        if a is None or b is None or a['literals'] != b['literals']:
+            return False
+        # Copies have about the same size; a short file can resemble a part of a long one
+        if min(a['tokens'], b['tokens']) < self.min_size_ratio * max(a['tokens'], b['tokens']):
+            return False
+        if bin(a['simhash'] ^ b['simhash']).count('1') > self.max_distance:
+            return False
+        # SimHash only nominates candidates: code shares so much syntax that unrelated
+        # small files can land close together
+        return self._jaccard(a['sketch'], b['sketch']) >= self.min_jaccard
@@ -2,6 +2,20 @@ import os
 from typing import List, Dict, Any
 
 class FileSystemTools:
+    # Language names by file extension, stored with the rules extracted from a file
+    LANGUAGES: Dict[str, str] = {
+        '.py': 'python', '.java': 'java', '.js': 'javascript', '.ts': 'typescript',
+        '.cpp': 'cpp', '.h': 'cpp', '.hpp': 'cpp', '.c': 'c', '.cs': 'csharp',
+        '.go': 'go', '.rb': 'ruby', '.cbl': 'cobol', '.cob': 'cobol',
+    }
+
+    @staticmethod
+    def language_of(path: str) -> str:
+        """
+        Returns the language of a file from its extension ('unknown' if not recognized).
+        """
+        return FileSystemTools.LANGUAGES.get(os.path.splitext(path)[1].lower(), 'unknown')
+
     @staticmethod
     def list_files(path: str) -> List[str]:
         """
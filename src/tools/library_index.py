@@ -0,0 +1,307 @@
+import os
+import re
+import ast
+import sys
+import json
+import site
+import sqlite3
+import sysconfig
+import hashlib
+import warnings
+import threading
+import importlib.util
+import importlib.metadata
+from typing import Any, Dict, Iterator, List, Optional
+from src.utils.logger import setup_logger
+from src.utils.metrics import metrics
+from src.tools import cassette
+
+logger = setup_logger("LibraryIndex")
+
+# Sources larger than this are not parsed for their docstring and API
+MAX_SOURCE_BYTES = 1_000_000
+MAX_DOC_CHARS = 400
+MAX_API_ENTRIES = 25
+RST_UNDERLINE = re.compile(r'^\s*([=~\-^*#])\1*\s*$')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS libraries (
+    id INTEGER PRIMARY KEY, name TEXT, distribution TEXT, version TEXT,
+    summary TEXT, doc TEXT, api TEXT, source TEXT
+);
+CREATE TABLE IF NOT EXISTS names (name TEXT PRIMARY KEY, library INTEGER) WITHOUT ROWID;
+"""
+
+def normalize_name(name: str) -> str:
+    """Import and distribution names compare case-insensitively with '-', '_' and '.' alike."""
+    return re.sub(r'[-_.]+', '_', name.strip()).lower()
+
+class LibraryIndex:
+    """
+    Local knowledge about libraries, consulted before searching the web for them.
+
+    Built from the installed distributions (name, version and summary from their
+    metadata) and the standard library, with the docstring and public API
+    signatures of each top-level module read from its source without importing
+    it. An optional curated dump (JSON lines with name, summary, doc, api and
+    aliases) adds or overrides entries.
+
+    The index is a small SQLite file keyed by normalized import and distribution
+    name. It is rebuilt when the Python environment changes, and lookups are
+    memoized, so repeated lookups cost a dictionary access.
+    """
+
+    enabled: bool = True
+    default_path: str = "./library_index.db"
+    # Curated JSON-lines dump merged into the index
+    curated_path: Optional[str] = None
+
+    _shared: Dict[str, 'LibraryIndex'] = {}
+    _shared_lock = threading.Lock()
+
+    def __init__(self, path: Optional[str] = None, curated_path: Optional[str] = None):
+        """
+        Initialize the index. It is opened (and built if needed) on first use.
+
+        Args:
+            path: SQLite file holding the index
+            curated_path: JSON-lines dump of curated library descriptions
+        """
+        self.path = path or self.default_path
+        self.curated_path = curated_path if curated_path is not None else type(self).curated_path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._memo: Dict[str, Optional[Dict[str, Any]]] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def shared(cls, path: Optional[str] = None) -> 'LibraryIndex':
+        """Returns the process-wide index for a file, shared by all agents."""
+        path = path or cls.default_path
+        with cls._shared_lock:
+            if path not in cls._shared:
+                cls._shared[path] = cls(path)
+            return cls._shared[path]
+
+    @property
+    def is_open(self) -> bool:
+        return self._conn is not None
+
+    def open(self):
+        """Opens the index, building it first when it is missing or the environment changed."""
+        with self._lock:
+            if self._conn is not None:
+                return
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.executescript(SCHEMA)
+            row = conn.execute("SELECT value FROM meta WHERE key = 'fingerprint'").fetchone()
+            if not row or row[0] != self._fingerprint():
+                self._build(conn)
+            self._conn = conn
+
+    def rebuild(self):
+        """Rebuilds the index from the current environment and curated dump."""
+        self.open()
+        with self._lock:
+            self._build(self._conn)
+            self._memo.clear()
+
+    def lookup(self, name: str) -> Optional[Dict[str, Any]]:
+        """
+        Looks up a library by import or distribution name.
+
+        Returns:
+            Dict with name, distribution, version, summary, doc, api (list of
+            signatures) and source ('installed', 'stdlib' or 'curated'), or None
+        """
+        key = normalize_name(name)
+        if key in self._memo:
+            return self._memo[key]
+        self.open()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT l.name, l.distribution, l.version, l.summary, l.doc, l.api, l.source "
+                "FROM names n JOIN libraries l ON l.id = n.library WHERE n.name = ?", (key,)
+            ).fetchone()
+        entry = None
+        if row:
+            entry = dict(zip(('name', 'distribution', 'version', 'summary', 'doc', 'api', 'source'), row))
+            entry['api'] = json.loads(entry['api']) if entry['api'] else []
+        self._memo[key] = entry
+        return entry
+
+    def describe(self, name: str) -> Optional[str]:
+        """
+        One-line description of a library for a prompt, or None when it is unknown.
+
+        Recorded to and replayed from the active cassette, so replays do not
+        depend on the packages installed where they run.
+        """
+        tape = cassette.get_active()
+        request = {'library': name}
+        if tape and tape.replaying:
+            return tape.replay("library", request)
+
+        entry = self.lookup(name)
+        if entry is None:
+            metrics.cache_miss("library_index")
+            description = None
+        else:
+            metrics.cache_hit("library_index")
+            title = f"{entry['name']} {entry['version']}".strip() if entry['version'] else entry['name']
+            parts = [part for part in (entry['summary'], entry['doc']) if part]
+            text = parts[0] if parts else ""
+            if len(parts) > 1 and parts[1] not in parts[0]:
+                text = f"{parts[0]} {parts[1]}" if parts[0] else parts[1]
+            description = f"{title}: {text}".rstrip(': ')
+            if entry['api']:
+                description += f" API: {'; '.join(entry['api'][:10])}"
+
+        if tape and tape.recording:
+            tape.record("library", request, description)
+        return description
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def _fingerprint(self) -> str:
+        """Changes whenever packages are installed or removed, or the curated dump changes."""
+        parts = [sys.version, sys.prefix]
+        # Only the package directories: sys.path also holds the working directory, which changes all the time
+        directories = {sysconfig.get_paths()[name] for name in ('stdlib', 'purelib', 'platlib')}
+        directories.update(site.getsitepackages() if hasattr(site, 'getsitepackages') else [])
+        for directory in sorted(directories):
+            if os.path.isdir(directory):
+                parts.append(f"{directory}:{os.stat(directory).st_mtime_ns}")
+        if self.curated_path and os.path.exists(self.curated_path):
+            parts.append(f"{self.curated_path}:{os.stat(self.curated_path).st_mtime_ns}")
+        return hashlib.sha256('\n'.join(parts).encode('utf-8')).hexdigest()
+
+    def _build(self, conn: sqlite3.Connection):
+        logger.info(f"📚 Building the library index at {self.path}...")
+        entries = list(self._stdlib_entries()) + list(self._installed_entries())
+        if self.curated_path:
+            entries.extend(self._curated_entries(self.curated_path))
+
+        with conn:
+            conn.execute("DELETE FROM libraries")
+            conn.execute("DELETE FROM names")
+            for library_id, entry in enumerate(entries):
+                conn.execute("INSERT INTO libraries VALUES (?, ?, ?, ?, ?, ?, ?, ?)", (
+                    library_id, entry['name'], entry.get('distribution'), entry.get('version'),
+                    entry.get('summary'), entry.get('doc'), json.dumps(entry.get('api') or []), entry['source']
+                ))
+                # Later entries win: installed packages shadow the standard library, curated ones win over both
+                conn.executemany("INSERT OR REPLACE INTO names VALUES (?, ?)",
+                                 [(normalize_name(alias), library_id) for alias in entry['aliases']])
+            conn.execute("INSERT OR REPLACE INTO meta VALUES ('fingerprint', ?)", (self._fingerprint(),))
+        conn.execute("VACUUM")
+        logger.info(f"📚 Library index holds {len(entries)} libraries")
+
+    def _stdlib_entries(self) -> Iterator[Dict[str, Any]]:
+        for module in sorted(getattr(sys, 'stdlib_module_names', ())):
+            if module.startswith('_'):
+                continue
+            doc, api = self._read_module(module)
+            yield {'name': module, 'version': None, 'summary': None, 'doc': doc, 'api': api,
+                   'source': 'stdlib', 'aliases': [module]}
+
+    def _installed_entries(self) -> Iterator[Dict[str, Any]]:
+        modules_by_distribution: Dict[str, List[str]] = {}
+        for module, distributions in importlib.metadata.packages_distributions().items():
+            for distribution in distributions:
+                modules_by_distribution.setdefault(normalize_name(distribution), []).append(module)
+
+        seen = set()
+        for distribution in importlib.metadata.distributions():
+            name = distribution.metadata.get('Name')
+            if not name or normalize_name(name) in seen:
+                continue
+            seen.add(normalize_name(name))
+            modules = sorted(m for m in modules_by_distribution.get(normalize_name(name), [])
+                             if m.isidentifier() and not m.startswith('_'))
+            summary = distribution.metadata.get('Summary')
+            summary = summary if summary and summary != 'UNKNOWN' else None
+            if not modules:
+                yield {'name': name, 'distribution': name, 'version': distribution.version, 'summary': summary,
+                       'source': 'installed', 'aliases': [name]}
+                continue
+            for module in modules:
+                doc, api = self._read_module(module)
+                # The distribution name points at its main module (the one named like it, if any)
+                main = normalize_name(module) == normalize_name(name) or module == modules[0]
+                yield {'name': module, 'distribution': name, 'version': distribution.version,
+                       'summary': summary, 'doc': doc, 'api': api, 'source': 'installed',
+                       'aliases': [module, name] if main else [module]}
+
+    @staticmethod
+    def _curated_entries(path: str) -> Iterator[Dict[str, Any]]:
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    entry = json.loads(line)
+                    yield {'name': entry['name'], 'distribution': entry.get('distribution'),
+                           'version': entry.get('version'), 'summary': entry.get('summary'),
+                           'doc': entry.get('doc'), 'api': entry.get('api') or [], 'source': 'curated',
+                           'aliases': [entry['name']] + list(entry.get('aliases', []))}
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"⚠️ Ignoring unreadable curated library dump {path}: {e}")
+
+    @staticmethod
+    def _read_module(module: str):
+        """Docstring summary and public API signatures of a top-level module, read from its source."""
+        try:
+            # find_spec of a top-level name locates the module without importing it
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore")
+                spec = importlib.util.find_spec(module)
+        except (ImportError, ValueError):
+            return None, []
+        origin = spec.origin if spec else None
+        if not origin or not origin.endswith('.py') or not os.path.isfile(origin):
+            return None, []
+        try:
+            if os.path.getsize(origin) > MAX_SOURCE_BYTES:
+                return None, []
+            with open(origin, 'rb') as f:
+                tree = ast.parse(f.read())
+        except (OSError, SyntaxError, ValueError):
+            return None, []
+
+        doc = ast.get_docstring(tree)
+        if doc:
+            # First paragraph, without reStructuredText title underlines
+            lines = [line for line in doc.split('\n\n')[0].split('\n') if not RST_UNDERLINE.match(line)]
+            doc = ' '.join(' '.join(lines).split())[:MAX_DOC_CHARS] or None
+        return doc, LibraryIndex._public_api(tree)
+
+    @staticmethod
+    def _public_api(tree: ast.Module) -> List[str]:
+        exported = None
+        for node in tree.body:
+            if (isinstance(node, ast.Assign) and any(isinstance(t, ast.Name) and t.id == '__all__' for t in node.targets)
+                    and isinstance(node.value, (ast.List, ast.Tuple))):
+                exported = {e.value for e in node.value.elts if isinstance(e, ast.Constant) and isinstance(e.value, str)}
+
+        def public(name: str) -> bool:
+            return name in exported if exported is not None else not name.startswith('_')
+
+        api = []
+        for node in tree.body:
+            if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)) and public(node.name):
+                api.append(f"{node.name}({ast.unparse(node.args)})")
+            elif isinstance(node, ast.ClassDef) and public(node.name):
+                init = next((n for n in node.body if isinstance(n, ast.FunctionDef) and n.name == '__init__'), None)
+                args = ast.unparse(init.args).replace('self, ', '', 1).replace('self', '', 1) if init else ''
+                api.append(f"class {node.name}({args})")
+            elif isinstance(node, ast.ImportFrom) and node.level and exported is not None:
+                # Packages often re-export their API from submodules
+                api.extend(alias.asname or alias.name for alias in node.names if public(alias.asname or alias.name))
+            if len(api) >= MAX_API_ENTRIES:
+                break
+        return api
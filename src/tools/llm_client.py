@@ -0,0 +1,167 @@
+import time
+from typing import Any, Callable, Optional, Tuple
+from src.utils.logger import setup_logger
+from src.utils.metrics import metrics
+from src.utils import budget
+from src.utils.budget import token_counter
+from src.tools import cassette
+from src.tools.context_cache import ContextCache
+from src.utils.resilience import CallPolicy, get_breaker
+
+logger = setup_logger("LLMClient")
+
+class LLMClient:
+    """
+    Async wrapper around a Gemini model shared by all agents.
+    Supports both one-shot generation and token streaming.
+    Every prompt is counted before it is sent and checked against the active run budget.
+    An invariant prompt prefix can be passed separately; it is then served from the
+    provider's context cache when possible (see ContextCache) and sent inline otherwise.
+    """
+
+    # Builds the underlying model from a model name; defaults to genai.GenerativeModel.
+    # Benchmarks and tests swap in a local stand-in here.
+    model_factory: Optional[Callable[[str], Any]] = None
+
+    # Defaults for the call policy of every client (set from the CLI)
+    timeout: Optional[float] = 120.0
+    max_retries: int = 4
+    retry_base_delay: float = 1.0
+    hedge_after: Optional[float] = None
+
+    def __init__(self, model_name: str, policy: Optional[CallPolicy] = None):
+        """
+        Initialize the client.
+
+        Args:
+            model_name: Name of the Gemini model to call
+            policy: Timeout/retry/hedging policy; all clients share the "gemini" circuit breaker by default
+        """
+        self.model_name = model_name
+        factory = type(self).model_factory
+        if factory is None:
+            # The SDK takes over a second to import, so it is loaded only when a client is built
+            import google.generativeai as genai
+            factory = genai.GenerativeModel
+        self.model = factory(model_name)
+        self.policy = policy or CallPolicy(
+            "llm",
+            timeout=self.timeout,
+            max_retries=self.max_retries,
+            base_delay=self.retry_base_delay,
+            hedge_after=self.hedge_after,
+            breaker=get_breaker("gemini")
+        )
+
+    async def generate(self, prompt: str, on_chunk: Optional[Callable[[str], None]] = None,
+                       prefix: str = "") -> str:
+        """
+        Generates a response for the prompt.
+
+        Args:
+            prompt: The prompt text (the part following `prefix`)
+            on_chunk: Optional callback; when given the response is streamed and
+                every text chunk is passed to it as soon as it arrives
+            prefix: Invariant start of the prompt shared by many calls, cached on the
+                provider side when possible
+
+        Returns:
+            The complete response text
+            
+        Raises:
+            BudgetExceededError: When the prompt does not fit in the remaining run budget
+        """
+        full_prompt = prefix + prompt
+        tape = cassette.get_active()
+        # Replays never reach the provider, so there is nothing to cache
+        cached_model = None if tape and tape.replaying else ContextCache.model_for(self.model_name, prefix)
+        sent = prompt if cached_model is not None else full_prompt
+
+        prompt_tokens = token_counter.count(sent)
+        metrics.incr("llm_prompt_tokens_estimated_total", prompt_tokens, {'model': self.model_name})
+        run_budget = budget.get_active()
+        if run_budget:
+            run_budget.check(self.model_name, prompt_tokens)
+        
+        start = time.perf_counter()
+        # Keyed by the full prompt, so cassettes do not depend on whether caching was used
+        request = {'model': self.model_name, 'prompt': full_prompt}
+        usage = None
+        if tape and tape.replaying:
+            text = tape.replay("llm.generate", request)
+            if on_chunk:
+                on_chunk(text)
+        else:
+            if cached_model is not None:
+                try:
+                    text, usage = await self._generate(prompt, on_chunk, cached_model)
+                except Exception as e:
+                    if not ContextCache.is_stale_error(e):
+                        raise
+                    # The cache expired or was deleted early; drop it and send the prefix inline
+                    logger.warning(f"⚠️ Cached prefix for {self.model_name} is gone ({type(e).__name__}); retrying inline")
+                    ContextCache.invalidate(self.model_name, prefix)
+                    cached_model, sent = None, full_prompt
+                    text, usage = await self._generate(full_prompt, on_chunk)
+            else:
+                text, usage = await self._generate(full_prompt, on_chunk)
+            if tape and tape.recording:
+                tape.record("llm.generate", request, text)
+        
+        if usage and not usage[2]:
+            token_counter.observe(len(sent), usage[0])
+        if run_budget:
+            prompt_used, response_used, cached_used = usage or (prompt_tokens, token_counter.count(text), 0)
+            run_budget.record(self.model_name, prompt_used - cached_used, response_used,
+                              time.perf_counter() - start, cached_tokens=cached_used)
+        return text
+
+    async def _generate(self, prompt: str, on_chunk: Optional[Callable[[str], None]],
+                        model: Any = None) -> Tuple[str, Optional[Tuple[int, int, int]]]:
+        model = model if model is not None else self.model
+        with metrics.span("llm.generate", model=self.model_name, stream=on_chunk is not None):
+            metrics.incr("llm_calls_total", labels={'model': self.model_name})
+            if on_chunk is None:
+                response = await self.policy.call(lambda: model.generate_content_async(prompt))
+                return response.text, self._record_usage(response)
+
+            emitted = False
+
+            async def stream_once() -> Tuple[str, Optional[Tuple[int, int, int]]]:
+                nonlocal emitted
+                start = time.perf_counter()
+                response = await model.generate_content_async(prompt, stream=True)
+                parts = []
+                async for chunk in response:
+                    try:
+                        text = chunk.text
+                    except ValueError:
+                        # Chunks without text parts (e.g. safety or finish metadata)
+                        continue
+                    if not parts:
+                        metrics.observe("llm_time_to_first_chunk_seconds", time.perf_counter() - start,
+                                        {'model': self.model_name})
+                    parts.append(text)
+                    emitted = True
+                    on_chunk(text)
+                return ''.join(parts), self._record_usage(response)
+
+            # Once text has been streamed to the sinks a retry would duplicate it
+            return await self.policy.call(stream_once, hedge=False, can_retry=lambda: not emitted)
+
+    def _record_usage(self, response) -> Optional[Tuple[int, int, int]]:
+        """
+        Records the token counts reported by the API, if any.
+
+        Returns:
+            (prompt, response, cached) token counts; prompt includes the cached tokens
+        """
+        usage = getattr(response, 'usage_metadata', None)
+        if not usage:
+            return None
+        counts = (getattr(usage, 'prompt_token_count', 0) or 0, getattr(usage, 'candidates_token_count', 0) or 0)
+        cached = getattr(usage, 'cached_content_token_count', 0) or 0
+        metrics.record_tokens(self.model_name, *counts)
+        if cached:
+            metrics.incr("llm_cached_tokens_total", cached, {'model': self.model_name})
+        return counts + (cached,)
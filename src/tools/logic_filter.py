@@ -0,0 +1,153 @@
+import os
+import re
+import ast
+from typing import Any, Dict, List, Optional, Tuple
+from src.utils.logger import setup_logger
+from src.tools.file_system import FileSystemTools
+from src.utils.metrics import metrics
+
+logger = setup_logger("LogicFilter")
+
+# (reason, pattern) pairs matched against the '/'-separated relative path
+SKIP_PATH_PATTERNS: List[Tuple[str, re.Pattern]] = [
+    ("test", re.compile(r'(^|/)(tests?|__tests__|spec|testing)/|(^|/)test_[^/]*$|_test\.\w+$|'
+                        r'(Test|Tests|IT)\.java$|\.(test|spec)\.[jt]sx?$|(^|/)conftest\.py$')),
+    ("migration", re.compile(r'(^|/)(migrations?|db/migrate|alembic/versions)/')),
+    ("generated", re.compile(r'_pb2(_grpc)?\.py$|\.pb\.(h|cc)$|\.g\.(cs|dart)$|\.min\.js$|\.d\.ts$|'
+                             r'(^|/)(generated|gen|__generated__)/|\.generated\.\w+$')),
+    ("vendored", re.compile(r'(^|/)(node_modules|vendor|third_party|site-packages|dist|build)/')),
+    ("packaging", re.compile(r'(^|/)(setup\.py|__init__\.py|manage\.py|wsgi\.py|asgi\.py)$')),
+]
+
+GENERATED_MARKERS = re.compile(
+    r'@generated|DO NOT EDIT|Code generated by|auto-?generated|'
+    r'Generated by the protocol buffer compiler|This file was automatically generated',
+    re.IGNORECASE
+)
+
+CONDITION_PATTERN = re.compile(r'\b(?:if|else if|elif|case|when|switch|while|unless|EVALUATE|WHEN)\b|\?[^:;\n]+:')
+ARITHMETIC_PATTERN = re.compile(r'[\w)\]]\s*(?:[-+*/%]|\*\*)\s*[\w(.]')
+NUMBER_PATTERN = re.compile(r'(?<![\w.])(?![01](?![\d.]))\d+(?:\.\d+)?%?')
+
+class LogicFilter:
+    """
+    Fast local classifier deciding whether a file is likely to contain business logic.
+
+    Files are skipped when their path marks them as tests, migrations, generated or
+    vendored code, when their header carries a generated-code marker, or when their
+    syntax has no conditionals, no arithmetic and hardly any literal constants
+    (interface-only headers, pure data classes, re-export modules).
+    """
+
+    def __init__(self, min_literals: int = 2):
+        """
+        Initialize the filter.
+
+        Args:
+            min_literals: Literal constants (other than 0 and 1) that keep an otherwise
+                logic-free file, e.g. a module of rates and limits
+        """
+        self.min_literals = min_literals
+
+    def classify(self, file_path: str, content: str) -> Dict[str, Any]:
+        """
+        Classifies a single file.
+
+        Args:
+            file_path: Path relative to the repository root
+            content: Raw file content
+
+        Returns:
+            Dict with 'analyze' (bool), 'reason' (why it was skipped, or None) and the 'features' used
+        """
+        normalized = file_path.replace(os.sep, '/')
+        for reason, pattern in SKIP_PATH_PATTERNS:
+            if pattern.search(normalized):
+                return {'analyze': False, 'reason': f"{reason} path", 'features': {}}
+
+        header = '\n'.join(content.split('\n', 20)[:20])
+        if GENERATED_MARKERS.search(header):
+            return {'analyze': False, 'reason': "generated-code marker", 'features': {}}
+
+        features = self._features(content, os.path.splitext(file_path)[1])
+        if features['conditionals'] == 0 and features['arithmetic'] == 0 and features['literals'] < self.min_literals:
+            return {'analyze': False, 'reason': "no conditionals, arithmetic or constants", 'features': features}
+        return {'analyze': True, 'reason': None, 'features': features}
+
+    def _features(self, content: str, file_ext: str) -> Dict[str, int]:
+        """Counts conditionals, arithmetic operations and literal constants."""
+        if file_ext == '.py':
+            features = self._python_features(content)
+            if features is not None:
+                return features
+
+        # Other languages (and Python that does not parse): strip comments, strings and
+        # preprocessor/import lines, then count with regexes
+        if file_ext == '.py':
+            code = re.sub(r'#[^\n]*', '', content)
+        else:
+            code = re.sub(r'/\*.*?\*/|//[^\n]*', '', content, flags=re.DOTALL)
+            code = re.sub(r'^\s*#\s*(?:include|pragma|ifn?def|if|elif|else|endif)\b[^\n]*', '', code, flags=re.MULTILINE)
+        code = re.sub(r'"(?:\\.|[^"\\\n])*"|\'(?:\\.|[^\'\\\n])*\'', '""', code)
+        code = re.sub(r'^\s*(?:import|package|from)\b[^\n]*', '', code, flags=re.MULTILINE)
+
+        # In headers '*' is mostly a pointer declaration, not a multiplication
+        arithmetic = 0 if file_ext in ('.h', '.hpp') else len(ARITHMETIC_PATTERN.findall(code))
+        return {
+            'conditionals': len(CONDITION_PATTERN.findall(code)),
+            'arithmetic': arithmetic,
+            'literals': len(NUMBER_PATTERN.findall(code)),
+        }
+
+    @staticmethod
+    def _python_features(content: str) -> Optional[Dict[str, int]]:
+        try:
+            tree = ast.parse(content)
+        except (SyntaxError, ValueError):
+            return None
+
+        conditionals = arithmetic = literals = 0
+        for node in ast.walk(tree):
+            if isinstance(node, (ast.If, ast.IfExp, ast.While, ast.Assert)) or type(node).__name__ == 'Match':
+                conditionals += 1
+            elif isinstance(node, ast.AugAssign):
+                arithmetic += 1
+            elif isinstance(node, ast.BinOp):
+                # '"..." % args' is string formatting, not arithmetic
+                is_format = isinstance(node.op, ast.Mod) and isinstance(node.left, (ast.Constant, ast.JoinedStr)) \
+                    and isinstance(getattr(node.left, 'value', ''), str)
+                arithmetic += 0 if is_format else 1
+            elif isinstance(node, ast.Constant) and isinstance(node.value, (int, float)) \
+                    and not isinstance(node.value, bool) and node.value not in (0, 1):
+                literals += 1
+        return {'conditionals': conditionals, 'arithmetic': arithmetic, 'literals': literals}
+
+    def filter(self, scan_results: Dict[str, Any]) -> Tuple[List[str], Dict[str, str]]:
+        """
+        Splits the scanned files into the ones worth analyzing and the skipped ones.
+
+        Args:
+            scan_results: Output of ScannerAgent.scan_repository
+
+        Returns:
+            Tuple of (files to analyze, {skipped file: reason})
+        """
+        base_path = scan_results.get("path", "")
+        kept, skipped = [], {}
+        for file_rel_path in scan_results.get("files", []):
+            full_path = os.path.join(base_path, file_rel_path) if base_path else file_rel_path
+            content = FileSystemTools.read_file(full_path)
+            if content.startswith("Error"):
+                # Let the Analyst deal with unreadable files as before
+                kept.append(file_rel_path)
+                continue
+            decision = self.classify(file_rel_path, content)
+            if decision['analyze']:
+                kept.append(file_rel_path)
+            else:
+                skipped[file_rel_path] = decision['reason']
+                metrics.incr("prefilter_skipped_total", labels={'reason': decision['reason']})
+
+        total = len(kept) + len(skipped)
+        logger.info(f"🧹 Pre-filter kept {len(kept)}/{total} files, skipped {len(skipped)} without business logic")
+        return kept, skipped
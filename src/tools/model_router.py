@@ -0,0 +1,100 @@
+import re
+from typing import Callable, Dict, Optional
+from src.utils.logger import setup_logger
+from src.utils.metrics import metrics
+from src.tools.llm_client import LLMClient
+
+logger = setup_logger("ModelRouter")
+
+BRANCH_PATTERN = re.compile(
+    r'\b(?:if|elif|else|case|when|switch|for|foreach|while|catch|except|unless|EVALUATE|PERFORM)\b|&&|\|\||\?',
+)
+NUMBER_PATTERN = re.compile(r'(?<![\w.])\d+(?:\.\d+)?%?')
+
+class ModelRouter:
+    """
+    Routes each file to a fast or a strong model based on a cheap complexity score.
+
+    The score combines size, branch density and the number of numeric literals
+    (thresholds, rates, limits) of the compressed content. Files scoring below
+    `threshold` go to the fast model; when its answer looks empty or malformed the
+    request is escalated to the strong model.
+    """
+
+    def __init__(self, fast_model: str = "gemini-2.0-flash", strong_model: Optional[str] = None,
+                 threshold: float = 0.5, escalate: bool = True):
+        """
+        Initialize the router.
+
+        Args:
+            fast_model: Cheap, low-latency model used for simple files
+            strong_model: Model used for complex files and escalations (None disables routing)
+            threshold: Complexity score (0-1) from which a file goes to the strong model
+            escalate: Whether to retry on the strong model when the fast model's output is rejected
+        """
+        self.fast_model = fast_model
+        self.strong_model = strong_model
+        self.threshold = threshold
+        self.escalate = escalate
+        self._clients: Dict[str, LLMClient] = {}
+
+    def client(self, model_name: str) -> LLMClient:
+        """Returns the (cached) client for a model."""
+        if model_name not in self._clients:
+            self._clients[model_name] = LLMClient(model_name)
+        return self._clients[model_name]
+
+    @staticmethod
+    def score(content: str) -> float:
+        """
+        Scores the complexity of a piece of code between 0 (trivial) and 1 (complex).
+
+        Args:
+            content: Source code, ideally already compressed
+
+        Returns:
+            Weighted mix of size, branch density and numeric-literal count
+        """
+        lines = [line for line in content.split('\n') if line.strip()]
+        if not lines:
+            return 0.0
+        branches = len(BRANCH_PATTERN.findall(content))
+        numbers = len(NUMBER_PATTERN.findall(content))
+
+        size = min(1.0, len(lines) / 400)
+        density = min(1.0, branches / len(lines) / 0.2)
+        literals = min(1.0, numbers / 40)
+        return round(0.4 * size + 0.3 * density + 0.3 * literals, 3)
+
+    def route(self, content: str) -> str:
+        """Returns the model that should handle the given code."""
+        if not self.strong_model:
+            return self.fast_model
+        return self.strong_model if self.score(content) >= self.threshold else self.fast_model
+
+    async def generate(self, prompt: str, content: str,
+                       is_valid: Optional[Callable[[str], bool]] = None, prefix: str = "") -> str:
+        """
+        Generates a response on the model chosen for `content`.
+
+        Args:
+            prompt: The prompt text following `prefix`
+            content: The code the prompt is about, used for scoring
+            is_valid: Optional check of the response; a rejected fast-model answer
+                is escalated to the strong model
+            prefix: Invariant prompt prefix, cached per model (see LLMClient.generate)
+
+        Returns:
+            The response text
+        """
+        model_name = self.route(content)
+        metrics.incr("router_decisions_total", labels={'model': model_name})
+        response_text = await self.client(model_name).generate(prompt, prefix=prefix)
+
+        if (self.escalate and self.strong_model and model_name != self.strong_model
+                and is_valid is not None and not is_valid(response_text)):
+            logger.info(f"⬆️ Escalating to {self.strong_model}: output of {model_name} was rejected")
+            metrics.incr("router_escalations_total", labels={'from': model_name, 'to': self.strong_model})
+            response_text = await self.client(self.strong_model).generate(prompt, prefix=prefix)
+
+        return response_text
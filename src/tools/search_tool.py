@@ -1,53 +1,211 @@
-from googlesearch import search as google_search
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Callable, Optional
 from src.utils.logger import setup_logger
+from src.utils.metrics import metrics
+from src.tools import cassette
+import os
 import asyncio
+import weakref
 
 logger = setup_logger("SearchTool")
 
+SERPER_ENDPOINT = "https://google.serper.dev/search"
+
+class SearchBackend:
+    """
+    Interface of the web search backends used by SearchTool.
+
+    `search` returns a list of results with title, link and snippet. `close`
+    releases pooled connections; SearchTool calls it at the end of a run.
+    """
+
+    async def search(self, query: str, num_results: int) -> List[Dict[str, Any]]:
+        raise NotImplementedError
+
+    async def close(self):
+        pass
+
+class ScraperSearchBackend(SearchBackend):
+    """
+    Runs a blocking search function in a worker thread; by default the
+    googlesearch scraper, which needs no API key.
+    """
+
+    def __init__(self, function: Optional[Callable[[str, int], List[Dict[str, Any]]]] = None):
+        self.function = function or self._google_search
+
+    async def search(self, query: str, num_results: int) -> List[Dict[str, Any]]:
+        return await asyncio.to_thread(self.function, query, num_results)
+
+    @staticmethod
+    def _google_search(query: str, num_results: int) -> List[Dict[str, Any]]:
+        # Imported on first use to keep CLI start-up fast
+        from googlesearch import search as google_search
+
+        # googlesearch-python returns objects with title, description, url
+        return [{
+            'title': item.title,
+            'link': item.url,
+            'snippet': item.description
+        } for item in google_search(query, num_results=num_results, advanced=True)]
+
+class HttpSearchBackend(SearchBackend):
+    """
+    Serper-compatible JSON search API over a pooled aiohttp session, so
+    consecutive lookups reuse their connections instead of opening new ones.
+    """
+
+    def __init__(self, api_key: str, endpoint: str = SERPER_ENDPOINT, pool_size: int = 8):
+        """
+        Args:
+            api_key: Sent as the X-API-KEY header
+            endpoint: URL the queries are POSTed to as {"q": query, "num": num_results}
+            pool_size: Most connections kept open to the endpoint
+        """
+        self.api_key = api_key
+        self.endpoint = endpoint
+        self.pool_size = pool_size
+        self._session = None
+        self._loop = None
+
+    def _get_session(self):
+        # A session belongs to the event loop it was created in
+        loop = asyncio.get_running_loop()
+        if self._session is None or self._session.closed or self._loop is not loop:
+            # Imported on first use to keep CLI start-up fast
+            import aiohttp
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.pool_size, ttl_dns_cache=300),
+                headers={'X-API-KEY': self.api_key, 'Content-Type': 'application/json'},
+            )
+            self._loop = loop
+        return self._session
+
+    async def search(self, query: str, num_results: int) -> List[Dict[str, Any]]:
+        async with self._get_session().post(self.endpoint, json={'q': query, 'num': num_results}) as response:
+            response.raise_for_status()
+            data = await response.json()
+        return [{
+            'title': item.get('title', ''),
+            'link': item.get('link', ''),
+            'snippet': item.get('snippet', '')
+        } for item in data.get('organic', [])[:num_results]]
+
+    async def close(self):
+        if self._session is not None and not self._session.closed and self._loop is asyncio.get_running_loop():
+            await self._session.close()
+        self._session = None
+
+class _LoopState:
+    """Concurrency limit and in-flight lookups, which belong to one event loop."""
+
+    def __init__(self, max_concurrency: int):
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.inflight: Dict[tuple, asyncio.Future] = {}
+
 class SearchTool:
+    # Backend every SearchTool sends its queries to. Defaults to the Serper API when
+    # SERPER_API_KEY is set and to the googlesearch scraper otherwise.
+    # Benchmarks and tests swap in a local stand-in here.
+    search_backend: Optional[SearchBackend] = None
+
+    # Lookups in flight at once across all SearchTools of the process
+    max_concurrency: int = 4
+    # Longest a lookup may take, including the wait for a free slot; it then yields no results
+    timeout: float = 10.0
+
+    _default_backend: Optional[SearchBackend] = None
+    _loop_states: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, _LoopState]" = weakref.WeakKeyDictionary()
+
     def __init__(self):
         """Initialize SearchTool."""
-        pass
-        
+        # Results of previous queries; the same library is usually looked up for many files
+        self._cache: Dict[tuple, List[Dict[str, Any]]] = {}
+
+    @classmethod
+    def backend(cls) -> SearchBackend:
+        """The configured search backend."""
+        if cls.search_backend is not None:
+            return cls.search_backend
+        if cls._default_backend is None:
+            api_key = os.getenv("SERPER_API_KEY")
+            cls._default_backend = HttpSearchBackend(api_key) if api_key else ScraperSearchBackend()
+        return cls._default_backend
+
+    @classmethod
+    def _loop_state(cls) -> _LoopState:
+        loop = asyncio.get_running_loop()
+        state = cls._loop_states.get(loop)
+        if state is None:
+            state = cls._loop_states[loop] = _LoopState(cls.max_concurrency)
+        return state
+
+    @classmethod
+    async def aclose(cls):
+        """Releases the pooled connections of the search backends."""
+        for backend in {id(b): b for b in (cls.search_backend, cls._default_backend) if b is not None}.values():
+            try:
+                await backend.close()
+            except Exception as e:
+                logger.debug(f"Could not close search backend: {e}")
+
     async def search(self, query: str, num_results: int = 5) -> List[Dict[str, Any]]:
         """
-        Searches Google using googlesearch-python.
-        
+        Searches the web through the configured backend.
+
+        Concurrent lookups of the same query share one request, and at most
+        `max_concurrency` requests are in flight at once.
+
         Args:
             query: The search query
             num_results: Number of results to return
-            
+
         Returns:
-            List of search results with title, link, and snippet
+            List of search results with title, link, and snippet (empty on errors and timeouts)
         """
+        cache_key = (query, num_results)
+        if cache_key in self._cache:
+            metrics.cache_hit("search")
+            return self._cache[cache_key]
+        metrics.cache_miss("search")
+
+        tape = cassette.get_active()
+        if tape and tape.replaying:
+            # Mismatches propagate so replayed runs fail loudly instead of silently degrading
+            return tape.replay("search", {'query': query, 'num_results': num_results})
+
+        inflight = self._loop_state().inflight
+        lookup = inflight.get(cache_key)
+        if lookup is None:
+            lookup = inflight[cache_key] = asyncio.ensure_future(self._lookup(query, num_results))
+            lookup.add_done_callback(lambda _: inflight.pop(cache_key, None))
+        else:
+            metrics.incr("search_coalesced_total")
+        # Shielded, so a cancelled caller does not cancel the lookup the others wait for
+        results = await asyncio.shield(lookup)
+        if results:
+            self._cache[cache_key] = results
+        return results
+
+    async def _lookup(self, query: str, num_results: int) -> List[Dict[str, Any]]:
+        """Sends one query to the backend within the concurrency limit and the timeout."""
         try:
-            # Run the synchronous search in a thread pool to avoid blocking asyncio loop
-            results = await asyncio.to_thread(self._sync_search, query, num_results)
-            
-            logger.info(f"Search completed for '{query}': {len(results)} results")
-            return results
-            
+            with metrics.span("search", query=query):
+                results = await asyncio.wait_for(self._limited(query, num_results), self.timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"⏱️ Search for '{query}' timed out after {self.timeout:.0f}s")
+            metrics.incr("search_timeouts_total")
+            return []
         except Exception as e:
             logger.error(f"Search error: {e}")
-            import traceback
-            logger.error(f"Traceback: {traceback.format_exc()}")
+            metrics.incr("search_errors_total")
             return []
 
-    def _sync_search(self, query: str, num_results: int) -> List[Dict[str, Any]]:
-        """Synchronous search function to be run in thread."""
-        results = []
-        try:
-            # googlesearch-python returns objects with title, description, url
-            search_results = google_search(query, num_results=num_results, advanced=True)
-            
-            for item in search_results:
-                results.append({
-                    'title': item.title,
-                    'link': item.url,
-                    'snippet': item.description
-                })
-        except Exception as e:
-            logger.error(f"Sync search error: {e}")
-            
+        tape = cassette.get_active()
+        if tape and tape.recording:
+            tape.record("search", {'query': query, 'num_results': num_results}, results)
+        logger.info(f"Search completed for '{query}': {len(results)} results")
         return results
+
+    async def _limited(self, query: str, num_results: int) -> List[Dict[str, Any]]:
+        async with self._loop_state().semaphore:
+            return await self.backend().search(query, num_results)
@@ -0,0 +1,239 @@
+import time
+import threading
+from typing import Dict, Any, Optional, Tuple
+from src.utils.logger import setup_logger
+from src.utils.metrics import metrics
+
+logger = setup_logger("Budget")
+
+# USD per million tokens as (prompt, response). Models are matched by the longest
+# prefix, so "gemini-1.5-pro-latest" is priced as gemini-1.5-pro.
+MODEL_PRICES: Dict[str, Tuple[float, float]] = {
+    "gemini-2.0-flash-lite": (0.075, 0.30),
+    "gemini-2.0-flash": (0.10, 0.40),
+    "gemini-1.5-flash": (0.075, 0.30),
+    "gemini-1.5-pro": (1.25, 5.00),
+    "gemini-2.5-flash": (0.30, 2.50),
+    "gemini-2.5-pro": (1.25, 10.00),
+}
+DEFAULT_PRICE = MODEL_PRICES["gemini-2.0-flash"]
+# Prompt tokens served from a context cache are billed at this fraction of the prompt price
+CACHED_PRICE_FACTOR = 0.25
+
+def price_of(model: str) -> Tuple[float, float]:
+    """Returns the (prompt, response) price per million tokens of a model."""
+    matches = [name for name in MODEL_PRICES if model.startswith(name) or model.startswith(f"models/{name}")]
+    return MODEL_PRICES[max(matches, key=len)] if matches else DEFAULT_PRICE
+
+class BudgetExceededError(Exception):
+    """Raised before a model call that would exceed the run budget."""
+
+class TokenCounter:
+    """
+    Local preflight token estimate, so prompts can be sized before they are sent.
+
+    Starts at ~4 characters per token and calibrates itself from the token counts
+    the API reports for completed calls.
+    """
+
+    def __init__(self, chars_per_token: float = 4.0):
+        self.chars_per_token = chars_per_token
+        self._chars = 0
+        self._tokens = 0
+        self._lock = threading.Lock()
+
+    def count(self, text: str) -> int:
+        """Estimated number of tokens in `text`."""
+        return max(1, round(len(text) / self.chars_per_token)) if text else 0
+
+    def observe(self, chars: int, tokens: int):
+        """Calibrates the estimate with the actual token count of a prompt."""
+        if not chars or not tokens:
+            return
+        with self._lock:
+            self._chars += chars
+            self._tokens += tokens
+            self.chars_per_token = self._chars / self._tokens
+
+token_counter = TokenCounter()
+
+class RunBudget:
+    """
+    Per-run limits on tokens, dollars and wall-clock time.
+
+    Every model call is checked before it is sent and recorded afterwards. The
+    Analyst asks for a per-file prompt allowance and compresses harder when the
+    run is projected to overshoot; a share of each limit (`reserve`) is held back
+    for the architecture and QA stages that follow the analysis.
+    """
+
+    def __init__(self, max_tokens: Optional[int] = None, max_dollars: Optional[float] = None,
+                 max_seconds: Optional[float] = None, reserve: float = 0.15):
+        """
+        Initialize the budget. The wall clock starts now.
+
+        Args:
+            max_tokens: Prompt plus response tokens for the whole run
+            max_dollars: Estimated model cost of the whole run in USD (see MODEL_PRICES)
+            max_seconds: Wall-clock time of the whole run
+            reserve: Fraction of each limit the analysis stage leaves for the later stages
+        """
+        self.max_tokens = max_tokens
+        self.max_dollars = max_dollars
+        self.max_seconds = max_seconds
+        self.reserve = reserve
+        self.started = time.monotonic()
+        self.prompt_tokens = 0
+        self.response_tokens = 0
+        self.cached_tokens = 0
+        self.dollars = 0.0
+        self.calls = 0
+        self.call_seconds = 0.0
+        self.compression_levels: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def tokens(self) -> int:
+        return self.prompt_tokens + self.response_tokens
+
+    @property
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started
+
+    def cost(self, model: str, prompt_tokens: int, response_tokens: int, cached_tokens: int = 0) -> float:
+        prompt_price, response_price = price_of(model)
+        return (prompt_tokens * prompt_price + cached_tokens * prompt_price * CACHED_PRICE_FACTOR
+                + response_tokens * response_price) / 1e6
+
+    def check(self, model: str, prompt_tokens: int, include_reserve: bool = True):
+        """
+        Preflight check of a model call.
+
+        Args:
+            model: Model the call goes to
+            prompt_tokens: Estimated prompt size
+            include_reserve: Whether the call may spend the reserve (False during the analysis)
+
+        Raises:
+            BudgetExceededError: When the prompt alone would exceed a limit, or time is up
+        """
+        share = 1.0 if include_reserve else 1.0 - self.reserve
+        if self.max_tokens is not None and self.tokens + prompt_tokens > self.max_tokens * share:
+            raise BudgetExceededError(f"Token budget exhausted ({self.tokens} of {self.max_tokens * share:.0f} used, "
+                                      f"prompt needs {prompt_tokens})")
+        if self.max_dollars is not None and self.dollars + self.cost(model, prompt_tokens, 0) > self.max_dollars * share:
+            raise BudgetExceededError(f"Cost budget exhausted (${self.dollars:.4f} of ${self.max_dollars * share:.2f} spent)")
+        if self.max_seconds is not None and self.elapsed > self.max_seconds * share:
+            raise BudgetExceededError(f"Time budget exhausted ({self.elapsed:.0f}s of {self.max_seconds * share:.0f}s)")
+
+    def record(self, model: str, prompt_tokens: int, response_tokens: int, seconds: float = 0.0,
+               cached_tokens: int = 0):
+        """
+        Records a completed model call.
+
+        Args:
+            model: Model the call went to
+            prompt_tokens: Prompt tokens processed by the call, excluding cached ones
+            response_tokens: Response tokens
+            seconds: Duration of the call
+            cached_tokens: Prompt tokens served from a context cache (billed at a discount)
+        """
+        cost = self.cost(model, prompt_tokens, response_tokens, cached_tokens)
+        with self._lock:
+            self.prompt_tokens += prompt_tokens
+            self.response_tokens += response_tokens
+            self.cached_tokens += cached_tokens
+            self.dollars += cost
+            self.calls += 1
+            self.call_seconds += seconds
+        metrics.incr("budget_dollars_total", cost, {'model': model})
+
+    def note_compression(self, level: str):
+        """Counts the compression level a file was sent with."""
+        with self._lock:
+            self.compression_levels[level] = self.compression_levels.get(level, 0) + 1
+
+    def prompt_allowance(self, remaining_calls: int, model: str) -> Optional[int]:
+        """
+        Prompt tokens each of the remaining analysis calls may use to stay within budget.
+
+        Args:
+            remaining_calls: Model calls the analysis still has to make
+            model: Model the calls go to (for the dollar limit)
+
+        Returns:
+            Token allowance per call, or None when no limit applies
+        """
+        remaining_calls = max(1, remaining_calls)
+        spendable = 1.0 - self.reserve
+        response_tokens = self.response_tokens / self.calls if self.calls else 300
+        allowances = []
+        if self.max_tokens is not None:
+            left = self.max_tokens * spendable - self.tokens
+            allowances.append(left / remaining_calls - response_tokens)
+        if self.max_dollars is not None:
+            prompt_price, response_price = price_of(model)
+            left = self.max_dollars * spendable - self.dollars
+            allowances.append((left / remaining_calls - response_tokens * response_price / 1e6) * 1e6 / prompt_price)
+        if self.max_seconds is not None and self.calls:
+            # Scale the prompts seen so far down by how far the time projection overshoots
+            left = self.max_seconds * spendable - self.elapsed
+            projected = self.call_seconds / self.calls * remaining_calls
+            if projected > left:
+                allowances.append(self.prompt_tokens / self.calls * max(left, 0.0) / projected)
+        if not allowances:
+            return None
+        return max(0, int(min(allowances)))
+
+    def usage(self) -> Dict[str, Any]:
+        """Usage against each limit, JSON-serializable."""
+        return {
+            'tokens': self.tokens, 'max_tokens': self.max_tokens,
+            'prompt_tokens': self.prompt_tokens, 'response_tokens': self.response_tokens,
+            'cached_tokens': self.cached_tokens,
+            'dollars': round(self.dollars, 6), 'max_dollars': self.max_dollars,
+            'seconds': round(self.elapsed, 2), 'max_seconds': self.max_seconds,
+            'calls': self.calls,
+            'compression_levels': dict(self.compression_levels),
+        }
+
+    def to_markdown(self) -> str:
+        """Budget usage section for the final report."""
+        def row(name: str, used: str, limit: Optional[str], fraction: Optional[float]) -> str:
+            share = f"{fraction:.0%}" if fraction is not None else "—"
+            return f"| {name} | {used} | {limit or 'unlimited'} | {share} |"
+
+        lines = [
+            "| Resource | Used | Budget | Share |",
+            "|---|---|---|---|",
+            row("Tokens", f"{self.tokens:,}", f"{self.max_tokens:,}" if self.max_tokens else None,
+                self.tokens / self.max_tokens if self.max_tokens else None),
+            row("Cost (USD, estimated)", f"${self.dollars:.4f}", f"${self.max_dollars:.2f}" if self.max_dollars else None,
+                self.dollars / self.max_dollars if self.max_dollars else None),
+            row("Wall time", f"{self.elapsed:.0f}s", f"{self.max_seconds:.0f}s" if self.max_seconds else None,
+                self.elapsed / self.max_seconds if self.max_seconds else None),
+        ]
+        if self.cached_tokens:
+            lines.append(f"\nPrompt tokens served from the context cache: {self.cached_tokens:,}")
+        if self.compression_levels:
+            levels = ", ".join(f"{level}: {count}" for level, count in self.compression_levels.items())
+            lines.append(f"\nFiles by compression level: {levels}")
+        return "\n".join(lines)
+
+_active: Optional[RunBudget] = None
+
+def activate(budget: RunBudget) -> RunBudget:
+    """Makes `budget` the budget of every model call in this process."""
+    global _active
+    _active = budget
+    logger.info(f"💰 Run budget: tokens={budget.max_tokens or '∞'}, "
+                f"cost={'$%.2f' % budget.max_dollars if budget.max_dollars else '∞'}, "
+                f"time={'%.0fs' % budget.max_seconds if budget.max_seconds else '∞'}")
+    return budget
+
+def deactivate():
+    global _active
+    _active = None
+
+def get_active() -> Optional[RunBudget]:
+    return _active
@@ -1,49 +1,223 @@
-import logging
-import sys
 import io
+import sys
+import json
+import time
+import uuid
+import queue
+import atexit
+import logging
+import threading
+import contextvars
+from contextlib import contextmanager
+from datetime import datetime
+from logging.handlers import QueueHandler
+from typing import Any, Dict, List, Optional, TextIO
+
+# Fields (run, file, stage, ...) attached to every record logged within a log_context block
+_context: contextvars.ContextVar = contextvars.ContextVar("log_context", default={})
+
+class ContextFilter(logging.Filter):
+    """Copies the run id and the current log_context fields onto each record (in the logging thread)."""
+
+    def __init__(self):
+        super().__init__()
+        self.run_id = uuid.uuid4().hex[:12]
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.run = self.run_id
+        record.context = _context.get()
+        return True
+
+class RateLimitFilter(logging.Filter):
+    """
+    Lets each call site emit at most `per_second` INFO/DEBUG records per second.
+
+    Per-file messages would otherwise print hundreds of lines per second on large
+    runs. Warnings and errors always pass; the number of suppressed records is
+    appended to the next record a call site emits.
+    """
+
+    def __init__(self, per_second: float = 20.0):
+        super().__init__()
+        self.per_second = per_second
+        self._windows: Dict[tuple, List] = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not self.per_second or record.levelno > logging.INFO:
+            return True
+        key = (record.name, record.pathname, record.lineno)
+        now = time.monotonic()
+        with self._lock:
+            window = self._windows.setdefault(key, [now, 0, 0])  # window start, emitted, suppressed
+            if now - window[0] >= 1.0:
+                window[0], window[1] = now, 0
+            if window[1] >= self.per_second:
+                window[2] += 1
+                return False
+            window[1] += 1
+            suppressed, window[2] = window[2], 0
+        if suppressed:
+            record.suppressed = suppressed
+        return True
+
+class TextFormatter(logging.Formatter):
+    """The classic `time - logger - level - message` line, plus the count of suppressed similar lines."""
+
+    def __init__(self):
+        super().__init__('%(asctime)s - %(name)s - %(levelname)s - %(message)s', datefmt='%Y-%m-%d %H:%M:%S')
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        suppressed = getattr(record, 'suppressed', 0)
+        return f"{line} (+{suppressed} similar suppressed)" if suppressed else line
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line with the run, file and stage fields of the record's log_context."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict[str, Any] = {
+            'ts': datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'run': getattr(record, 'run', None),
+        }
+        entry.update(getattr(record, 'context', {}))
+        if getattr(record, 'suppressed', 0):
+            entry['suppressed'] = record.suppressed
+        if record.exc_text:
+            entry['exception'] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+class _LogWriter(threading.Thread):
+    """Background thread writing queued records, so logging never blocks the event loop on I/O."""
+
+    def __init__(self, records: queue.SimpleQueue, stream: TextIO):
+        super().__init__(name="log-writer", daemon=True)
+        self.records = records
+        self.handler = logging.StreamHandler(stream)
+        self.handler.setFormatter(TextFormatter())
+
+    def run(self):
+        while True:
+            record = self.records.get()
+            if isinstance(record, threading.Event):
+                self._flush()
+                record.set()
+                continue
+            try:
+                self.handler.stream.write(self.handler.format(record) + '\n')
+            except Exception:
+                self.handler.handleError(record)
+            # Written lines are flushed once the queue runs dry, not after every line
+            if self.records.empty():
+                self._flush()
+
+    def _flush(self):
+        try:
+            self.handler.flush()
+        except (ValueError, OSError):
+            # stdout was closed (e.g. by a test runner) before the last records were written
+            pass
+
+def _utf8_stdout() -> TextIO:
+    # Wrap stdout with UTF-8 encoding, replacing unencodable characters.
+    # This prevents UnicodeEncodeError when logging emoji characters on Windows
+    try:
+        return io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+    except (AttributeError, io.UnsupportedOperation):
+        # Fallback to regular stdout if wrapping fails
+        return sys.stdout
+
+_records: queue.SimpleQueue = queue.SimpleQueue()
+_queue_handler = QueueHandler(_records)
+_context_filter = ContextFilter()
+_rate_limit = RateLimitFilter()
+_queue_handler.addFilter(_context_filter)
+_queue_handler.addFilter(_rate_limit)
+_writer: Optional[_LogWriter] = None
+_writer_lock = threading.Lock()
+_level = logging.INFO
+_loggers: List[logging.Logger] = []
+
+def _ensure_writer():
+    global _writer
+    with _writer_lock:
+        if _writer is None or not _writer.is_alive():
+            _writer = _LogWriter(_records, _utf8_stdout())
+            _writer.start()
 
 def setup_logger(name: str = "LogicMapper") -> logging.Logger:
     """
     Sets up a logger with a standard configuration.
-    
+
+    Records are handed to a queue and written by a single background thread, so a
+    log call costs the caller no I/O. Levels, output format and rate limiting are
+    process-wide (see configure).
+
     Args:
         name: The name of the logger.
-        
+
     Returns:
         logging.Logger: The configured logger instance.
     """
     logger = logging.getLogger(name)
-    
+
     # Prevent adding multiple handlers if function is called multiple times
-    if logger.hasHandlers():
+    if _queue_handler in logger.handlers:
         return logger
-        
-    logger.setLevel(logging.INFO)
-    
-    # Create console handler with UTF-8 encoding support
-    # This prevents UnicodeEncodeError when logging emoji characters on Windows
-    try:
-        # Wrap stdout with UTF-8 encoding, replacing unencodable characters
-        utf8_stdout = io.TextIOWrapper(
-            sys.stdout.buffer,
-            encoding='utf-8',
-            errors='replace',  # Replace unencodable characters with '?'
-            line_buffering=True
-        )
-        handler = logging.StreamHandler(utf8_stdout)
-    except (AttributeError, io.UnsupportedOperation):
-        # Fallback to regular stdout if wrapping fails
-        handler = logging.StreamHandler(sys.stdout)
-    
-    handler.setLevel(logging.INFO)
-    
-    # Create formatter
-    formatter = logging.Formatter(
-        '%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-        datefmt='%Y-%m-%d %H:%M:%S'
-    )
-    
-    handler.setFormatter(formatter)
-    logger.addHandler(handler)
-    
+
+    _ensure_writer()
+    logger.setLevel(_level)
+    logger.addHandler(_queue_handler)
+    # The queue handler is the only output; the root logger would print everything twice
+    logger.propagate = False
+    _loggers.append(logger)
     return logger
+
+def configure(level: Optional[str] = None, json_lines: Optional[bool] = None,
+              rate_limit: Optional[float] = None, run_id: Optional[str] = None):
+    """
+    Configures every LogicMapper logger (existing and future ones).
+
+    Args:
+        level: Minimum level, e.g. "DEBUG" or "WARNING"
+        json_lines: Write one JSON object per record instead of text lines
+        rate_limit: INFO/DEBUG records per second each call site may emit (0 disables the limit)
+        run_id: Id attached to every record (a random one by default)
+    """
+    global _level
+    if level is not None:
+        _level = logging.getLevelName(level.upper()) if isinstance(level, str) else level
+        for logger in _loggers:
+            logger.setLevel(_level)
+    _ensure_writer()
+    if json_lines is not None:
+        _writer.handler.setFormatter(JsonFormatter() if json_lines else TextFormatter())
+    if rate_limit is not None:
+        _rate_limit.per_second = rate_limit
+    if run_id is not None:
+        _context_filter.run_id = run_id
+
+@contextmanager
+def log_context(**fields: Any):
+    """
+    Attaches fields (e.g. file=..., stage=...) to every record logged inside the
+    block, including from tasks started in it. They show up in JSON-lines output.
+    """
+    token = _context.set({**_context.get(), **{k: v for k, v in fields.items() if v is not None}})
+    try:
+        yield
+    finally:
+        _context.reset(token)
+
+def flush(timeout: float = 5.0):
+    """Waits until every record logged so far has been written."""
+    if _writer is None or not _writer.is_alive():
+        return
+    written = threading.Event()
+    _records.put(written)
+    written.wait(timeout)
+
+atexit.register(flush)
@@ -0,0 +1,214 @@
+import sys
+import json
+import time
+import threading
+import contextvars
+from contextlib import contextmanager
+from typing import Dict, Any, List, Optional, Tuple
+
+# Latency buckets in seconds, from sub-millisecond local work to multi-minute LLM calls
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+_current_span: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("current_span", default=None)
+
+def _key(name: str, labels: Optional[Dict[str, str]]) -> Tuple[str, Tuple[Tuple[str, str], ...]]:
+    return name, tuple(sorted((labels or {}).items()))
+
+class MetricsRegistry:
+    """
+    Process-wide metrics and tracing surface.
+
+    Records timing spans, counters (tokens, calls, cache hits/misses) and latency
+    histograms, and exports them as JSON or Prometheus text exposition.
+    Per-span records are only kept for the first `max_span_records` spans; the
+    aggregates and histograms cover every span.
+    """
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS, max_span_records: int = 2000):
+        self.buckets = buckets
+        self.max_span_records = max_span_records
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Drops everything recorded so far."""
+        with self._lock:
+            self._started = time.time()
+            self._counters: Dict[Tuple, float] = {}
+            self._histograms: Dict[Tuple, Dict[str, Any]] = {}
+            self._spans: List[Dict[str, Any]] = []
+            self._dropped_spans = 0
+
+    @contextmanager
+    def span(self, name: str, **attributes):
+        """
+        Times a block of (sync or async) code.
+
+        Args:
+            name: Span name, e.g. "scan" or "llm.generate"
+            attributes: Extra attributes stored on the span record (file, model, ...)
+        """
+        parent = _current_span.get()
+        token = _current_span.set(name)
+        start = time.perf_counter()
+        started_at = time.time()
+        error = None
+        try:
+            yield
+        except BaseException as e:
+            error = type(e).__name__
+            raise
+        finally:
+            duration = time.perf_counter() - start
+            _current_span.reset(token)
+            self.observe("span_duration_seconds", duration, {'span': name})
+            if error:
+                self.incr("span_errors_total", labels={'span': name, 'error': error})
+            with self._lock:
+                if len(self._spans) < self.max_span_records:
+                    record = {'name': name, 'parent': parent, 'start': started_at, 'duration': duration}
+                    if attributes:
+                        record['attributes'] = {k: str(v) for k, v in attributes.items()}
+                    if error:
+                        record['error'] = error
+                    self._spans.append(record)
+                else:
+                    self._dropped_spans += 1
+
+    def incr(self, name: str, value: float = 1, labels: Optional[Dict[str, str]] = None):
+        """Increments a counter."""
+        key = _key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name: str, value: float, labels: Optional[Dict[str, str]] = None):
+        """Records one observation in a histogram."""
+        key = _key(name, labels)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = {'buckets': [0] * len(self.buckets), 'count': 0, 'sum': 0.0,
+                             'min': value, 'max': value}
+                self._histograms[key] = histogram
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    histogram['buckets'][i] += 1
+            histogram['count'] += 1
+            histogram['sum'] += value
+            histogram['min'] = min(histogram['min'], value)
+            histogram['max'] = max(histogram['max'], value)
+
+    def record_tokens(self, model: str, prompt_tokens: int, response_tokens: int):
+        """Records the token usage of one model call."""
+        self.incr("llm_prompt_tokens_total", prompt_tokens or 0, {'model': model})
+        self.incr("llm_response_tokens_total", response_tokens or 0, {'model': model})
+
+    def cache_hit(self, cache: str):
+        self.incr("cache_hits_total", labels={'cache': cache})
+
+    def cache_miss(self, cache: str):
+        self.incr("cache_misses_total", labels={'cache': cache})
+
+    def peak_memory_bytes(self) -> Optional[int]:
+        """Peak resident set size of this process, if the platform exposes it."""
+        try:
+            import resource
+        except ImportError:
+            return None
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux reports kilobytes, macOS bytes
+        return peak if sys.platform == "darwin" else peak * 1024
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Returns all metrics as a JSON-serializable dict."""
+        with self._lock:
+            counters = [{'name': name, 'labels': dict(labels), 'value': value}
+                        for (name, labels), value in self._counters.items()]
+            histograms = []
+            for (name, labels), h in self._histograms.items():
+                histograms.append({
+                    'name': name,
+                    'labels': dict(labels),
+                    'count': h['count'],
+                    'sum': h['sum'],
+                    'min': h['min'],
+                    'max': h['max'],
+                    'mean': h['sum'] / h['count'] if h['count'] else 0.0,
+                    'buckets': dict(zip([str(b) for b in self.buckets], h['buckets']))
+                })
+            spans = list(self._spans)
+            dropped = self._dropped_spans
+
+        hits = {c['labels']['cache']: c['value'] for c in counters if c['name'] == "cache_hits_total"}
+        misses = {c['labels']['cache']: c['value'] for c in counters if c['name'] == "cache_misses_total"}
+        cache_hit_rates = {
+            cache: hits.get(cache, 0) / (hits.get(cache, 0) + misses.get(cache, 0))
+            for cache in set(hits) | set(misses)
+        }
+
+        return {
+            'started_at': self._started,
+            'wall_time_seconds': time.time() - self._started,
+            'peak_memory_bytes': self.peak_memory_bytes(),
+            'cache_hit_rates': cache_hit_rates,
+            'counters': counters,
+            'histograms': histograms,
+            'spans': spans,
+            'dropped_spans': dropped
+        }
+
+    def to_prometheus(self, prefix: str = "logicmapper") -> str:
+        """Renders the metrics in the Prometheus text exposition format."""
+        snapshot = self.snapshot()
+        lines = []
+
+        def fmt_labels(labels: Dict[str, str], extra: Optional[Dict[str, str]] = None) -> str:
+            merged = dict(labels, **(extra or {}))
+            if not merged:
+                return ""
+            escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for v in merged.values())
+            return "{" + ",".join(f'{k}="{v}"' for k, v in zip(merged.keys(), escaped)) + "}"
+
+        typed = set()
+        for counter in snapshot['counters']:
+            name = f"{prefix}_{counter['name']}"
+            if name not in typed:
+                lines.append(f"# TYPE {name} counter")
+                typed.add(name)
+            lines.append(f"{name}{fmt_labels(counter['labels'])} {counter['value']}")
+
+        for h in snapshot['histograms']:
+            name = f"{prefix}_{h['name']}"
+            if name not in typed:
+                lines.append(f"# TYPE {name} histogram")
+                typed.add(name)
+            for bound, count in h['buckets'].items():
+                lines.append(f"{name}_bucket{fmt_labels(h['labels'], {'le': bound})} {count}")
+            lines.append(f"{name}_bucket{fmt_labels(h['labels'], {'le': '+Inf'})} {h['count']}")
+            lines.append(f"{name}_sum{fmt_labels(h['labels'])} {h['sum']}")
+            lines.append(f"{name}_count{fmt_labels(h['labels'])} {h['count']}")
+
+        if snapshot['peak_memory_bytes'] is not None:
+            lines.append(f"# TYPE {prefix}_peak_memory_bytes gauge")
+            lines.append(f"{prefix}_peak_memory_bytes {snapshot['peak_memory_bytes']}")
+
+        lines.append(f"# TYPE {prefix}_wall_time_seconds gauge")
+        lines.append(f"{prefix}_wall_time_seconds {snapshot['wall_time_seconds']}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, path: str) -> Tuple[str, str]:
+        """
+        Writes the JSON profile to `path` and the Prometheus exposition next to it.
+
+        Returns:
+            The paths of the JSON and Prometheus files
+        """
+        prom_path = (path[:-5] if path.endswith('.json') else path) + '.prom'
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.snapshot(), f, indent=2)
+        with open(prom_path, 'w', encoding='utf-8') as f:
+            f.write(self.to_prometheus())
+        return path, prom_path
+
+# Shared registry used by all agents and tools
+metrics = MetricsRegistry()
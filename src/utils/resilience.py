@@ -0,0 +1,238 @@
+import time
+import random
+import asyncio
+import threading
+from typing import Awaitable, Callable, Dict, Optional, TypeVar
+from src.utils.logger import setup_logger
+from src.utils.metrics import metrics
+
+logger = setup_logger("Resilience")
+
+T = TypeVar("T")
+
+# google.api_core exception names (and HTTP codes) that are worth retrying
+RETRYABLE_ERROR_NAMES = {
+    "ResourceExhausted", "TooManyRequests", "ServiceUnavailable", "DeadlineExceeded",
+    "InternalServerError", "GatewayTimeout", "BadGateway", "Aborted", "Unavailable",
+    "TimeoutError", "ConnectionError", "ConnectionResetError", "ServerDisconnectedError",
+}
+RETRYABLE_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+
+def is_retryable(error: BaseException) -> bool:
+    """Whether an error is transient (rate limit, timeout, server-side failure)."""
+    if isinstance(error, (asyncio.TimeoutError, TimeoutError, ConnectionError)):
+        return True
+    if type(error).__name__ in RETRYABLE_ERROR_NAMES:
+        return True
+    code = getattr(error, 'code', None)
+    code = getattr(code, 'value', code)  # grpc status enums
+    return isinstance(code, int) and code in RETRYABLE_STATUS_CODES
+
+class CircuitBreaker:
+    """
+    Pauses dispatch to a provider that keeps failing.
+
+    After `failure_threshold` consecutive retryable failures the circuit opens and
+    callers wait for `reset_timeout` seconds. Then a single probe call is let through:
+    success closes the circuit, failure opens it again.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._open_until = 0.0
+        self._probe_started: Optional[float] = None
+
+    @property
+    def is_open(self) -> bool:
+        return time.monotonic() < self._open_until
+
+    def wait_time(self) -> float:
+        """Seconds a caller should wait before dispatching (0 when the call may proceed)."""
+        with self._lock:
+            now = time.monotonic()
+            if now < self._open_until:
+                return self._open_until - now
+            if self._failures >= self.failure_threshold:
+                # Half-open: one probe at a time (a probe that never reported back is replaced)
+                if self._probe_started is not None and now - self._probe_started < self.reset_timeout:
+                    return min(1.0, self.reset_timeout)
+                self._probe_started = now
+            return 0.0
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._probe_started = None
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._probe_started = None
+            if self._failures >= self.failure_threshold:
+                self._open_until = time.monotonic() + self.reset_timeout
+                metrics.incr("circuit_open_total", labels={'circuit': self.name})
+                logger.warning(f"⛔ Circuit '{self.name}' open for {self.reset_timeout:.0f}s "
+                               f"after {self._failures} consecutive failures")
+
+_breakers: Dict[str, CircuitBreaker] = {}
+
+def get_breaker(name: str, **kwargs) -> CircuitBreaker:
+    """Returns the process-wide circuit breaker for a provider, creating it on first use."""
+    if name not in _breakers:
+        _breakers[name] = CircuitBreaker(name, **kwargs)
+    return _breakers[name]
+
+class CallPolicy:
+    """
+    Timeout, retry, hedging and circuit-breaking policy for remote calls.
+
+    Retryable errors are retried with exponential backoff and full jitter. With
+    `hedge_after` set, a second identical request is started when the first has not
+    completed after that many seconds, and whichever finishes first wins.
+    """
+
+    def __init__(self, name: str, timeout: Optional[float] = 120.0, max_retries: int = 4,
+                 base_delay: float = 1.0, max_delay: float = 30.0, hedge_after: Optional[float] = None,
+                 breaker: Optional[CircuitBreaker] = None):
+        """
+        Args:
+            name: Label used in logs and metrics
+            timeout: Per-attempt timeout in seconds (None disables it)
+            max_retries: Retries after the first attempt
+            base_delay: Backoff base in seconds
+            max_delay: Backoff cap in seconds
+            hedge_after: Seconds after which a hedged duplicate request is sent (None disables hedging)
+            breaker: Circuit breaker shared by every caller of the same provider
+        """
+        self.name = name
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.hedge_after = hedge_after
+        self.breaker = breaker
+
+    def backoff(self, attempt: int) -> float:
+        """Full-jitter exponential backoff for the given (0-based) retry."""
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    async def call(self, fn: Callable[[], Awaitable[T]], hedge: bool = True,
+                   can_retry: Optional[Callable[[], bool]] = None) -> T:
+        """
+        Runs an async call under the policy.
+
+        Args:
+            fn: Zero-argument factory returning a fresh awaitable per attempt
+            hedge: Whether hedging may be used (disable for non-idempotent or streamed calls)
+            can_retry: Optional check evaluated before each retry (e.g. nothing streamed yet)
+        """
+        attempt = 0
+        while True:
+            await self._wait_for_circuit()
+            try:
+                if hedge and self.hedge_after is not None:
+                    result = await self._hedged(fn)
+                else:
+                    result = await self._with_timeout(fn())
+            except Exception as e:
+                if not is_retryable(e):
+                    # The provider answered (e.g. invalid request), so it is not failing
+                    if self.breaker:
+                        self.breaker.record_success()
+                    raise
+                if self.breaker:
+                    self.breaker.record_failure()
+                if attempt >= self.max_retries or (can_retry and not can_retry()):
+                    metrics.incr("call_failures_total", labels={'policy': self.name})
+                    raise
+                delay = self.backoff(attempt)
+                attempt += 1
+                metrics.incr("call_retries_total", labels={'policy': self.name})
+                logger.warning(f"🔁 {self.name} call failed ({type(e).__name__}: {e}); "
+                               f"retry {attempt}/{self.max_retries} in {delay:.1f}s")
+                await asyncio.sleep(delay)
+                continue
+
+            if self.breaker:
+                self.breaker.record_success()
+            return result
+
+    def call_sync(self, fn: Callable[[], T]) -> T:
+        """
+        Runs a blocking call under the policy (no hedging).
+        The per-attempt timeout has to be enforced by `fn` itself (e.g. request_options).
+        """
+        attempt = 0
+        while True:
+            if self.breaker:
+                wait = self.breaker.wait_time()
+                while wait > 0:
+                    time.sleep(wait)
+                    wait = self.breaker.wait_time()
+            try:
+                result = fn()
+            except Exception as e:
+                if not is_retryable(e):
+                    if self.breaker:
+                        self.breaker.record_success()
+                    raise
+                if self.breaker:
+                    self.breaker.record_failure()
+                if attempt >= self.max_retries:
+                    metrics.incr("call_failures_total", labels={'policy': self.name})
+                    raise
+                delay = self.backoff(attempt)
+                attempt += 1
+                metrics.incr("call_retries_total", labels={'policy': self.name})
+                logger.warning(f"🔁 {self.name} call failed ({type(e).__name__}: {e}); "
+                               f"retry {attempt}/{self.max_retries} in {delay:.1f}s")
+                time.sleep(delay)
+                continue
+
+            if self.breaker:
+                self.breaker.record_success()
+            return result
+
+    async def _wait_for_circuit(self):
+        if not self.breaker:
+            return
+        wait = self.breaker.wait_time()
+        while wait > 0:
+            await asyncio.sleep(wait)
+            wait = self.breaker.wait_time()
+
+    async def _with_timeout(self, awaitable: Awaitable[T]) -> T:
+        if self.timeout is None:
+            return await awaitable
+        try:
+            return await asyncio.wait_for(awaitable, self.timeout)
+        except asyncio.TimeoutError:
+            metrics.incr("call_timeouts_total", labels={'policy': self.name})
+            raise
+
+    async def _hedged(self, fn: Callable[[], Awaitable[T]]) -> T:
+        """Races the primary request against a delayed duplicate."""
+        primary = asyncio.ensure_future(self._with_timeout(fn()))
+        done, _ = await asyncio.wait({primary}, timeout=self.hedge_after)
+        if done:
+            return primary.result()
+
+        metrics.incr("call_hedges_total", labels={'policy': self.name})
+        hedge = asyncio.ensure_future(self._with_timeout(fn()))
+        pending = {primary, hedge}
+        error: Optional[BaseException] = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
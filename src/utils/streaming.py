@@ -0,0 +1,55 @@
+import sys
+from typing import Callable, List, Optional
+
+class ReportStream:
+    """
+    Fans streamed report text out to the console, the report file and UI callbacks.
+
+    The report file is flushed after every chunk, so the partial report survives
+    an interrupted run.
+    """
+
+    def __init__(self, report_path: Optional[str] = None, echo: bool = True,
+                 callbacks: Optional[List[Callable[[str], None]]] = None):
+        """
+        Initialize the stream.
+
+        Args:
+            report_path: File the report is written to progressively (truncated on open)
+            echo: Whether chunks are echoed to stdout
+            callbacks: Extra sinks (e.g. a Streamlit placeholder updater)
+        """
+        self.report_path = report_path
+        self.echo = echo
+        self.callbacks = callbacks or []
+        self._file = open(report_path, 'w', encoding='utf-8') if report_path else None
+        self._parts: List[str] = []
+
+    def write(self, text: str):
+        """Sends one chunk of text to every sink."""
+        if not text:
+            return
+        self._parts.append(text)
+        if self.echo:
+            sys.stdout.write(text)
+            sys.stdout.flush()
+        if self._file:
+            self._file.write(text)
+            self._file.flush()
+        for callback in self.callbacks:
+            callback(text)
+
+    def getvalue(self) -> str:
+        """Returns everything streamed so far."""
+        return ''.join(self._parts)
+
+    def close(self):
+        if self._file:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self) -> 'ReportStream':
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
@@ -0,0 +1,52 @@
+import os
+import sys
+import subprocess
+from typing import Dict
+
+# Heavy dependencies that must only be imported when a feature actually needs them
+HEAVY_MODULES = ("chromadb", "google.generativeai", "googlesearch", "aiohttp")
+
+# Cumulative import budgets in seconds (generous, so slow CI machines still pass)
+BUDGETS = {
+    "main": 0.5,
+    "src.agents.orchestrator": 1.0,
+}
+
+def measure_imports(module: str) -> Dict[str, int]:
+    """
+    Imports a module in a fresh interpreter with `-X importtime`.
+
+    Returns:
+        Mapping of every imported module to its cumulative import time in microseconds
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__))
+    )
+    assert result.returncode == 0, result.stderr
+    timings = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        timings[name.strip()] = int(cumulative)
+    return timings
+
+def test_import_time_budget():
+    for module, budget in BUDGETS.items():
+        timings = measure_imports(module)
+        seconds = timings[module] / 1e6
+        print(f"{module}: {seconds:.3f}s (budget {budget:.1f}s)")
+        assert seconds < budget, f"Importing {module} took {seconds:.2f}s, budget is {budget:.1f}s"
+
+def test_heavy_dependencies_are_lazy():
+    for module in BUDGETS:
+        timings = measure_imports(module)
+        eager = [name for name in timings
+                 if any(name == heavy or name.startswith(heavy + '.') for heavy in HEAVY_MODULES)]
+        assert not eager, f"Importing {module} eagerly imports {', '.join(sorted(eager)[:5])}"
+
+if __name__ == "__main__":
+    test_import_time_budget()
+    test_heavy_dependencies_are_lazy()
+    print("✅ Import-time budget respected")
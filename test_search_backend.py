@@ -0,0 +1,110 @@
+import time
+import asyncio
+from aiohttp import web
+from src.tools.search_tool import SearchTool, HttpSearchBackend
+
+class SearchStandIn:
+    """Local Serper-compatible search API that records the requests it serves."""
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.queries = []
+        self.api_keys = set()
+        self.connections = set()
+        self.active = 0
+        self.max_active = 0
+
+    async def handle(self, request: web.Request) -> web.Response:
+        body = await request.json()
+        self.queries.append(body['q'])
+        self.api_keys.add(request.headers.get('X-API-KEY'))
+        self.connections.add(request.transport.get_extra_info('peername'))
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            self.active -= 1
+        return web.json_response({'organic': [
+            {'title': f"{body['q']} {i}", 'link': f"http://docs.test/{i}", 'snippet': f"About {body['q']}"}
+            for i in range(body['num'] + 1)
+        ]})
+
+async def run_against(stand_in: SearchStandIn, scenario, max_concurrency: int = 4, timeout: float = 5.0):
+    """Serves the stand-in on a free local port and runs `scenario(tool)` against it."""
+    app = web.Application()
+    app.router.add_post('/search', stand_in.handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+
+    saved = (SearchTool.search_backend, SearchTool.max_concurrency, SearchTool.timeout)
+    SearchTool.search_backend = HttpSearchBackend("test-key", endpoint=f"http://127.0.0.1:{port}/search")
+    SearchTool.max_concurrency = max_concurrency
+    SearchTool.timeout = timeout
+    try:
+        return await scenario(SearchTool())
+    finally:
+        await SearchTool.aclose()
+        SearchTool.search_backend, SearchTool.max_concurrency, SearchTool.timeout = saved
+        await runner.cleanup()
+
+def test_results_are_parsed_and_connections_reused():
+    stand_in = SearchStandIn()
+
+    async def scenario(tool):
+        return [await tool.search(f"library {i}", num_results=2) for i in range(5)]
+
+    results = asyncio.run(run_against(stand_in, scenario))
+    assert results[0] == [
+        {'title': "library 0 0", 'link': "http://docs.test/0", 'snippet': "About library 0"},
+        {'title': "library 0 1", 'link': "http://docs.test/1", 'snippet': "About library 0"},
+    ]
+    assert stand_in.api_keys == {"test-key"}
+    # Sequential lookups go over one pooled connection
+    assert len(stand_in.connections) == 1
+
+def test_concurrency_is_bounded():
+    stand_in = SearchStandIn(delay=0.05)
+
+    async def scenario(tool):
+        return await asyncio.gather(*(tool.search(f"library {i}") for i in range(20)))
+
+    results = asyncio.run(run_against(stand_in, scenario, max_concurrency=3))
+    assert all(results)
+    assert len(stand_in.queries) == 20
+    assert stand_in.max_active <= 3
+
+def test_identical_queries_are_coalesced():
+    stand_in = SearchStandIn(delay=0.05)
+
+    async def scenario(tool):
+        # Separate SearchTools (one per Analyst) share in-flight lookups too
+        tools = [tool] + [SearchTool() for _ in range(9)]
+        return await asyncio.gather(*(t.search("pandas python library documentation") for t in tools))
+
+    results = asyncio.run(run_against(stand_in, scenario))
+    assert stand_in.queries == ["pandas python library documentation"]
+    assert all(result == results[0] for result in results)
+
+def test_slow_lookups_time_out():
+    stand_in = SearchStandIn(delay=2.0)
+
+    async def scenario(tool):
+        started = time.perf_counter()
+        results = await asyncio.gather(*(tool.search(f"library {i}") for i in range(4)))
+        return results, time.perf_counter() - started
+
+    # Two slots for four lookups: the timeout also bounds the wait for a slot
+    results, elapsed = asyncio.run(run_against(stand_in, scenario, max_concurrency=2, timeout=0.2))
+    assert results == [[], [], [], []]
+    assert elapsed < 1.0
+
+if __name__ == "__main__":
+    test_results_are_parsed_and_connections_reused()
+    test_concurrency_is_bounded()
+    test_identical_queries_are_coalesced()
+    test_slow_lookups_time_out()
+    print("✅ Search backend behaves under load")